@@ -0,0 +1,130 @@
+"""
+Run-scoped artifact directories for libpjit.
+
+libpjit writes metrics, SCoP metadata and logs into files. Shared paths in
+the build directory or in the working directory let concurrent runs of the
+same project clobber or steal each other's files. Every run gets its own
+artifact directory instead:
+
+    <builddir>/pjit-artifacts/<run uuid>/
+
+All extensions of a chain share the directory of the outermost extension
+that asked for it. We hand explicit paths inside the directory to libpjit
+via PJIT_ARGS and record them in a manifest, so nobody has to search for
+the files afterwards.
+"""
+import contextlib
+import contextvars
+import json
+import logging
+import os
+import uuid
+
+from benchbuild.utils import db, schema
+
+LOG = logging.getLogger(__name__)
+
+ARTIFACTS_DIR = "pjit-artifacts"
+MANIFEST = "manifest.json"
+CONFIG_NAME = "pjit.artifacts"
+
+_CURRENT = contextvars.ContextVar("pjit_artifacts", default=None)
+
+
+class RunArtifacts:
+    """
+    The artifact directory of a single run and its manifest.
+
+    Args:
+        path: The artifact directory.
+    """
+
+    def __init__(self, path):
+        self.path = path
+        self.run_uuid = os.path.basename(path)
+        self.files = {}
+        self.persisted = set()
+
+    def path_of(self, kind, name):
+        """Reserve a known path for an artifact of the given kind."""
+        path = os.path.join(self.path, name)
+        self.files[kind] = path
+        return path
+
+    def existing(self):
+        """All artifacts that were actually written."""
+        return {
+            kind: path
+            for kind, path in self.files.items() if os.path.exists(path)
+        }
+
+    def write_manifest(self):
+        manifest = {"run_uuid": self.run_uuid, "files": self.existing()}
+        with open(os.path.join(self.path, MANIFEST), 'w') as manifest_f:
+            json.dump(manifest, manifest_f, indent=2, sort_keys=True)
+
+    def __repr__(self):
+        return "<RunArtifacts: {0}>".format(self.path)
+
+
+def read_manifest(path):
+    """Read the manifest of an artifact directory."""
+    with open(os.path.join(path, MANIFEST)) as manifest_f:
+        return json.load(manifest_f)
+
+
+def artifacts_root(project=None):
+    """The directory that holds all artifact directories of a project."""
+    if project is None:
+        root = os.path.realpath(os.path.curdir)
+    else:
+        root = os.path.abspath(str(project.builddir))
+    return os.path.join(root, ARTIFACTS_DIR)
+
+
+def current():
+    """The artifact directory of the run in this context, if any."""
+    return _CURRENT.get()
+
+
+@contextlib.contextmanager
+def run_artifacts(project=None):
+    """
+    Enter the artifact directory of the current run.
+
+    The outermost caller creates a new directory and writes its manifest on
+    exit, nested callers get the same directory.
+
+    Args:
+        project: The project we run. We use the current directory, if
+            None.
+    """
+    artifacts = _CURRENT.get()
+    if artifacts is not None:
+        yield artifacts
+        return
+
+    artifacts = RunArtifacts(
+        os.path.join(artifacts_root(project), uuid.uuid4().hex))
+    os.makedirs(artifacts.path)
+    token = _CURRENT.set(artifacts)
+    try:
+        yield artifacts
+    finally:
+        _CURRENT.reset(token)
+        artifacts.write_manifest()
+
+
+def persist_artifacts(results, artifacts):
+    """Link the runs in results to their artifact directory."""
+    session = None
+    for run_info in results or []:
+        db_run = getattr(run_info, 'db_run', None)
+        if db_run is None or db_run.id in artifacts.persisted:
+            continue
+        if session is None:
+            session = schema.Session()
+        db.persist_config(db_run, session, {CONFIG_NAME: artifacts.path})
+        artifacts.persisted.add(db_run.id)
+    if session is not None:
+        session.commit()
@@ -0,0 +1,361 @@
+"""
+A content-addressed cache for build directories.
+
+Experiments often compile the same project with the same flags, e.g., the
+-O3 baselines of pj and ijpp. We key a build by the digests of the project's
+source and build recipe, of the compiler and its plugins, and by the flags.
+A compile with a known key restores the build directory from the cache
+instead of running the build again.
+
+The cache lives in `build_cache.dir` and evicts the least recently used
+builds, when it grows beyond `build_cache.max_size` bytes. Compiles that
+record data at compile time, e.g., compilestats, are never cached.
+"""
+import collections
+import functools as ft
+import hashlib
+import inspect
+import json
+import logging
+import os
+import shutil
+import textwrap
+import uuid
+
+from benchbuild import settings
+from benchbuild.extensions import compiler as ext_compiler
+from benchbuild.extensions import run as ext_run
+from benchbuild.utils import actions
+from benchbuild.utils.path import path_to_list
+
+CFG = settings.CFG
+LOG = logging.getLogger(__name__)
+
+CFG["build_cache"] = {
+    "enable": {
+        "default": False,
+        "desc": "Restore builds from the build cache."
+    },
+    "dir": {
+        "default": None,
+        "desc": "Where we store cached builds, <build_dir>/.build-cache "
+                "by default."
+    },
+    "max_size": {
+        "default": 10 * 1024**3,
+        "desc": "Maximal size of the build cache in bytes."
+    }
+}
+CFG["build_cache"].init_from_env()
+
+# Compiler extensions that only produce the build.
+CACHEABLE_EXTENSIONS = (ext_run.WithTimeout, ext_compiler.RunCompiler)
+
+ENTRY_DIR = "build"
+META_FILE = "meta.json"
+
+
+@ft.lru_cache(maxsize=None)
+def _file_digest(path, size, mtime):
+    del size, mtime
+    digest = hashlib.sha256()
+    with open(path, 'rb') as in_f:
+        for chunk in iter(lambda: in_f.read(1 << 20), b''):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+def file_digest(path):
+    """The sha256 of a file, cached as long as size and mtime stay."""
+    stat = os.stat(path)
+    return _file_digest(os.path.realpath(path), stat.st_size, stat.st_mtime)
+
+
+def which(name, paths):
+    """Find an executable or library in paths, then in PATH."""
+    if os.path.isabs(name):
+        return name if os.path.exists(name) else None
+    for path in paths:
+        candidate = os.path.join(path, name)
+        if os.path.isfile(candidate):
+            return candidate
+    return shutil.which(name)
+
+
+def compiler_digests(project):
+    """Digests of the compilers and the plugins loaded by the cflags."""
+    env = CFG["env"].value
+    bin_path = env.get("PATH", []) + path_to_list(os.getenv("PATH", ""))
+    lib_path = env.get("LD_LIBRARY_PATH", []) + path_to_list(
+        os.getenv("LD_LIBRARY_PATH", ""))
+
+    tools = [(str(CFG["compiler"]["c"]), bin_path),
+             (str(CFG["compiler"]["cxx"]), bin_path)]
+    cflags = list(project.cflags)
+    tools.extend((cflags[i + 2], lib_path)
+                 for i, flag in enumerate(cflags[:-2])
+                 if flag == "-load" and cflags[i + 1] == "-Xclang")
+
+    digests = {}
+    for name, paths in tools:
+        path = which(name, paths)
+        digests[name] = file_digest(path) if path else None
+    return digests
+
+
+def source_digest(project):
+    """
+    Digest of the project's sources and build recipe.
+
+    We hash the downloaded source archive, if we find it, and the source of
+    the project class, which contains the build recipe.
+    """
+    project_cls = type(project)
+    digest = hashlib.sha256()
+    digest.update("{}.{}:{}".format(project_cls.__module__,
+                                    project_cls.__qualname__,
+                                    project.version).encode())
+    try:
+        digest.update(inspect.getsource(project_cls).encode())
+    except (OSError, TypeError):
+        LOG.debug("No source available for %s", project_cls)
+
+    src_file = getattr(project, "src_file", None)
+    if src_file:
+        src_path = os.path.join(str(CFG["tmp_dir"]), str(src_file))
+        if os.path.isfile(src_path):
+            digest.update(file_digest(src_path).encode())
+        else:
+            digest.update(str(src_file).encode())
+    return digest.hexdigest()
+
+
+def build_key(project):
+    """The content address of a project's build."""
+    key = {
+        "source": source_digest(project),
+        "compilers": compiler_digests(project),
+        "cflags": list(project.cflags),
+        "ldflags": list(project.ldflags)
+    }
+    return hashlib.sha256(json.dumps(key,
+                                     sort_keys=True).encode()).hexdigest()
+
+
+def compiler_extensions(extension):
+    if extension is None:
+        return
+    yield extension
+    for child in getattr(extension, "next_extensions", []):
+        yield from compiler_extensions(child)
+
+
+def is_cacheable(project):
+    """Only builds without side effects at compile time can be cached."""
+    return all(
+        type(extension) in CACHEABLE_EXTENSIONS
+        for extension in compiler_extensions(project.compiler_extension))
+
+
+def directory_size(path):
+    size = 0
+    for root, _, files in os.walk(path):
+        for name in files:
+            file_path = os.path.join(root, name)
+            if not os.path.islink(file_path):
+                size += os.path.getsize(file_path)
+    return size
+
+
+def copy_contents(src, dst):
+    """Copy the contents of src into the existing directory dst."""
+    for name in os.listdir(src):
+        src_path = os.path.join(src, name)
+        dst_path = os.path.join(dst, name)
+        if os.path.isdir(src_path) and not os.path.islink(src_path):
+            shutil.copytree(src_path, dst_path, symlinks=True)
+        else:
+            shutil.copy2(src_path, dst_path, follow_symlinks=False)
+
+
+class BuildCache:
+    """
+    A size-capped LRU cache of build directories.
+
+    Every entry is a directory named after its key. The modification time of
+    an entry marks its last use.
+
+    Args:
+        root: The directory of the cache.
+        max_size: The maximal size of all entries in bytes.
+    """
+
+    def __init__(self, root, max_size):
+        self.root = root
+        self.max_size = max_size
+        self.stats = collections.Counter()
+
+    def entry(self, key):
+        return os.path.join(self.root, key)
+
+    def restore(self, key, builddir):
+        """
+        Restore a cached build into builddir.
+
+        Returns:
+            True, if we found the build in the cache.
+        """
+        entry = self.entry(key)
+        if not os.path.isdir(entry):
+            self.stats["misses"] += 1
+            return False
+
+        os.makedirs(str(builddir), exist_ok=True)
+        try:
+            copy_contents(os.path.join(entry, ENTRY_DIR), str(builddir))
+        except OSError as err:
+            LOG.warning("Could not restore build %s: %s", key, err)
+            self.stats["misses"] += 1
+            return False
+        os.utime(entry)
+        self.stats["hits"] += 1
+        self.stats["restored_bytes"] += self.entry_size(entry)
+        return True
+
+    def store(self, key, builddir):
+        """Store the build in builddir under key and evict old builds."""
+        os.makedirs(self.root, exist_ok=True)
+        tmp_entry = os.path.join(self.root, ".tmp-" + uuid.uuid4().hex)
+        try:
+            shutil.copytree(
+                str(builddir), os.path.join(tmp_entry, ENTRY_DIR),
+                symlinks=True)
+            size = directory_size(tmp_entry)
+            with open(os.path.join(tmp_entry, META_FILE), 'w') as meta:
+                json.dump({"size": size}, meta)
+            os.rename(tmp_entry, self.entry(key))
+        except OSError as err:
+            # Another process might have stored the same build already.
+            LOG.debug("Could not store build %s: %s", key, err)
+            shutil.rmtree(tmp_entry, ignore_errors=True)
+            return
+        self.stats["stored"] += 1
+        self.evict()
+
+    @staticmethod
+    def entry_size(entry):
+        try:
+            with open(os.path.join(entry, META_FILE)) as meta:
+                return json.load(meta)["size"]
+        except (OSError, ValueError, KeyError):
+            return directory_size(entry)
+
+    def entries(self):
+        """All entries, least recently used first."""
+        if not os.path.isdir(self.root):
+            return []
+        entries = [
+            os.path.join(self.root, name) for name in os.listdir(self.root)
+            if not name.startswith(".")
+        ]
+        return sorted(entries, key=os.path.getmtime)
+
+    def evict(self):
+        """Remove the least recently used entries until we fit max_size."""
+        entries = [(entry, self.entry_size(entry))
+                   for entry in self.entries()]
+        total = sum(size for _, size in entries)
+        for entry, size in entries:
+            if total <= self.max_size:
+                break
+            shutil.rmtree(entry, ignore_errors=True)
+            total -= size
+            self.stats["evicted"] += 1
+        return total
+
+
+@ft.lru_cache(maxsize=1)
+def default_cache():
+    root = CFG["build_cache"]["dir"].value
+    if not root:
+        root = os.path.join(str(CFG["build_dir"]), ".build-cache")
+    return BuildCache(root, int(CFG["build_cache"]["max_size"].value))
+
+
+def cached_compile(project, cache=None):
+    """Restore the build of a project from the cache or compile it."""
+    if cache is None:
+        if not CFG["build_cache"]["enable"].value:
+            return project.compile()
+        cache = default_cache()
+
+    if not is_cacheable(project):
+        cache.stats["uncacheable"] += 1
+        return project.compile()
+
+    key = build_key(project)
+    if cache.restore(key, project.builddir):
+        LOG.info("Restored build of %s from cache: %s", project.name, key)
+        return None
+
+    res = project.compile()
+    cache.store(key, project.builddir)
+    return res
+
+
+class CachedCompile(actions.Compile):
+    """Compile the project or restore its build from the build cache."""
+
+    def __init__(self, project):
+        super(CachedCompile, self).__init__(project)
+        self.action_fn = ft.partial(cached_compile, project)
+
+
+class ShowCacheStatistics(actions.Step):
+    NAME = "CACHE"
+    DESCRIPTION = "Show the statistics of the build cache"
+
+    def __init__(self, experiment):
+        super(ShowCacheStatistics, self).__init__(
+            obj=experiment, action_fn=self.show)
+
+    @staticmethod
+    def show():
+        if not CFG["build_cache"]["enable"].value:
+            return
+        stats = default_cache().stats
+        print("Build cache: {hits} hits, {misses} misses, {stored} stored, "
+              "{evicted} evicted, {uncacheable} uncacheable, "
+              "{restored_bytes} bytes restored".format(
+                  **{
+                      name: stats[name]
+                      for name in [
+                          "hits", "misses", "stored", "evicted",
+                          "uncacheable", "restored_bytes"
+                      ]
+                  }))
+
+    def __str__(self, indent=0):
+        return textwrap.indent("* Show build cache statistics",
+                               indent * " ")
+
+
+class CachedBuilds:
+    """
+    Mixin for runtime experiments that restore builds from the build cache.
+
+    Shows the statistics of the cache at the end of the experiment.
+    """
+
+    @staticmethod
+    def default_runtime_actions(project):
+        return [
+            actions.MakeBuildDir(project),
+            CachedCompile(project),
+            actions.Run(project),
+            actions.Clean(project)
+        ]
+
+    def actions(self):
+        actns = super(CachedBuilds, self).actions()
+        return actns + [ShowCacheStatistics(self)]
@@ -0,0 +1,108 @@
+"""
+Build once, run many.
+
+Scaling experiments run the same binary with many runtime configurations.
+Instead of compiling one deep copy of the project per configuration, we
+group the variants of a project by their compile flags, compile each group
+once and run all of its variants against the same build directory.
+
+benchbuild replaces a binary with a wrapper on every run and moves the real
+binary to '<binary>.bin'. Before the next variant runs, we restore the real
+binary, so that the next run wraps it with its own runtime extension.
+"""
+import collections
+import functools as ft
+import logging
+import os
+import textwrap
+
+from benchbuild.utils import actions
+from benchbuild.utils.wrapping import PROJECT_BIN_F_EXT
+from polyjit.experiments import build_cache
+
+LOG = logging.getLogger(__name__)
+
+
+def compile_key(project):
+    """Variants with the same key can share a single build."""
+    return (tuple(project.cflags), tuple(project.ldflags))
+
+
+def is_wrapper(wrapper_f, real_f):
+    """Check, if wrapper_f is a benchbuild wrapper around real_f."""
+    try:
+        with open(wrapper_f) as wrapper:
+            return '"{}"'.format(real_f) in wrapper.read(4096)
+    except (OSError, UnicodeDecodeError):
+        return False
+
+
+def unwrap(builddir):
+    """
+    Restore all binaries in builddir that a previous run wrapped.
+
+    Returns:
+        A list of the restored binaries.
+    """
+    restored = []
+    for root, _, files in os.walk(str(builddir)):
+        for name in files:
+            if not name.endswith(PROJECT_BIN_F_EXT):
+                continue
+            real_f = os.path.join(root, name)
+            wrapper_f = real_f[:-len(PROJECT_BIN_F_EXT)]
+            if is_wrapper(wrapper_f, real_f):
+                os.replace(real_f, wrapper_f)
+                restored.append(wrapper_f)
+    LOG.debug("Restored binaries: %s", restored)
+    return restored
+
+
+class Unwrap(actions.Step):
+    NAME = "UNWRAP"
+    DESCRIPTION = "Restore the binaries wrapped by a previous run"
+
+    def __init__(self, project):
+        super(Unwrap, self).__init__(
+            obj=project, action_fn=ft.partial(unwrap, project.builddir))
+
+    def __str__(self, indent=0):
+        return textwrap.indent(
+            "* {0}: Restore wrapped binaries".format(self.obj.name),
+            indent * " ")
+
+
+def build_matrix(variants):
+    """
+    Compile each group of variants once and run all variants of it.
+
+    A failing variant does not stop the other variants of its group. We
+    compile with the first variant of a group, the compiler extensions of
+    the other variants never run.
+
+    Args:
+        variants: Copies of a project that share the build directory. They
+            differ in their runtime extension and, maybe, in their flags.
+
+    Returns:
+        A list of actions, one per group of variants with equal flags.
+    """
+    groups = collections.OrderedDict()
+    for variant in variants:
+        groups.setdefault(compile_key(variant), []).append(variant)
+
+    actns = []
+    for group in groups.values():
+        build = group[0]
+        runs = [
+            actions.RequireAll(actions=[Unwrap(variant), actions.Run(variant)])
+            for variant in group
+        ]
+        actns.append(
+            actions.RequireAll(actions=[
+                actions.MakeBuildDir(build),
+                build_cache.CachedCompile(build),
+                actions.Any(actions=runs),
+                actions.Clean(build)
+            ]))
+    return actns
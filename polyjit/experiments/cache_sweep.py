@@ -0,0 +1,113 @@
+"""
+Sweep the variant cache and specialization settings of PolyJIT.
+
+We compile every project once and run it for each point of the grid
+
+    cache_sweep.cache_sizes x cache_sweep.specialization
+
+The cache size limits the number of variants libpjit keeps per region,
+0 keeps libpjit's default. libpjit is not known to have an option for the
+cache size, so cache_sweep.size_flag is empty by default and we only sweep
+the specialization, which PolyJITConfig supports. Set size_flag to the
+option of your libpjit (e.g., -polli-cache-size) to sweep the sizes, too.
+
+Each run stores the PolyJIT metrics (n_cachehits, n_variants, n_requests,
+t_codegen) and its wall time and peak RSS, the pj-cache-sweep report turns
+them into a memory/time Pareto curve.
+"""
+import itertools
+import uuid
+
+import benchbuild.extensions as ext
+from benchbuild import settings
+from polyjit.experiments import mse, polyjit
+
+CFG = settings.CFG
+
+CFG["cache_sweep"] = {
+    "cache_sizes": {
+        "default": [0, 1, 4, 16, 64],
+        "desc": "Variant cache sizes we sweep, 0 keeps libpjit's default."
+    },
+    "size_flag": {
+        "default": "",
+        "desc": "libpjit option that sets the variant cache size. "
+                "Empty sweeps the specialization only."
+    },
+    "specialization": {
+        "default": [True, False],
+        "desc": "Sweep with specialization enabled and/or disabled."
+    }
+}
+CFG["cache_sweep"].init_from_env()
+
+
+def grid():
+    """All (cache_size, specialization) points of the sweep."""
+    cfg = CFG["cache_sweep"]
+    sizes = [int(s) for s in cfg["cache_sizes"].value]
+    if not cfg["size_flag"].value:
+        sizes = [0]
+    return list(
+        itertools.product(sizes,
+                          [bool(s) for s in cfg["specialization"].value]))
+
+
+def config_name(cache_size, specialization):
+    return "cache={0},spec={1}".format(cache_size,
+                                       "on" if specialization else "off")
+
+
+class SetCacheConfig(polyjit.PolyJITConfig):
+    """
+    Configure the variant cache of libpjit.
+
+    Specialization is disabled by polyjit.DisablePolyJIT, further down the
+    chain. We pass no option for the size 0 or without
+    cache_sweep.size_flag.
+    """
+
+    def __call__(self, *args, **kwargs):
+        flag = str(CFG["cache_sweep"]["size_flag"].value)
+        cache_size = self.config["cache_size"]
+        pjit_args = ["{0}={1}".format(flag, cache_size)] \
+            if flag and cache_size else []
+        with self.argv(PJIT_ARGS=pjit_args):
+            return self.call_next(*args, **kwargs)
+
+    def __str__(self):
+        return "Set PolyJIT cache: {0}".format(
+            config_name(self.config["cache_size"],
+                        self.config["specialization"]))
+
+
+class PolyJITCacheSweep(polyjit.PolyJIT):
+    """Run each project under a grid of PolyJIT cache settings."""
+
+    NAME = "pj-cache-sweep"
+
+    def actions_for_project(self, project):
+        project = polyjit.PolyJIT.init_project(project)
+        project.run_uuid = uuid.uuid4()
+
+        sweep = []
+        for cache_size, specialization in grid():
+            cfg = {
+                "name": config_name(cache_size, specialization),
+                "cache_size": cache_size,
+                "specialization": specialization
+            }
+            chain = ext.run.RuntimeExtension(project, self, config=cfg) \
+                << polyjit.EnablePolyJIT() \
+                << polyjit.EnableJITTracking(project=project) \
+                << polyjit.CollectMetrics(project=project) \
+                << polyjit.PolyJITMetrics()
+            if not specialization:
+                chain = chain << polyjit.DisablePolyJIT()
+            sweep.append(chain
+                         << SetCacheConfig(config=cfg)
+                         << polyjit.ClearPolyJITConfig()
+                         << mse.MeasureTimeAndMemory())
+
+        project.runtime_extension = ext.base.Extension(*sweep)
+        return PolyJITCacheSweep.default_runtime_actions(project)
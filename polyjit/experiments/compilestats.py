@@ -5,7 +5,13 @@ This experiment is a basic experiment in the benchbuild study. It simply runs
 all projects after compiling it with -O3 and catches all statistics emitted
 by llvm.
 
+Reports need the sum of each statistic per project, while the raw
+compilestats table grows by millions of rows per sweep. We keep a summary
+per experiment, project and statistic: refresh_summary adds the runs that
+are not summarized yet. Only reports refresh the summary, the compiler runs
+of an experiment write to compilestats concurrently and never touch it.
 """
+import itertools
 import logging
 
 import parse
@@ -140,11 +146,121 @@ class CompileStat(schema.BASE):
     value = sa.Column('value', sa.Numeric)
 
 
+class CompileStatSummary(schema.BASE):
+    """The sum of a compilestat over the runs of an experiment's project."""
+    __tablename__ = 'compilestats_summary'
+
+    experiment_group = sa.Column(
+        schema.GUID(as_uuid=True), primary_key=True, index=True)
+    project_name = sa.Column(sa.String, primary_key=True)
+    project_group = sa.Column(sa.String, primary_key=True)
+    name = sa.Column(sa.String, primary_key=True)
+    value = sa.Column(sa.Numeric)
+
+
+class SummarizedRun(schema.BASE):
+    """A run whose compilestats are part of the summary."""
+    __tablename__ = 'compilestats_summary_run'
+
+    run_id = sa.Column(
+        sa.Integer,
+        sa.ForeignKey("run.id", onupdate="CASCADE", ondelete="CASCADE"),
+        primary_key=True)
+    experiment_group = sa.Column(schema.GUID(as_uuid=True), index=True)
+
+
+TABLES = [
+    CompileStat.__table__, CompileStatSummary.__table__,
+    SummarizedRun.__table__
+]
+RUN = schema.Run.__table__
+CS = CompileStat.__table__
+SUMMARY = CompileStatSummary.__table__
+SUMMARIZED = SummarizedRun.__table__
+
+# Number of runs refresh_summary aggregates at once.
+BATCH = 500
+
+
+def add_to_summary(connection, experiment_group, project_name,
+                   project_group, values):
+    """
+    Add the sums of some runs to the summary of an experiment.
+
+    Args:
+        connection: A Connection or Session.
+        values: A dict that maps the name of a stat to its sum.
+    """
+    for name, value in values.items():
+        key = sa.and_(SUMMARY.c.experiment_group == experiment_group,
+                      SUMMARY.c.project_name == project_name,
+                      SUMMARY.c.project_group == project_group,
+                      SUMMARY.c.name == name)
+        updated = connection.execute(SUMMARY.update().where(key).values(
+            value=SUMMARY.c.value + value))
+        if not updated.rowcount:
+            connection.execute(SUMMARY.insert().values(
+                experiment_group=experiment_group,
+                project_name=project_name,
+                project_group=project_group,
+                name=name,
+                value=value))
+
+
+def refresh_summary(connection, experiment_ids):
+    """
+    Summarize the runs of the experiments we did not summarize yet.
+
+    We fix the set of new run ids first and aggregate the stats of these
+    runs in batches of BATCH runs. Runs that finish meanwhile wait for the
+    next refresh. The caller commits; a concurrent refresh of the same runs
+    fails on the primary key of compilestats_summary_run and rolls back.
+
+    Args:
+        connection: A Connection or Session.
+        experiment_ids: The experiments we refresh.
+
+    Returns:
+        The number of summary rows we changed.
+    """
+    new_runs = sa.sql.select([RUN.c.id]).where(
+        sa.and_(
+            RUN.c.experiment_group.in_(list(experiment_ids)),
+            sa.exists().where(CS.c.run_id == RUN.c.id),
+            ~sa.exists().where(SUMMARIZED.c.run_id == RUN.c.id)))
+    run_ids = iter([row[0] for row in connection.execute(new_runs)])
+
+    changed = 0
+    while True:
+        batch = list(itertools.islice(run_ids, BATCH))
+        if not batch:
+            break
+        in_batch = RUN.c.id.in_(batch)
+        sums = sa.sql.select([
+            RUN.c.experiment_group, RUN.c.project_name, RUN.c.project_group,
+            CS.c.name, sa.func.sum(CS.c.value)
+        ]).select_from(RUN.join(CS, CS.c.run_id == RUN.c.id)).where(
+            in_batch).group_by(RUN.c.experiment_group, RUN.c.project_name,
+                               RUN.c.project_group, CS.c.name)
+
+        rows = connection.execute(sums).fetchall()
+        for exp_group, project_name, project_group, name, value in rows:
+            add_to_summary(connection, exp_group, project_name,
+                           project_group, {name: value})
+        connection.execute(SUMMARIZED.insert().from_select(
+            ["run_id", "experiment_group"],
+            sa.sql.select([RUN.c.id, RUN.c.experiment_group]).where(
+                in_batch)))
+        changed += len(rows)
+    LOG.debug("Refreshed %d compilestats summaries", changed)
+    return changed
+
+
 class CompilestatsExperiment(Experiment):
     """The compilestats experiment."""
 
     NAME = "cs"
-    SCHEMA = [CompileStat.__table__]
+    SCHEMA = TABLES
 
     def actions_for_project(self, project):
         project.compiler_extension = \
@@ -156,7 +272,7 @@ class PollyCompilestatsExperiment(Experiment):
     """The compilestats experiment with polly enabled."""
 
     NAME = "p-cs"
-    SCHEMA = [CompileStat.__table__]
+    SCHEMA = TABLES
 
     def actions_for_project(self, project):
         project.cflags = [
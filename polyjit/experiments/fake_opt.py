@@ -0,0 +1,165 @@
+"""
+A deterministic stand-in for LLVM's opt with Polly.
+
+The sequence searches only look at two statistics of an opt call:
+'The # of regions' and 'Number of regions that a valid part of Scop'.
+This module derives both from a seeded hash of the pass sequence and prints
+them in the format of LLVM's -stats output. That allows us to benchmark the
+throughput of the search strategies without an LLVM/Polly installation.
+
+Every pass contributes a small (possibly negative) number of SCoPs, depending
+on its predecessor in the sequence. The fitness landscape is rugged, but
+stable for a given seed and input module.
+
+Environment:
+    FAKE_OPT_SEED: Seed of the fitness landscape (default: 0).
+    FAKE_OPT_LATENCY: Seconds every call sleeps, to simulate compile time
+        (default: 0).
+    FAKE_OPT_LOG: If set, every call appends its duration and its start
+        (seconds since the epoch) to this file.
+"""
+import hashlib
+import os
+import stat
+import sys
+import time
+
+INFRASTRUCTURE_FLAGS = [
+    '-disable-output', '-stats', '-polly-detect', '-strip-debug', '-S',
+    '-analyze'
+]
+
+STATS_HEADER = \
+    "===" + "-" * 73 + "===\n" \
+    "                          ... Statistics Collected ...\n" \
+    "===" + "-" * 73 + "===\n\n"
+
+
+def _score(seed, *parts):
+    digest = hashlib.sha256(repr((seed, ) + parts).encode()).digest()
+    return int.from_bytes(digest[:4], 'little')
+
+
+def region_stats(sequence, seed=0):
+    """
+    Calculate the fake region statistics of a pass sequence.
+
+    Args:
+        sequence: The passes of the opt call.
+        seed: Selects the fitness landscape.
+
+    Returns:
+        A tuple (regions, scops).
+    """
+    regions = 20 + _score(seed, 'regions') % 40
+    scops = 0
+    predecessor = None
+    for opt_pass in sequence:
+        scops += _score(seed, predecessor, opt_pass) % 5 - 1
+        predecessor = opt_pass
+    return regions, max(0, min(regions, scops))
+
+
+def render_stats(regions, scops):
+    """
+    Render the statistics like 'opt -stats' does.
+
+    Just like LLVM, we do not print statistics with a value of 0.
+    """
+    stats = [(scops, 'polly-detect',
+              'Number of regions that a valid part of Scop'),
+             (scops, 'polly-detect',
+              'Number of weighted regions that a valid part of Scop'),
+             (scops, 'polly-detect',
+              'Weighted number of regions that are a valid Scop'),
+             (regions, 'region', 'The # of regions')]
+    lines = [
+        "{0:>7d} {1:<12} - {2}\n".format(value, component, desc)
+        for value, component, desc in stats if value
+    ]
+    return STATS_HEADER + "".join(lines)
+
+
+def parse_args(argv):
+    """
+    Split the arguments of an opt call into passes and input files.
+
+    Returns:
+        A tuple (passes, inputs).
+    """
+    passes = []
+    inputs = []
+    args = iter(argv)
+    for arg in args:
+        if arg in INFRASTRUCTURE_FLAGS or arg.startswith('-load'):
+            continue
+        if arg == '-o':
+            next(args, None)
+        elif arg.startswith('-'):
+            passes.append(arg)
+        else:
+            inputs.append(arg)
+    return passes, inputs
+
+
+def module_seed(inputs, seed):
+    """Different input modules get different fitness landscapes."""
+    hasher = hashlib.sha256(str(seed).encode())
+    for path in inputs:
+        if os.path.isfile(path):
+            with open(path, 'rb') as module:
+                hasher.update(module.read())
+        else:
+            hasher.update(path.encode())
+    return hasher.hexdigest()
+
+
+def main(argv):
+    """Run a fake opt call and print the statistics to stderr."""
+    start = time.perf_counter()
+    start_time = time.time()
+    passes, inputs = parse_args(argv)
+    seed = module_seed(inputs, os.environ.get('FAKE_OPT_SEED', '0'))
+
+    latency = float(os.environ.get('FAKE_OPT_LATENCY', '0'))
+    if latency > 0:
+        time.sleep(latency)
+
+    if '-stats' in argv:
+        sys.stderr.write(render_stats(*region_stats(passes, seed)))
+
+    log = os.environ.get('FAKE_OPT_LOG')
+    if log:
+        with open(log, 'a') as log_file:
+            log_file.write("{0:f} {1:f}\n".format(
+                time.perf_counter() - start, start_time))
+    return 0
+
+
+def install(directory, name='opt'):
+    """
+    Install an executable fake opt into directory.
+
+    Put the directory in front of PATH to make the sequence experiments pick
+    up the fake opt instead of the real one.
+
+    Returns:
+        The path of the executable.
+    """
+    root = os.path.dirname(
+        os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+    path = os.path.join(directory, name)
+    with open(path, 'w') as script:
+        script.write("#!{python}\n"
+                     "import sys\n"
+                     "sys.path.insert(0, {root!r})\n"
+                     "from polyjit.experiments import fake_opt\n"
+                     "sys.exit(fake_opt.main(sys.argv[1:]))\n".format(
+                         python=sys.executable, root=root))
+    mode = os.stat(path).st_mode
+    os.chmod(path, mode | stat.S_IXUSR | stat.S_IXGRP | stat.S_IXOTH)
+    return path
+
+
+if __name__ == '__main__':
+    sys.exit(main(sys.argv[1:]))
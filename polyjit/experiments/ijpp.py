@@ -9,7 +9,7 @@ where 'naked' means without any JIT component involved, and 'inside' means
 that the configuration will be executed inside the JIT pipeline, but
 no PolyJIT-features are enabled.
 """
-import csv
+import functools as ft
 import logging
 import os
 import uuid
@@ -20,14 +20,17 @@ from benchbuild import extensions, reports, settings
 from benchbuild.utils import actions
 from benchbuild.utils import schedule_tree as st
 from benchbuild.utils import schema
-from polyjit.experiments import papi, polyjit
+from polyjit.experiments import (build_cache, memoize, papi, polyjit,
+                                 repetition, trace_logs)
+from polyjit.reports import cache, engine, output, tasks
 
 LOG = logging.getLogger(__name__)
 
 Extension = extensions.base.Extension
 RuntimeExtension = extensions.run.RuntimeExtension
 RunWithTime = extensions.time.RunWithTime
-LogAdditionals = extensions.log.LogAdditionals
+RepeatUntilStable = repetition.RepeatUntilStable
+SkipMeasured = memoize.SkipMeasured
 
 class IJPP(polyjit.PolyJIT):
     """Experiments and evaluation used for IJPP Journal."""
@@ -61,7 +64,7 @@ class IJPP(polyjit.PolyJIT):
             << polyjit.EnableJITTracking(project=project) \
             << polyjit.CollectMetrics(project=project) \
             << polyjit.PolyJITMetrics() \
-            << polyjit.RegisterPolyJITLogs() \
+            << polyjit.RegisterPolyJITLogs(project=project) \
             << polyjit.ClearPolyJITConfig()
 
         ext_jit = RuntimeExtension(
@@ -73,7 +76,7 @@ class IJPP(polyjit.PolyJIT):
             << polyjit.EnableJITTracking(project=project) \
             << polyjit.CollectMetrics(project=project) \
             << polyjit.PolyJITMetrics() \
-            << polyjit.RegisterPolyJITLogs() \
+            << polyjit.RegisterPolyJITLogs(project=project) \
             << polyjit.ClearPolyJITConfig()
 
         ext_jit_polly = RuntimeExtension(
@@ -85,7 +88,7 @@ class IJPP(polyjit.PolyJIT):
             << polyjit.EnableJITTracking(project=project) \
             << polyjit.CollectMetrics(project=project) \
             << polyjit.PolyJITMetrics() \
-            << polyjit.RegisterPolyJITLogs() \
+            << polyjit.RegisterPolyJITLogs(project=project) \
             << polyjit.ClearPolyJITConfig()
 
         ext_jit_no_delin = RuntimeExtension(
@@ -98,7 +101,7 @@ class IJPP(polyjit.PolyJIT):
             << polyjit.EnableJITTracking(project=project) \
             << polyjit.CollectMetrics(project=project) \
             << polyjit.PolyJITMetrics() \
-            << polyjit.RegisterPolyJITLogs() \
+            << polyjit.RegisterPolyJITLogs(project=project) \
             << polyjit.ClearPolyJITConfig()
 
         ext_jit_polly_no_delin = RuntimeExtension(
@@ -111,7 +114,7 @@ class IJPP(polyjit.PolyJIT):
             << polyjit.EnableJITTracking(project=project) \
             << polyjit.CollectMetrics(project=project) \
             << polyjit.PolyJITMetrics() \
-            << polyjit.RegisterPolyJITLogs() \
+            << polyjit.RegisterPolyJITLogs(project=project) \
             << polyjit.ClearPolyJITConfig()
 
         # JIT configurations:
@@ -119,7 +122,10 @@ class IJPP(polyjit.PolyJIT):
         #   PolyJIT_Opt, polly.inside.no-delin
         project.runtime_extension = Extension(
             ext_jit_opt, ext_jit, ext_jit_polly, ext_jit_no_delin,
-            ext_jit_polly_no_delin) << RunWithTime()
+            ext_jit_polly_no_delin) \
+            << RunWithTime() \
+            << RepeatUntilStable() \
+            << SkipMeasured(project=project, experiment=self)
 
         # O3
         naked_project.runtime_extension = RuntimeExtension(
@@ -127,7 +133,9 @@ class IJPP(polyjit.PolyJIT):
                 "name": "o3.naked",
                 "cores": jobs
             }) \
-            << RunWithTime()
+            << RunWithTime() \
+            << RepeatUntilStable() \
+            << SkipMeasured(project=naked_project, experiment=self)
 
         # Polly
         naked_polly_project.runtime_extension = RuntimeExtension(
@@ -135,13 +143,15 @@ class IJPP(polyjit.PolyJIT):
                 "name": "polly.naked",
                 "cores": jobs
             }) \
-            << RunWithTime()
+            << RunWithTime() \
+            << RepeatUntilStable() \
+            << SkipMeasured(project=naked_polly_project, experiment=self)
 
         def ijpp_config(_project, name):
             return actions.RequireAll(actions=[
                 actions.Echo("Stage: JIT Configurations"),
                 actions.MakeBuildDir(_project),
-                actions.Compile(_project),
+                build_cache.CachedCompile(_project),
                 actions.Run(_project),
                 actions.Clean(_project),
                 actions.Echo(name),
@@ -222,8 +232,8 @@ class JitExportGeneratedCode(polyjit.PolyJIT):
             << polyjit.EnablePolyJIT() \
             << EnableDBExport() \
             << polyjit.EnableJITTracking(project=project) \
-            << polyjit.RegisterPolyJITLogs() \
-            << LogAdditionals() \
+            << polyjit.RegisterPolyJITLogs(project=project) \
+            << trace_logs.StoreLogs(project=project) \
             << polyjit.ClearPolyJITConfig()
 
         disable_jit = RuntimeExtension(
@@ -234,8 +244,8 @@ class JitExportGeneratedCode(polyjit.PolyJIT):
             << polyjit.DisablePolyJIT() \
             << EnableDBExport() \
             << polyjit.EnableJITTracking(project=project) \
-            << polyjit.RegisterPolyJITLogs() \
-            << LogAdditionals() \
+            << polyjit.RegisterPolyJITLogs(project=project) \
+            << trace_logs.StoreLogs(project=project) \
             << polyjit.ClearPolyJITConfig()
 
         project.runtime_extension = Extension(enable_jit, disable_jit)
@@ -292,118 +302,64 @@ class DBReport(reports.Report):
 
 
 class IJPPReport(reports.Report):
+    """
+    Compare the JIT configurations of ijpp.
+
+    We write four tables:
+        runtime: median program-wide results per project and config.
+        regions: median runtime of each region per config.
+        complete: one row per project with all configs side by side.
+        region_compare: region-wise speedup of PolyJIT over polly.inside.
+    """
+
     NAME = "ijpp"
     SUPPORTED_EXPERIMENTS = ['ijpp', "pj-simple"]
 
-    QUERY_TIME = \
-        sa.sql.select([
-            sa.column('project'),
-            sa.column('group'),
-            sa.column('domain'),
-            sa.column('config'),
-            sa.column('time'),
-            sa.column('variants'),
-            sa.column('cachehits'),
-            sa.column('requests'),
-            sa.column('blocked')
-        ]).select_from(sa.func.ijpp_total_runtime(sa.sql.bindparam('exp_id')))
-
-    QUERY_REGION = \
-        sa.sql.select([
-            sa.column('project'),
-            sa.column('region'),
-            sa.column('config'),
-            sa.column('runtime')
-        ]).\
-        select_from(
-            sa.func.ijpp_region_wise(sa.sql.bindparam('exp_id'))
-        )
-
-    QUERY_IJPP_TOTAL = \
-        sa.sql.select([
-            sa.column('project_name'),
-            sa.column('project_group'),
-            sa.column('domain'),
-            sa.column('speedup_0'),
-            sa.column('speedup_2'),
-            sa.column('ohcov_0'),
-            sa.column('ohcov_1'),
-            sa.column('ohcov_2'),
-            sa.column('dyncov_0'),
-            sa.column('dyncov_1'),
-            sa.column('dyncov_2'),
-            sa.column('cachehits_0'),
-            sa.column('cachehits_1'),
-            sa.column('cachehits_2'),
-            sa.column('variants_0'),
-            sa.column('variants_1'),
-            sa.column('variants_2'),
-            sa.column('blocked_0'),
-            sa.column('blocked_1'),
-            sa.column('blocked_2'),
-            sa.column('codegen_0'),
-            sa.column('codegen_1'),
-            sa.column('codegen_2'),
-            sa.column('scops_0'),
-            sa.column('scops_1'),
-            sa.column('scops_2'),
-            sa.column('t_0'),
-            sa.column('o_0'),
-            sa.column('t_1'),
-            sa.column('o_1'),
-            sa.column('t_2'),
-            sa.column('o_2')
-        ]).\
-        select_from(
-            sa.func.ijpp_eval(sa.sql.bindparam('exp_id'))
-        )
-
-    QUERY_IJPP_REGION = \
-        sa.sql.select([
-            sa.column('project_name'),
-            sa.column('project_group'),
-            sa.column('region'),
-            sa.column('cores'),
-            sa.column('t_polly'),
-            sa.column('t_polyjit'),
-            sa.column('speedup')
-        ]).\
-        select_from(
-            sa.func.ijpp_region_wise_compare(sa.sql.bindparam('exp_id'))
-        )
-
-    def report(self):
-        for exp_id in self.experiment_ids:
-            qry = IJPPReport.QUERY_TIME.unique_params(exp_id=exp_id)
-            yield ("runtime", exp_id,
-                   ('project', 'group', 'domain', 'config', 'time', 'variants',
-                    'cachehits', 'requests', 'blocked'),
-                   self.session.execute(qry).fetchall())
-
-            qry = IJPPReport.QUERY_REGION.unique_params(exp_id=exp_id)
-            yield ("regions", exp_id, ('project', 'region',
-                                       'cores', 'runtime'),
-                   self.session.execute(qry).fetchall())
-
-            qry = IJPPReport.QUERY_IJPP_TOTAL.unique_params(exp_id=exp_id)
-            yield ("complete", exp_id,
-                   ('project', 'group', 'domain', 'speedup_0', 'speedup_2',
-                    'ohcov_0', 'ohcov_1', 'ohcov_2', 'dyncov_0', 'dyncov_1',
-                    'dyncov_2', 'cachehits_0', 'cachehits_1', 'cachehits_2',
-                    'variants_0', 'variants_1', 'variants_2', 'blocked_0',
-                    'blocked_1', 'blocked_2', 'codegen_0', 'codegen_1',
-                    'codegen_2', 'scops_0', 'scops_1', 'scops_2', 't_0',
-                    'o_0', 't_1', 'o_1', 't_2', 'o_2'),
-                   self.session.execute(qry).fetchall())
-
-            qry = IJPPReport.QUERY_IJPP_REGION.unique_params(exp_id=exp_id)
-            yield ("region_compare", exp_id,
-                   ('project', 'group', 'region', 'cores',
-                    'T_Polly', 'T_PolyJIT', 'speedup'),
-                   self.session.execute(qry).fetchall())
+    BASELINE = "polly.inside"
+    CANDIDATE = "PolyJIT"
+    CONFIGS = [
+        "polly.inside", "PolyJIT", "PolyJIT_Opt", "polly.inside.no-delin",
+        "PolyJIT.no-delin"
+    ]
+    COMPLETE = [
+        "speedup", "ohcov", "dyncov", "cachehits", "variants", "blocked",
+        "codegen", "scops", "time"
+    ]
+
+    @staticmethod
+    def dependencies():
+        """The code and the constants our frames depend on."""
+        return [
+            IJPPReport.evaluate, IJPPReport.BASELINE, IJPPReport.CANDIDATE,
+            IJPPReport.CONFIGS, IJPPReport.COMPLETE
+        ]
 
-    def generate(self):
-        for name, exp_id, header, data in self.report():
+    @staticmethod
+    def evaluate(data):
+        totals = engine.total_runtime(data)
+        yield ("runtime", totals)
+        yield ("regions", engine.region_runtime(data))
+        yield ("complete",
+               engine.wide(
+                   engine.speedups(totals, IJPPReport.BASELINE),
+                   IJPPReport.CONFIGS, IJPPReport.COMPLETE))
+        yield ("region_compare",
+               engine.region_wise_compare(data, IJPPReport.BASELINE,
+                                          IJPPReport.CANDIDATE))
+
+    def write_experiment(self, exp_id, connection):
+        root = engine.dataset_root()
+        if root:
+            # The cache keys by the state of the database, not the export.
+            frames = IJPPReport.evaluate(
+                engine.ReportData.from_dataset(root, [str(exp_id)]))
+        else:
+            frames = cache.cached_frames(
+                connection, IJPPReport.NAME,
+                engine.dependencies() + IJPPReport.dependencies(), [exp_id],
+                lambda: IJPPReport.evaluate(
+                    engine.ReportData.load(connection, [exp_id])))
+        for name, frame in frames:
             fname = os.path.basename(self.out_path)
 
             fname = "ijpp_{prefix}_{name}_{exp_id}{ending}".format(
@@ -411,8 +367,11 @@ class IJPPReport(reports.Report):
                 ending=os.path.splitext(fname)[-1],
                 exp_id=exp_id,
                 name=name)
-            with open(fname, 'w') as csv_out:
-                print("Writing '{0}'".format(csv_out.name))
-                csv_writer = csv.writer(csv_out)
-                csv_writer.writerows([header])
-                csv_writer.writerows(data)
+            output.write_frame(frame, fname)
+
+    def generate(self):
+        # Every experiment is an independent task on its own connection.
+        work = [(exp_id, ft.partial(self.write_experiment, exp_id))
+                for exp_id in self.experiment_ids]
+        for exp_id, _ in tasks.run(tasks.bind_of(self.session), work):
+            LOG.debug("Wrote the ijpp report of %s", exp_id)
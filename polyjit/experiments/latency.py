@@ -0,0 +1,265 @@
+"""
+Measure the latency of single JIT requests.
+
+PolyJITMetrics only stores aggregates of a run, e.g., t_codegen and
+n_requests. This experiment asks libpjit to track every request it handles
+and stores the timings of all requests of a region as one compact array:
+
+    request        When the region requested a specialized variant.
+    compile_start  When the compilation of the variant started.
+    compile_end    When the variant was ready.
+    blocked        How long the caller was blocked by the request.
+
+All values are in nanoseconds, start and end are NaN for cache hits.
+The pj-latency report turns these arrays into histograms and percentiles.
+
+By default, we derive the requests from the trace log of libpjit, the lines
+that the log index of trace_logs recognizes: a 'request' line of a region
+opens a request, the following compile lines mark the start and the end of
+its compilation, a 'variant' line its end, a 'cache hit' line makes it a
+hit and a 'blocked' line ends the blocked time. The resolution is the one
+of the log timestamps (milliseconds for spdlog's default pattern).
+
+libpjit might provide a dedicated request trace as well. Set
+latency.outfile_flag to the option that names its file (like
+-polli-track-metrics-outfile) to read that trace instead.
+"""
+import logging
+import os
+import uuid
+
+import numpy as np
+import sqlalchemy as sa
+import yaml
+
+import benchbuild.extensions as ext
+from benchbuild import settings
+from benchbuild.utils import schema
+from polyjit.experiments import artifacts, polyjit, trace_logs
+
+CFG = settings.CFG
+LOG = logging.getLogger(__name__)
+
+CFG["latency"] = {
+    "outfile_flag": {
+        "default": "",
+        "desc": "libpjit option that names the file of a request trace. "
+                "Empty derives the requests from libpjit's trace log."
+    }
+}
+CFG["latency"].init_from_env()
+
+COLUMNS = ("request", "compile-start", "compile-end", "blocked")
+DTYPE = np.dtype('<f8')
+
+
+class Latency(schema.BASE):
+    """The timings of all JIT requests of a region in a run."""
+    __tablename__ = 'polyjit_latency'
+    id = sa.Column(sa.Integer, primary_key=True)
+    run_id = sa.Column(
+        sa.Integer,
+        sa.ForeignKey("run.id", onupdate="CASCADE", ondelete="CASCADE"),
+        index=True)
+    region = sa.Column(sa.String, index=True)
+    n_requests = sa.Column(sa.Integer)
+    timings = sa.Column(sa.LargeBinary)
+
+
+def encode(timings):
+    """Encode an (n, 4) array of timings as bytes."""
+    return np.ascontiguousarray(timings, dtype=DTYPE).tobytes()
+
+
+def decode(data):
+    """Decode the bytes of an encoded timing array."""
+    return np.frombuffer(data, dtype=DTYPE).reshape(-1, len(COLUMNS))
+
+
+def read_latencies(path):
+    """
+    Read the request trace of libpjit.
+
+    The trace is a YAML document with a list of requests:
+
+        requests:
+          - region-id: main.for.body
+            request: 1000
+            compile-start: 1100
+            compile-end: 5000
+            blocked: 4000
+
+    Returns:
+        A dict that maps region ids to (n, 4) arrays of timings.
+    """
+    with open(path, 'r') as trace_f:
+        trace = yaml.safe_load(trace_f) or {}
+
+    by_region = {}
+    for request in trace.get('requests') or []:
+        row = [
+            float(request[col]) if request.get(col) is not None else np.nan
+            for col in COLUMNS
+        ]
+        by_region.setdefault(str(request.get('region-id')), []).append(row)
+    return {
+        region: np.array(rows, dtype=DTYPE)
+        for region, rows in by_region.items()
+    }
+
+
+def log_latencies(lines):
+    """
+    Derive the requests of each region from the lines of a libpjit log.
+
+    Request times count from the first line we use, nanoseconds
+    since the epoch do not fit into the precision of a double.
+
+    Returns:
+        A dict that maps region ids to (n, 4) arrays of timings.
+    """
+    by_region = {}
+    open_requests = {}
+    start = None
+
+    def close(region):
+        request = open_requests.pop(region, None)
+        if request is not None:
+            by_region.setdefault(region, []).append(request)
+
+    for line in lines:
+        entry = trace_logs.index_line(line)
+        if not entry or not (entry["region"] and entry["event"]) \
+                or entry["timestamp"] is None:
+            continue
+        region = entry["region"]
+        event = entry["event"]
+        start = start or entry["timestamp"]
+        now = (entry["timestamp"] - start).total_seconds() * 1e9
+        if event == "request":
+            close(region)
+            open_requests[region] = [now, np.nan, np.nan, np.nan]
+            continue
+
+        request = open_requests.get(region)
+        if request is None:
+            continue
+        if event.startswith("cache"):
+            if event.endswith("hit"):
+                request[1:3] = [np.nan, np.nan]
+        elif event in ("codegen", "variant") or event.startswith(
+                ("compil", "recompil")):
+            if np.isnan(request[1]) and event != "variant":
+                request[1] = now
+            else:
+                request[2] = now
+        elif event == "blocked":
+            request[3] = now - request[0]
+
+    for region in list(open_requests):
+        close(region)
+    return {
+        region: np.array(rows, dtype=DTYPE)
+        for region, rows in by_region.items()
+    }
+
+
+def read_log_latencies(paths):
+    """The requests of all regions in some libpjit logs."""
+    latencies = {}
+    for path in paths:
+        with open(path, 'rb') as log_f:
+            for region, timings in log_latencies(log_f).items():
+                if region in latencies:
+                    timings = np.concatenate([latencies[region], timings])
+                latencies[region] = timings
+    return latencies
+
+
+def persist_latencies(run_id, latencies, session):
+    session.bulk_insert_mappings(Latency, [{
+        "run_id": run_id,
+        "region": region,
+        "n_requests": len(timings),
+        "timings": encode(timings)
+    } for region, timings in latencies.items()])
+
+
+class CollectLatencies(polyjit.PolyJITConfig):
+    """
+    Track the timings of every JIT request of a run.
+
+    Without latency.outfile_flag, we read the logs that RegisterPolyJITLogs
+    writes into the artifact directory of the run, it needs to be wrapped
+    by us. Runs without requests keep their other results, we only warn.
+    """
+
+    def __init__(self, *extensions, project=None, **kwargs):
+        self.project = project
+        super(CollectLatencies, self).__init__(*extensions, **kwargs)
+
+    def __call__(self, *args, **kwargs):
+        flag = str(CFG["latency"]["outfile_flag"].value)
+        with artifacts.run_artifacts(self.project) as run_dir:
+            outfile = run_dir.path_of(
+                "latencies",
+                'polyjit.{0}.latencies.yml'.format(self.project.name))
+            pjit_args = ["{0:s}='{1:s}'".format(flag, outfile)] \
+                if flag else []
+            with self.argv(PJIT_ARGS=pjit_args):
+                res = self.call_next(*args, **kwargs)
+            logs = [
+                path for kind, path in run_dir.existing().items()
+                if kind == "log"
+            ]
+            artifacts.persist_artifacts(res, run_dir)
+
+        valid_runs = [r for r in res if not r.failed]
+        if not valid_runs:
+            LOG.error("No valid run results to attach our results to.")
+            return res
+        if not flag:
+            latencies = read_log_latencies(logs)
+        elif os.path.exists(outfile):
+            latencies = read_latencies(outfile)
+        else:
+            LOG.warning(
+                "libpjit wrote no request trace to %s, does it support %s?",
+                outfile, flag)
+            return res
+        if not latencies:
+            LOG.warning("Found no JIT requests of %s.", self.project.name)
+            return res
+
+        session = schema.Session()
+        persist_latencies(valid_runs[-1].db_run.id, latencies, session)
+        session.commit()
+        return res
+
+    def __str__(self):
+        return "Collect PolyJIT request latencies"
+
+
+class PolyJITLatency(polyjit.PolyJIT):
+    """Measure the latency distribution of JIT requests."""
+
+    NAME = "pj-latency"
+    SCHEMA = [Latency.__table__]
+
+    def actions_for_project(self, project):
+        project = polyjit.PolyJIT.init_project(project)
+        project.run_uuid = uuid.uuid4()
+
+        project.runtime_extension = \
+            ext.run.RuntimeExtension(project, self, config={
+                "name": "PolyJIT"
+            }) \
+            << polyjit.EnablePolyJIT() \
+            << polyjit.EnableJITTracking(project=project) \
+            << polyjit.RegisterPolyJITLogs(project=project,
+                                           log_level="trace") \
+            << CollectLatencies(project=project) \
+            << polyjit.ClearPolyJITConfig() \
+            << ext.time.RunWithTime()
+
+        return PolyJITLatency.default_runtime_actions(project)
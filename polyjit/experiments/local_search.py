@@ -0,0 +1,266 @@
+"""
+Local search strategies for the sequence experiments.
+
+The neighbourhood of a sequence are all sequences that differ from it in
+exactly one pass. For a sequence of length L over P passes, these are
+L * (P - 1) sequences and every one of them costs a compile. The strategies
+in this module never evaluate a full neighbourhood up front. Neighbours are
+sampled lazily in random order, submitted to a pool in a small window and
+a move is accepted as soon as an acceptable evaluation comes back.
+Outstanding evaluations are cancelled then.
+
+All strategies take an evaluate callable that maps a sequence to its
+fitness value. Lower fitness values are better.
+"""
+import collections
+import concurrent.futures as cf
+import math
+import random
+
+
+def random_neighbours(sequence, pass_space, exclude=None):
+    """
+    Generate the neighbours of a sequence lazily and in random order.
+
+    Args:
+        sequence: The base sequence.
+        pass_space: The passes a position may be replaced with.
+        exclude: Optional predicate (position, pass) -> bool for moves
+            that must not be generated.
+
+    Yields:
+        All sequences that differ from sequence in exactly one position.
+    """
+    passes = list(pass_space)
+    num_moves = len(sequence) * len(passes)
+    for move in random.sample(range(num_moves), num_moves):
+        position, new_pass = divmod(move, len(passes))
+        new_pass = passes[new_pass]
+        if sequence[position] == new_pass:
+            continue
+        if exclude and exclude(position, new_pass):
+            continue
+        neighbour = list(sequence)
+        neighbour[position] = new_pass
+        yield neighbour
+
+
+def evaluate_lazily(pool, evaluate, candidates, accept, window, first_k=1,
+                    limit=None):
+    """
+    Evaluate candidates until first_k of them were accepted.
+
+    At most `window` evaluations are in flight. Results are consumed in the
+    order they complete and every completed evaluation, accepted or not,
+    frees a slot for the next candidate. Once enough candidates were
+    accepted, all outstanding evaluations are cancelled.
+
+    Cancelling only stops evaluations that did not start yet. Keep the
+    window at or below the number of workers of the pool: up to `window`
+    evaluations that already run are finished in the background and their
+    compiles are wasted.
+
+    Args:
+        pool: The executor we submit the evaluations to.
+        evaluate: Maps a candidate to its fitness value.
+        candidates: An iterable of candidates, consumed lazily.
+        accept: Predicate (candidate, fitness) -> bool.
+        window: The maximal number of evaluations in flight, at most the
+            number of workers of pool.
+        first_k: The number of accepted candidates we stop at.
+        limit: The maximal number of candidates we evaluate.
+
+    Returns:
+        A tuple (accepted, evaluated) of lists with (candidate, fitness)
+        pairs. Accepted candidates are sorted by their fitness.
+    """
+    candidates = iter(candidates)
+    accepted = []
+    evaluated = []
+    in_flight = {}
+    submitted = 0
+
+    def submit_next():
+        nonlocal submitted
+        if limit is not None and submitted >= limit:
+            return
+        candidate = next(candidates, None)
+        if candidate is not None:
+            in_flight[pool.submit(evaluate, candidate)] = candidate
+            submitted += 1
+
+    for _ in range(max(1, window)):
+        submit_next()
+
+    try:
+        while in_flight and len(accepted) < first_k:
+            done, _ = cf.wait(in_flight, return_when=cf.FIRST_COMPLETED)
+            for future in done:
+                candidate = in_flight.pop(future)
+                fitness = future.result()
+                evaluated.append((candidate, fitness))
+                if len(accepted) < first_k and accept(candidate, fitness):
+                    accepted.append((candidate, fitness))
+                if len(accepted) < first_k:
+                    submit_next()
+    finally:
+        for future in in_flight:
+            future.cancel()
+
+    accepted.sort(key=lambda pair: pair[1])
+    return accepted, evaluated
+
+
+def climb(sequence, pass_space, evaluate, pool, first_k=1, window=1):
+    """
+    Climb to a local optimum, without scanning full neighbourhoods.
+
+    Every step evaluates random neighbours until first_k of them improve on
+    the current sequence and moves to the best of those. With first_k=1
+    this is a first-improvement hill climber.
+
+    Args:
+        sequence: The start sequence.
+        pass_space: The passes we may choose from.
+        evaluate: Maps a sequence to its fitness value.
+        pool: The executor we submit the evaluations to.
+        first_k: The number of improving neighbours we choose from.
+        window: The maximal number of evaluations in flight.
+
+    Returns:
+        A tuple (local_optimum, fitness).
+    """
+    current, current_fitness = sequence, evaluate(sequence)
+
+    def accept(_, fitness):
+        return fitness < current_fitness
+
+    while True:
+        accepted, _ = evaluate_lazily(pool, evaluate,
+                                      random_neighbours(current, pass_space),
+                                      accept, window, first_k=first_k)
+        if not accepted:
+            return current, current_fitness
+        current, current_fitness = accepted[0]
+
+
+def anneal(sequence,
+           pass_space,
+           evaluate,
+           pool,
+           budget,
+           temperature=1.0,
+           cooling=0.9,
+           window=1):
+    """
+    Search a fit sequence with simulated annealing.
+
+    A neighbour is accepted as soon as its evaluation comes back, if it is
+    not worse than the current sequence, or with probability
+    exp(-delta / temperature) otherwise. The temperature cools down after
+    every accepted move. The search ends, if the budget is exhausted or if
+    no neighbour of the current sequence could be accepted.
+
+    Args:
+        sequence: The start sequence.
+        pass_space: The passes we may choose from.
+        evaluate: Maps a sequence to its fitness value.
+        pool: The executor we submit the evaluations to.
+        budget: The maximal number of neighbour evaluations.
+        temperature: The start temperature.
+        cooling: The factor the temperature decreases with per move.
+        window: The maximal number of evaluations in flight.
+
+    Returns:
+        A tuple (best_sequence, best_fitness).
+    """
+    current, current_fitness = sequence, evaluate(sequence)
+    best, best_fitness = current, current_fitness
+
+    def accept(_, fitness):
+        if fitness <= current_fitness:
+            return True
+        if temperature <= 0:
+            return False
+        delta = fitness - current_fitness
+        return random.random() < math.exp(-delta / temperature)
+
+    while budget > 0:
+        accepted, evaluated = evaluate_lazily(
+            pool, evaluate, random_neighbours(current, pass_space), accept,
+            window, limit=budget)
+        budget -= len(evaluated)
+        if not accepted:
+            break
+
+        current, current_fitness = accepted[0]
+        if current_fitness < best_fitness:
+            best, best_fitness = current, current_fitness
+        temperature *= cooling
+
+    return best, best_fitness
+
+
+def tabu_search(sequence,
+                pass_space,
+                evaluate,
+                pool,
+                budget,
+                tenure=7,
+                sample_size=20,
+                window=1):
+    """
+    Search a fit sequence with tabu search.
+
+    Every step samples up to sample_size non-tabu neighbours lazily. An
+    improving neighbour is taken as soon as its evaluation comes back;
+    otherwise the search moves to the best sampled neighbour, even if it
+    is worse. Moving a position back to a pass it held during the last
+    `tenure` moves is tabu.
+
+    Args:
+        sequence: The start sequence.
+        pass_space: The passes we may choose from.
+        evaluate: Maps a sequence to its fitness value.
+        pool: The executor we submit the evaluations to.
+        budget: The maximal number of neighbour evaluations.
+        tenure: The number of moves a reverted move stays tabu.
+        sample_size: The number of neighbours sampled per step.
+        window: The maximal number of evaluations in flight.
+
+    Returns:
+        A tuple (best_sequence, best_fitness).
+    """
+    current, current_fitness = sequence, evaluate(sequence)
+    best, best_fitness = current, current_fitness
+    tabu = collections.deque(maxlen=max(1, tenure))
+
+    def is_tabu(position, new_pass):
+        return (position, new_pass) in tabu
+
+    def accept(_, fitness):
+        return fitness < current_fitness
+
+    while budget > 0:
+        accepted, evaluated = evaluate_lazily(
+            pool, evaluate,
+            random_neighbours(current, pass_space, exclude=is_tabu), accept,
+            window, limit=min(budget, sample_size))
+        budget -= len(evaluated)
+        if not evaluated:
+            break
+
+        if accepted:
+            neighbour, fitness = accepted[0]
+        else:
+            neighbour, fitness = min(evaluated, key=lambda pair: pair[1])
+
+        position = next(i for i, (old, new) in enumerate(zip(
+            current, neighbour)) if old != new)
+        tabu.append((position, current[position]))
+
+        current, current_fitness = neighbour, fitness
+        if current_fitness < best_fitness:
+            best, best_fitness = current, current_fitness
+
+    return best, best_fitness
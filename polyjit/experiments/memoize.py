@@ -0,0 +1,265 @@
+"""
+Skip configurations we measured already.
+
+A crashed experiment repeats every configuration on the next invocation.
+SkipMeasured fingerprints a configuration and stores the fingerprint as
+'run.fingerprint' in the config of its runs. If all runs of the latest
+invocation with the same fingerprint completed, we return these runs instead
+of executing the configuration again. Runs of an earlier experiment are
+copied into the current one.
+
+The fingerprint covers the digests of all files on the command line, the
+arguments, the environment that controls PolyJIT and OpenMP, and the
+extensions we wrap together with their configuration. Every invocation
+builds in a directory of its own (the experiment id is part of it), so we
+hash paths inside the build directory relative to it. The wrapped
+extensions determine the environment they set up themselves, e.g., the
+PJIT_ARGS of EnablePolyJIT.
+"""
+import hashlib
+import json
+import logging
+import os
+import re
+
+from plumbum import local
+
+from benchbuild import settings
+from benchbuild.extensions import base
+from benchbuild.utils import db, schema
+from polyjit.experiments import build_cache
+
+CFG = settings.CFG
+LOG = logging.getLogger(__name__)
+
+CFG["memoize"] = {
+    "enable": {
+        "default": False,
+        "desc": "Skip configurations that completed in an earlier "
+                "invocation of the same experiment."
+    }
+}
+CFG["memoize"].init_from_env()
+
+FINGERPRINT = "run.fingerprint"
+ENV_PREFIXES = ("PJIT_", "POLLI_", "OMP_", "GOMP_")
+
+# Bookkeeping of the compilestats summary, a copied run is summarized anew.
+NOT_COPIED = ("compilestats_summary_run", )
+
+
+def describe(extension):
+    """Describe an extension chain by its types and configurations."""
+    ext_type = type(extension)
+    return {
+        "type": "{}.{}".format(ext_type.__module__, ext_type.__qualname__),
+        "config": getattr(extension, "config", None),
+        "next": [
+            describe(child)
+            for child in getattr(extension, "next_extensions", [])
+        ]
+    }
+
+
+def relative(arg, root):
+    """Rewrite paths inside root relative to it."""
+    if not root:
+        return arg
+    root = os.path.abspath(root).rstrip(os.sep)
+    return re.sub(re.escape(root) + r"(?=/|$)", ".", arg)
+
+
+def fingerprint(command, args, env, extensions, root=None):
+    """
+    Fingerprint a configuration.
+
+    Args:
+        command: The plumbum command we execute.
+        args: The arguments of the command.
+        env: The environment of the command.
+        extensions: The extensions that execute the command.
+        root: The build directory of the project.
+
+    Returns:
+        A sha256 hex digest.
+    """
+    argv = list(command.formulate()) + [str(arg) for arg in args]
+    key = {
+        "argv": [relative(arg, root) for arg in argv],
+        "files": {
+            relative(arg, root): build_cache.file_digest(arg)
+            for arg in argv if os.path.isfile(arg)
+        },
+        "env": {
+            name: relative(value, root)
+            for name, value in env.items() if name.startswith(ENV_PREFIXES)
+        },
+        "extensions": [describe(extension) for extension in extensions]
+    }
+    return hashlib.sha256(
+        json.dumps(key, sort_keys=True, default=str).encode()).hexdigest()
+
+
+class StoredRun:
+    """A run of an earlier invocation, it mimics a benchbuild RunInfo."""
+
+    def __init__(self, db_run, log, session):
+        self.db_run = db_run
+        self.session = session
+        self.cmd = db_run.command
+        self.retcode = log.status if log and log.status else 0
+        self.stdout = log.stdout if log else ""
+        self.stderr = log.stderr if log else ""
+        self.failed = db_run.status != 'completed'
+        self.payload = None
+
+    @property
+    def has_failed(self):
+        return self.failed
+
+    def __repr__(self):
+        return "<StoredRun: {0}>".format(self.db_run)
+
+
+def find_measured(session, experiment_name, project_name, value):
+    """
+    Find the runs of the latest invocation with the given fingerprint.
+
+    Returns:
+        A list of StoredRun objects, empty if not all of them completed.
+    """
+    query = session.query(schema.Run, schema.RunLog) \
+        .join(schema.Config, schema.Config.run_id == schema.Run.id) \
+        .outerjoin(schema.RunLog, schema.RunLog.run_id == schema.Run.id) \
+        .filter(schema.Config.name == FINGERPRINT) \
+        .filter(schema.Config.value == value) \
+        .filter(schema.Run.experiment_name == experiment_name) \
+        .filter(schema.Run.project_name == project_name) \
+        .order_by(schema.Run.id)
+    runs = query.all()
+    if not runs:
+        return []
+
+    latest_group = runs[-1][0].run_group
+    runs = [(run, log) for run, log in runs if run.run_group == latest_group]
+    if any(run.status != 'completed' for run, _ in runs):
+        return []
+    return [StoredRun(run, log, session) for run, log in runs]
+
+
+def dependents(table):
+    """The tables (and columns) that reference the primary key of table."""
+    return [(child, fk.parent.name)
+            for child in table.metadata.sorted_tables
+            if child.name not in NOT_COPIED
+            for fk in child.foreign_keys if fk.column.table is table]
+
+
+def copy_rows(connection, table, column, old_id, new_id):
+    """
+    Copy all rows of table that reference old_id in column to new_id.
+
+    Rows with a primary key of their own get a new one. We copy the rows
+    that reference them as well, e.g., the region results of a result.
+    """
+    if not connection.dialect.has_table(connection, table.name):
+        return
+    primary_key = list(table.primary_key.columns)
+    own_key = len(primary_key) == 1 and primary_key[0].name != column
+    rows = connection.execute(
+        table.select().where(table.c[column] == old_id)).fetchall()
+    for row in rows:
+        values = dict(row)
+        values[column] = new_id
+        if not own_key:
+            connection.execute(table.insert().values(**values))
+            continue
+        old_key = values.pop(primary_key[0].name)
+        new_key = connection.execute(
+            table.insert().values(**values)).inserted_primary_key[0]
+        for child, child_column in dependents(table):
+            copy_rows(connection, child, child_column, old_key, new_key)
+
+
+def copy_run(session, stored, experiment_group, run_group):
+    """
+    Copy a stored run, and everything attached to it, into an experiment.
+
+    Returns:
+        A StoredRun for the copy.
+    """
+    run = schema.Run.__table__
+    connection = session.connection()
+    values = dict(
+        connection.execute(
+            run.select().where(run.c.id == stored.db_run.id)).first())
+    old_id = values.pop("id")
+    values.update(experiment_group=experiment_group, run_group=run_group)
+    new_id = connection.execute(
+        run.insert().values(**values)).inserted_primary_key[0]
+    for table, column in dependents(run):
+        copy_rows(connection, table, column, old_id, new_id)
+
+    db_run = session.query(schema.Run).get(new_id)
+    log = session.query(schema.RunLog).get(new_id)
+    return StoredRun(db_run, log, session)
+
+
+class SkipMeasured(base.Extension):
+    """
+    Return the stored runs of a configuration that completed before.
+
+    Stored runs of an earlier experiment are copied into the current one,
+    together with all rows that reference them (config, metrics, results,
+    ...). Reports of the current experiment see every configuration, no
+    matter which invocation measured it.
+
+    This needs to be the outermost extension of a chain, nothing that wraps
+    it would see a new measurement otherwise. The extension does nothing,
+    unless `memoize.enable` is set.
+
+    Args:
+        project: The project we run.
+        experiment: The experiment we run in.
+    """
+
+    def __init__(self, *extensions, project=None, experiment=None,
+                 **kwargs):
+        super(SkipMeasured, self).__init__(*extensions, **kwargs)
+        self.project = project
+        self.experiment = experiment
+
+    def __call__(self, binary_command, *args, **kwargs):
+        if not CFG["memoize"]["enable"].value:
+            return self.call_next(binary_command, *args, **kwargs)
+
+        project_name = kwargs.get("project_name", self.project.name)
+        value = fingerprint(binary_command, args, local.env,
+                            self.next_extensions,
+                            root=str(self.project.builddir))
+        session = schema.Session()
+        measured = find_measured(session, self.experiment.name,
+                                 project_name, value)
+        if measured:
+            LOG.info("Skipping %s, measured already in %d runs.",
+                     binary_command, len(measured))
+            copies = [
+                copy_run(session, stored, self.experiment.id,
+                         self.project.run_uuid)
+                if stored.db_run.experiment_group != self.experiment.id
+                else stored for stored in measured
+            ]
+            session.commit()
+            return copies
+
+        res = self.call_next(binary_command, *args, **kwargs)
+        for run_info in res:
+            if getattr(run_info, 'db_run', None) is None:
+                continue
+            db.persist_config(run_info.db_run, session,
+                              {FINGERPRINT: value})
+        session.commit()
+        return res
+
+    def __str__(self):
+        return "Skip measured configurations"
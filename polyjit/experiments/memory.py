@@ -0,0 +1,295 @@
+"""
+Sampled memory timelines of a process tree.
+
+A sampler thread polls /proc for the memory usage (RSS, anonymous memory and
+swap) of a process and all of its descendants. The timeline is stored per
+run as a delta-encoded, compressed array blob.
+"""
+import array
+import logging
+import os
+import sys
+import threading
+import time
+import zlib
+
+import sqlalchemy as sa
+
+from benchbuild import settings
+from benchbuild.utils import schema
+
+CFG = settings.CFG
+LOG = logging.getLogger(__name__)
+
+CFG["memory"] = {
+    "interval": {
+        "default": 0.05,
+        "desc": "Seconds between two samples of the memory timeline."
+    },
+    "threshold": {
+        "default": 1048576,
+        "desc": "Reports show the time a run spent above this RSS in kB."
+    },
+    "deadline": {
+        "default": 86400,
+        "desc": "Seconds after which we stop sampling a run (0: never)."
+    }
+}
+CFG["memory"].init_from_env()
+
+# Columns of a timeline sample.
+COLUMNS = ("time_ms", "rss_kb", "anon_kb", "swap_kb")
+
+
+class MemoryTimeline(schema.BASE):
+    """The sampled memory usage of a measured process of a run."""
+
+    __tablename__ = 'memory_timeline'
+
+    id = sa.Column(sa.Integer, primary_key=True)
+    run_id = sa.Column(
+        sa.Integer,
+        sa.ForeignKey('run.id', onupdate='CASCADE', ondelete='CASCADE'),
+        nullable=False,
+        index=True)
+    interval = sa.Column(sa.Float)
+    samples = sa.Column(sa.Integer)
+    timeline = sa.Column(sa.LargeBinary)
+
+
+def process_tree(pid, proc='/proc'):
+    """Return pid and the pids of all its descendants."""
+    children = {}
+    for entry in os.listdir(proc):
+        if not entry.isdigit():
+            continue
+        try:
+            with open(os.path.join(proc, entry, 'stat')) as stat_f:
+                stat = stat_f.read()
+        except OSError:
+            continue
+        # The command name may contain spaces and parentheses.
+        ppid = int(stat[stat.rfind(')') + 2:].split()[1])
+        children.setdefault(ppid, []).append(int(entry))
+
+    tree = [pid]
+    for parent in tree:
+        tree.extend(children.get(parent, []))
+    return tree
+
+
+def children(pid, proc='/proc'):
+    """
+    Return the pids of the direct children of pid.
+
+    This reads /proc/<pid>/task/<tid>/children, which requires a kernel with
+    CONFIG_PROC_CHILDREN.
+
+    Returns:
+        The list of children, None if the kernel does not provide them.
+    """
+    task_dir = os.path.join(proc, str(pid), 'task')
+    try:
+        tids = os.listdir(task_dir)
+    except OSError:
+        return []
+
+    pids = []
+    for tid in tids:
+        try:
+            with open(os.path.join(task_dir, tid, 'children')) as children_f:
+                pids.extend(int(child) for child in children_f.read().split())
+        except OSError:
+            if os.path.isdir(os.path.join(task_dir, tid)):
+                return None
+    return pids
+
+
+def is_running(pid, proc='/proc'):
+    """Check, if pid exists and did not exit yet."""
+    try:
+        with open(os.path.join(proc, str(pid), 'stat')) as stat_f:
+            stat = stat_f.read()
+    except OSError:
+        return False
+    return stat[stat.rfind(')') + 2] not in 'ZXx'
+
+
+def parse_kb(lines, keys):
+    """Sum up the kB values of the given keys in /proc style lines."""
+    values = dict.fromkeys(keys, 0)
+    for line in lines:
+        key, _, value = line.partition(':')
+        if key in values:
+            values[key] = int(value.split()[0])
+    return [values[key] for key in keys]
+
+
+def read_memory(pid, proc='/proc'):
+    """
+    Read the memory usage of a single process.
+
+    We prefer smaps_rollup and fall back to status on older kernels.
+
+    Returns:
+        A list [rss_kb, anon_kb, swap_kb] or None, if the process is gone.
+    """
+    try:
+        with open(os.path.join(proc, str(pid), 'smaps_rollup')) as smaps:
+            return parse_kb(smaps, ['Rss', 'Anonymous', 'Swap'])
+    except OSError:
+        pass
+    try:
+        with open(os.path.join(proc, str(pid), 'status')) as status:
+            return parse_kb(status, ['VmRSS', 'RssAnon', 'VmSwap'])
+    except OSError:
+        return None
+
+
+class MemorySampler(threading.Thread):
+    """
+    Sample the memory usage of a process tree in the background.
+
+    We walk the tree from its root along the children of each process, so a
+    sample only touches the processes we measure. Kernels without
+    /proc/<pid>/task/<tid>/children fall back to a scan of /proc.
+
+    Sampling ends with stop(), as soon as the root process exits or after
+    the deadline, whatever comes first.
+
+    Args:
+        pid: The root of the process tree.
+        interval: Seconds between two samples.
+        deadline: Seconds after which we stop sampling, None for no limit.
+    """
+
+    def __init__(self, pid, interval, deadline=None):
+        super(MemorySampler, self).__init__(daemon=True)
+        self.pid = pid
+        self.interval = interval
+        self.deadline = deadline
+        self.samples = []
+        self.finished = threading.Event()
+        self.start_time = time.perf_counter()
+
+    def process_tree(self):
+        tree = [self.pid]
+        for parent in tree:
+            pids = children(parent)
+            if pids is None:
+                return process_tree(self.pid)
+            tree.extend(pids)
+        return tree
+
+    def sample(self):
+        totals = [0, 0, 0]
+        for pid in self.process_tree():
+            usage = read_memory(pid)
+            if usage:
+                totals = [t + u for t, u in zip(totals, usage)]
+        elapsed_ms = int((time.perf_counter() - self.start_time) * 1000)
+        self.samples.append([elapsed_ms] + totals)
+
+    def expired(self):
+        if not is_running(self.pid):
+            return True
+        if self.deadline and \
+                time.perf_counter() - self.start_time > self.deadline:
+            LOG.warning("Stopped sampling process %d after %s seconds.",
+                        self.pid, self.deadline)
+            return True
+        return False
+
+    def run(self):
+        self.sample()
+        while not self.finished.wait(self.interval) and not self.expired():
+            self.sample()
+
+    def stop(self):
+        """Stop sampling and return the timeline."""
+        self.finished.set()
+        if self.is_alive():
+            self.join()
+        return self.samples
+
+
+def encode_timeline(samples):
+    """
+    Encode a timeline as compressed array of deltas.
+
+    Memory usage changes slowly compared to the sampling interval, most
+    deltas are small and compress well.
+    """
+    previous = [0] * len(COLUMNS)
+    deltas = array.array('q')
+    for sample in samples:
+        deltas.extend(s - p for s, p in zip(sample, previous))
+        previous = sample
+    if sys.byteorder == 'big':
+        deltas.byteswap()
+    return zlib.compress(deltas.tobytes())
+
+
+def decode_timeline(blob):
+    """Decode a timeline created by encode_timeline."""
+    deltas = array.array('q')
+    deltas.frombytes(zlib.decompress(blob))
+    if sys.byteorder == 'big':
+        deltas.byteswap()
+
+    samples = []
+    current = [0] * len(COLUMNS)
+    for i in range(0, len(deltas), len(COLUMNS)):
+        current = [c + d for c, d in zip(current, deltas[i:i + len(COLUMNS)])]
+        samples.append(current)
+    return samples
+
+
+def timeline_stats(samples, threshold, column=1):
+    """
+    Summarize a column of a timeline.
+
+    Every sample holds its value until the next sample is taken.
+
+    Args:
+        samples: The decoded timeline.
+        threshold: We report the time spent above this value.
+        column: The column we summarize, RSS by default.
+
+    Returns:
+        A tuple (peak, time_weighted_average, seconds_above_threshold).
+    """
+    if not samples:
+        return 0, 0.0, 0.0
+
+    peak = max(sample[column] for sample in samples)
+    weighted = 0
+    above_ms = 0
+    for sample, next_sample in zip(samples, samples[1:]):
+        duration = next_sample[0] - sample[0]
+        weighted += sample[column] * duration
+        if sample[column] > threshold:
+            above_ms += duration
+
+    total_ms = samples[-1][0] - samples[0][0]
+    if total_ms <= 0:
+        return peak, float(samples[-1][column]), 0.0
+    return peak, weighted / total_ms, above_ms / 1000.0
+
+
+def persist_timeline(run, session, interval, samples):
+    """
+    Persist the memory timeline of a measured process of a run.
+
+    Args:
+        run: The run we attach the timeline to.
+        session: The db transaction we belong to.
+        interval: The sampling interval in seconds.
+        samples: The timeline.
+    """
+    session.add(
+        MemoryTimeline(
+            run_id=run.id,
+            interval=interval,
+            samples=len(samples),
+            timeline=encode_timeline(samples)))
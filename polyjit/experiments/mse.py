@@ -4,79 +4,273 @@ Test Maximal Static Expansion.
 This tests the maximal static expansion implementation by
 Nicholas Bonfante (implemented in LLVM/Polly).
 """
-import csv
 import logging
 import os
+import subprocess
+import threading
+import time
 
 import sqlalchemy as sa
+from plumbum.commands.base import BaseCommand
 
 from benchbuild import experiment, extensions, reports, settings
 from benchbuild.utils import schema
-from benchbuild.utils.cmd import time
-from polyjit.experiments import compilestats
+from polyjit.experiments import compilestats, memory
+from polyjit.reports import output
 
 CFG = settings.CFG
 LOG = logging.getLogger(__name__)
 
 
-def mse_persist_time_and_memory(run, session, timings):
+def now_ns():
+    """Monotonic wall clock in nanoseconds."""
+    if hasattr(time, "perf_counter_ns"):
+        return time.perf_counter_ns()
+    return int(time.perf_counter() * 1e9)
+
+
+class Measurement:
+    """Wall time and resource usage of a single child process."""
+
+    def __init__(self, pid):
+        self.pid = pid
+        self.start_ns = now_ns()
+        self.real_ns = None
+        self.rusage = None
+        self.sampler = None
+        self.timeline = None
+
+    @property
+    def finished(self):
+        return self.rusage is not None
+
+    def finish(self, rusage):
+        self.real_ns = now_ns() - self.start_ns
+        self.rusage = rusage
+        if self.sampler:
+            self.timeline = self.sampler.stop()
+
+    def metrics(self):
+        """All measured values as (name, value) pairs."""
+        usage = self.rusage
+        return [
+            ("time.user_s", usage.ru_utime),
+            ("time.system_s", usage.ru_stime),
+            ("time.real_s", self.real_ns / 1e9),
+            ("time.rss", usage.ru_maxrss),
+            ("time.minor_page_faults", usage.ru_minflt),
+            ("time.major_page_faults", usage.ru_majflt),
+            ("time.voluntary_ctx_switches", usage.ru_nvcsw),
+            ("time.involuntary_ctx_switches", usage.ru_nivcsw),
+        ]
+
+
+def exit_code(status):
+    """Convert a wait status to a Popen-style return code."""
+    if os.WIFSIGNALED(status):
+        return -os.WTERMSIG(status)
+    return os.WEXITSTATUS(status)
+
+
+class RusageProcess:
+    """
+    A child process that we reap ourselves with os.wait4.
+
+    Wraps the Popen-like object plumbum returns. Waiting, polling and
+    communicating all go through os.wait4 on the pid of the child, the
+    wrapped Popen only learns the return code from us. Everything else is
+    delegated to the wrapped object.
+    """
+
+    def __init__(self, proc, measurement):
+        self.proc = proc
+        self.popen = getattr(proc, "_proc", proc)
+        self.measurement = measurement
+
+    def __getattr__(self, name):
+        return getattr(self.proc, name)
+
+    def _wait4(self, options):
+        if self.popen.returncode is not None:
+            return self.popen.returncode
+        try:
+            pid, status, rusage = os.wait4(self.pid, options)
+        except ChildProcessError:
+            LOG.warning("Process %d was reaped by someone else.", self.pid)
+            self.popen.returncode = 0
+            return 0
+        if pid == self.pid:
+            self.measurement.finish(rusage)
+            self.popen.returncode = exit_code(status)
+        return self.popen.returncode
+
+    def poll(self):
+        return self._wait4(os.WNOHANG)
+
+    def wait(self, timeout=None):
+        if timeout is None:
+            return self._wait4(0)
+
+        deadline = time.monotonic() + timeout
+        while self.poll() is None:
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                raise subprocess.TimeoutExpired(self.args, timeout)
+            time.sleep(min(remaining, 0.005))
+        return self.popen.returncode
+
+    def communicate(self, input=None, timeout=None):
+        output = {}
+
+        def read(name, stream):
+            output[name] = stream.read()
+            stream.close()
+
+        readers = [
+            threading.Thread(target=read, args=(name, stream), daemon=True)
+            for name, stream in (("stdout", self.stdout),
+                                 ("stderr", self.stderr))
+            if stream is not None and not stream.closed
+        ]
+        for reader in readers:
+            reader.start()
+        if self.stdin is not None and not self.stdin.closed:
+            if input:
+                self.stdin.write(input)
+            self.stdin.close()
+
+        self.wait(timeout)
+        for reader in readers:
+            reader.join()
+        return output.get("stdout"), output.get("stderr")
+
+
+class RusageCommand(BaseCommand):
+    """
+    Measure every process a command spawns.
+
+    This does not start an additional process, the measurements are taken
+    when the child process is reaped. If a sample interval is given, a
+    background thread samples the memory timeline of the process tree.
+
+    Binding arguments returns a new RusageCommand that keeps its own
+    measurements, so every run can find the processes it started. The
+    measurements are also collected by the unbound command.
     """
-    Persist the memory results in the database.
+
+    __slots__ = ("cmd", "measurements", "sample_interval", "parent")
+
+    def __init__(self, cmd, sample_interval=None, parent=None):
+        self.cmd = cmd
+        self.measurements = []
+        self.sample_interval = sample_interval
+        self.parent = parent
+
+    def __repr__(self):
+        return "RusageCommand({0!r})".format(self.cmd)
+
+    def _get_encoding(self):
+        return self.cmd._get_encoding()
+
+    def bound_command(self, *args):
+        return RusageCommand(
+            self.cmd.bound_command(*args), self.sample_interval, parent=self)
+
+    def formulate(self, level=0, args=()):
+        return self.cmd.formulate(level, args)
+
+    @property
+    def machine(self):
+        return self.cmd.machine
+
+    def popen(self, args=(), **kwargs):
+        proc = self.cmd.popen(args, **kwargs)
+        if not isinstance(getattr(proc, "_proc", proc), subprocess.Popen):
+            LOG.warning("Cannot measure the resource usage of %s", proc)
+            return proc
+
+        measurement = Measurement(proc.pid)
+        if self.sample_interval:
+            measurement.sampler = memory.MemorySampler(
+                proc.pid, self.sample_interval,
+                float(CFG["memory"]["deadline"].value) or None)
+            measurement.sampler.start()
+        cmd = self
+        while cmd is not None:
+            cmd.measurements.append(measurement)
+            cmd = cmd.parent
+        return RusageProcess(proc, measurement)
+
+
+def mse_persist_time_and_memory(run, session, measurements):
+    """
+    Persist the time and memory results in the database.
+
+    All metrics are added in one batch.
 
     Args:
         run: The run we attach this timing results to.
         session: The db transaction we belong to.
-        timings: The timing measurements we want to store.
+        measurements: The measurements we want to store.
     """
-
-    for timing in timings:
-        session.add(schema.Metric(name="time.user_s",
-                                  value=timing[0],
-                                  run_id=run.id))
-        session.add(schema.Metric(name="time.system_s",
-                                  value=timing[1],
-                                  run_id=run.id))
-        session.add(schema.Metric(name="time.real_s",
-                                  value=timing[2],
-                                  run_id=run.id))
-        session.add(schema.Metric(name="time.rss",
-                                  value=timing[3],
-                                  run_id=run.id))
+    session.add_all([
+        schema.Metric(name=name, value=value, run_id=run.id)
+        for measurement in measurements
+        for name, value in measurement.metrics()
+    ])
 
 
 class MeasureTimeAndMemory(extensions.base.Extension):
-    """Wrap a command with time and store the timings in the database."""
+    """
+    Measure time and memory of a command and store them in the database.
+
+    The resource usage comes straight from os.wait4 on the child process,
+    the wall time from a monotonic clock. We do not need /usr/bin/time and
+    we do not parse the output of the command. Every run stores the
+    measurements of the processes its own command started.
+
+    With sample_memory, we also store the memory timeline of each run.
+    """
+
+    def __init__(self, *extensions, sample_memory=False, **kwargs):
+        super(MeasureTimeAndMemory, self).__init__(*extensions, **kwargs)
+        self.sample_memory = sample_memory
+
     def __call__(self, binary_command, *args, may_wrap=True, **kwargs):
-        time_tag = "BENCHBUILD: "
-        if may_wrap:
-            run_cmd = time["-f", time_tag + "%U-%S-%e-%M", binary_command]
-
-        def handle_timing(run_infos):
-            """Takes care of the formating for the timing statistics."""
-            session = schema.Session()
-            for run_info in run_infos:
-                LOG.debug("Persisting time for '%s'", run_info)
-                if may_wrap:
-                    timings = time.fetch_time_output(
-                        time_tag,
-                        time_tag + "{:g}-{:g}-{:g}-{:g}",
-                        run_info.stderr.split("\n"))
-                    if timings:
-                        mse_persist_time_and_memory(
-                            run_info.db_run, session, timings)
-                    else:
-                        LOG.warning("No timing information found.")
-            session.commit()
-            return run_infos
+        if not may_wrap:
+            return self.call_next(binary_command, *args, **kwargs)
 
+        interval = None
+        if self.sample_memory:
+            interval = float(CFG["memory"]["interval"].value)
+        run_cmd = RusageCommand(binary_command, interval)
         res = self.call_next(run_cmd, *args, **kwargs)
-        return handle_timing(res)
+
+        session = schema.Session()
+        for run_info in res:
+            if not getattr(run_info, "db_run", None):
+                continue
+            measured = getattr(run_info.cmd, "measurements", None)
+            if measured is None:
+                LOG.warning("Cannot find the processes of '%s'", run_info)
+                continue
+            measurements = [m for m in measured if m.finished]
+            LOG.debug("Persisting time for '%s'", run_info)
+            mse_persist_time_and_memory(run_info.db_run, session,
+                                        measurements)
+            for measurement in measurements:
+                if measurement.timeline:
+                    memory.persist_timeline(run_info.db_run, session,
+                                            interval, measurement.timeline)
+        session.commit()
+        return res
 
 
 class PollyMSE(experiment.Experiment):
     """The polly experiment."""
 
     NAME = "polly-mse"
+    SCHEMA = [memory.MemoryTimeline.__table__]
 
     def actions_for_project(self, project):
         """Compile & Run the experiment with -O3 enabled."""
@@ -95,38 +289,75 @@ class PollyMSE(experiment.Experiment):
             MeasureTimeAndMemory(
                 extensions.run.RuntimeExtension(project, self,
                                      config={
-                                         'jobs': int(CFG["jobs"].value)}))
+                                         'jobs': int(CFG["jobs"].value)}),
+                sample_memory=True)
 
         return self.default_runtime_actions(project)
 
 
 class PollyMSEReport(reports.Report):
+    """
+    Summarize the memory timelines of the polly-mse experiment.
+
+    For every project we report the peak and the time-weighted average of
+    the RSS, anonymous memory and swap, as well as the seconds the RSS
+    spent above the configured threshold (memory.threshold, in kB).
+    A run with several measured processes has one timeline per process,
+    each of them counts as a sample of the project.
+    """
+
     NAME = "polly-mse"
     SUPPORTED_EXPERIMENTS = ["polly-mse"]
 
-    QUERY_EVAL = \
+    QUERY_TIMELINES = \
         sa.sql.select([
-            sa.column('project_name'),
-            sa.column('name'),
-            sa.column('bvalue'),
-            sa.column('mvalue')
+            schema.Run.project_name,
+            schema.Run.id,
+            memory.MemoryTimeline.timeline
         ]).\
         select_from(
-            sa.func.polly_mse_eval(sa.sql.bindparam('exp_ids'))
-        )
+            sa.join(memory.MemoryTimeline, schema.Run,
+                    memory.MemoryTimeline.run_id == schema.Run.id)
+        ).\
+        where(schema.Run.experiment_group.in_(
+            sa.sql.bindparam('exp_ids', expanding=True))).\
+        order_by(schema.Run.project_name)
+
+    HEADER = ("project_name", "runs", "peak_rss_kb", "avg_rss_kb",
+              "peak_anon_kb", "avg_anon_kb", "peak_swap_kb", "avg_swap_kb",
+              "above_threshold_s")
 
     def report(self):
-        qry = PollyMSEReport.QUERY_EVAL.unique_params(
+        threshold = int(CFG["memory"]["threshold"].value)
+        qry = PollyMSEReport.QUERY_TIMELINES.unique_params(
             exp_ids=self.experiment_ids)
-        return self.session.execute(qry).fetchall()
+
+        per_project = {}
+        run_ids = {}
+        for project_name, run_id, blob in self.session.execute(qry):
+            run_ids.setdefault(project_name, set()).add(run_id)
+            samples = memory.decode_timeline(blob)
+            stats = [
+                memory.timeline_stats(samples, threshold, column)
+                for column in range(1, len(memory.COLUMNS))
+            ]
+            per_project.setdefault(project_name, []).append(stats)
+
+        res = []
+        for project_name in sorted(per_project):
+            runs = per_project[project_name]
+            row = [project_name, len(run_ids[project_name])]
+            for column in range(len(memory.COLUMNS) - 1):
+                row.append(max(run[column][0] for run in runs))
+                row.append(sum(run[column][1] for run in runs) / len(runs))
+            row.append(sum(run[0][2] for run in runs) / len(runs))
+            res.append(tuple(row))
+        return res
 
     def generate(self):
         fname = os.path.abspath(self.out_path)
         fname = "{prefix}_mse{ending}".format(
             prefix=os.path.splitext(fname)[0],
             ending=os.path.splitext(fname)[-1])
-        res = self.report()
-        with open(fname, 'w') as csv_f:
-            csv_writer = csv.writer(csv_f)
-            csv_writer.writerows([("projct_name", "name", "bvalue", "mvalue")])
-            csv_writer.writerows(res)
+        output.write(fname, PollyMSEReport.HEADER,
+                     output.chunked(self.report()))
@@ -0,0 +1,219 @@
+"""
+Adaptive operator selection for the genetic sequence searches.
+
+Instead of fixed mutation rates and a fixed crossover, a multi-armed bandit
+chooses the variation operator for every offspring. An operator is credited
+with the relative fitness improvement of its offspring over its parents, once
+the offspring has been compiled. A crossover has two parents and is
+measured against the better one, a mutation against the parent it mutated. Because every offspring costs exactly one
+compile, the mean reward of an arm is the improvement per compile that the
+operator produced so far.
+
+Two bandit policies are available:
+    ucb - UCB1, deterministic optimism in the face of uncertainty.
+    thompson - Thompson sampling with a Beta posterior per operator.
+"""
+import math
+import random
+import sys
+
+
+class UCB1:
+    """
+    UCB1 policy over a fixed number of arms.
+
+    A genetic search selects operators for a whole generation before any
+    offspring is evaluated. Therefore, we count an arm as soon as it is
+    selected and not when its reward arrives, otherwise a generation would
+    only ever explore the first untried arm.
+    """
+
+    def __init__(self, num_arms, exploration=math.sqrt(2)):
+        self.exploration = exploration
+        self.pulls = [0] * num_arms
+        self.counts = [0] * num_arms
+        self.rewards = [0.0] * num_arms
+
+    def select(self):
+        """Select the arm with the highest upper confidence bound."""
+        untried = [arm for arm, pulls in enumerate(self.pulls) if not pulls]
+        if untried:
+            arm = untried[0]
+        else:
+            total = sum(self.pulls)
+
+            def bound(arm):
+                return self.mean(arm) + self.exploration * math.sqrt(
+                    math.log(total) / self.pulls[arm])
+
+            arm = max(range(len(self.pulls)), key=bound)
+        self.pulls[arm] += 1
+        return arm
+
+    def update(self, arm, reward):
+        """Credit the arm with a reward in [0, 1]."""
+        self.counts[arm] += 1
+        self.rewards[arm] += reward
+
+    def mean(self, arm):
+        """The mean reward an arm produced so far."""
+        if not self.counts[arm]:
+            return 0.0
+        return self.rewards[arm] / self.counts[arm]
+
+
+class ThompsonSampling:
+    """Thompson sampling with a Beta posterior over each arm's reward."""
+
+    def __init__(self, num_arms, rng=random):
+        self.rng = rng
+        self.alpha = [1.0] * num_arms
+        self.beta = [1.0] * num_arms
+        self.counts = [0] * num_arms
+
+    def select(self):
+        """Select the arm with the highest sampled reward."""
+        samples = [
+            self.rng.betavariate(a, b) for a, b in zip(self.alpha, self.beta)
+        ]
+        return max(range(len(samples)), key=samples.__getitem__)
+
+    def update(self, arm, reward):
+        """Credit the arm with a (fractional) success in [0, 1]."""
+        self.counts[arm] += 1
+        self.alpha[arm] += reward
+        self.beta[arm] += 1.0 - reward
+
+    def mean(self, arm):
+        """The posterior mean of an arm's reward."""
+        return self.alpha[arm] / (self.alpha[arm] + self.beta[arm])
+
+
+POLICIES = {"ucb": UCB1, "thompson": ThompsonSampling}
+
+
+def mutation(probability):
+    """Create a mutation operator with the given probability per gene."""
+
+    def mutate(parent, _, gene_pool):
+        return [
+            random.choice(gene_pool) if random.random() < probability else g
+            for g in parent
+        ]
+
+    mutate.__name__ = "mutate-{:d}%".format(int(probability * 100))
+    return mutate
+
+
+def half_swap_crossover(parent, mate, _):
+    """Recombine the first half of one parent with the other's second half."""
+    half_index = len(parent) // 2
+    return parent[:half_index] + mate[half_index:]
+
+
+def one_point_crossover(parent, mate, _):
+    """Recombine both parents at a random position."""
+    index = random.randint(1, max(1, len(parent) - 1))
+    return parent[:index] + mate[index:]
+
+
+def uniform_crossover(parent, mate, _):
+    """Pick each gene from a randomly chosen parent."""
+    return [random.choice(genes) for genes in zip(parent, mate)]
+
+
+CROSSOVERS = (half_swap_crossover, one_point_crossover, uniform_crossover)
+
+DEFAULT_OPERATORS = [
+    mutation(0.05),
+    mutation(0.10),
+    mutation(0.20)
+] + list(CROSSOVERS)
+
+
+def relative_improvement(parent_fitness, child_fitness):
+    """
+    The improvement of the child over its parent, clipped to [0, 1].
+
+    Lower fitness values are better.
+    """
+    if child_fitness >= parent_fitness:
+        return 0.0
+    if parent_fitness <= 0:
+        return 1.0
+    return min(1.0, (parent_fitness - child_fitness) / parent_fitness)
+
+
+class AdaptiveOperators:
+    """
+    Generate offspring with bandit-selected variation operators.
+
+    Args:
+        gene_pool: The genes a mutation may choose from.
+        seq_to_fitness: Maps str(sequence) to its known fitness value.
+        policy: The name of the bandit policy, see `POLICIES`.
+        operators: The operators the bandit chooses from.
+    """
+
+    def __init__(self,
+                 gene_pool,
+                 seq_to_fitness,
+                 policy="ucb",
+                 operators=None):
+        self.gene_pool = gene_pool
+        self.seq_to_fitness = seq_to_fitness
+        self.operators = operators if operators else DEFAULT_OPERATORS
+        self.policy = POLICIES[policy](len(self.operators))
+        self.pending = []
+
+    def fitness(self, sequence):
+        return self.seq_to_fitness.get(str(sequence), sys.maxsize)
+
+    def offspring(self, parent, mates):
+        """
+        Create one offspring of parent.
+
+        Crossover operators (see `CROSSOVERS`) recombine the parent with a
+        random mate, all other operators ignore the mate. The offspring is
+        credited to the operator, as soon as its fitness becomes known, see
+        `credit`.
+        """
+        arm = self.policy.select()
+        operator = self.operators[arm]
+        mate = random.choice(mates) if mates else parent
+        child = list(operator(list(parent), mate, self.gene_pool))
+
+        parent_fitness = self.fitness(parent)
+        if operator in CROSSOVERS:
+            parent_fitness = min(parent_fitness, self.fitness(mate))
+        self.pending.append((arm, parent_fitness, str(child)))
+        return child
+
+    def credit(self):
+        """Credit all operators whose offspring has been evaluated."""
+        unresolved = []
+        for arm, parent_fitness, key in self.pending:
+            if key in self.seq_to_fitness:
+                self.policy.update(
+                    arm,
+                    relative_improvement(parent_fitness,
+                                         self.seq_to_fitness[key]))
+            else:
+                unresolved.append((arm, parent_fitness, key))
+        self.pending = unresolved
+
+    def forget(self):
+        """
+        Drop all offspring that were never evaluated.
+
+        The searches call this after `credit` in every generation, offspring
+        that did not make it into the evaluated population never resolve.
+        """
+        self.pending = []
+
+    def __str__(self):
+        return ", ".join([
+            "{0}: {1:d}x {2:.3f}".format(op.__name__, self.policy.counts[i],
+                                         self.policy.mean(i))
+            for i, op in enumerate(self.operators)
+        ])
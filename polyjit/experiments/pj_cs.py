@@ -6,7 +6,7 @@ class Compilestats(polyjit.PolyJIT):
     """Gather compilestats, with enabled JIT."""
 
     NAME = "pj-cs"
-    SCHEMA = [compilestats.CompileStat.__table__]
+    SCHEMA = compilestats.TABLES
 
     def actions_for_project(self, project):
         project = polyjit.PolyJIT.init_project(project)
@@ -1,27 +1,51 @@
-import copy
-import uuid
+import concurrent.futures as cf
+import itertools
+import re
 
+import pandas as pd
 import plumbum as pb
 import sqlalchemy as sa
 
 from benchbuild import extensions as ext
-from benchbuild import likwid, settings
-from benchbuild.utils import actions, db, schema
+from benchbuild import settings
+from benchbuild.utils import db, schema
 from benchbuild.utils.cmd import likwid_perfctr, rm
 from polyjit.experiments import polyjit as pj
+from polyjit.experiments import topology
 
 CFG = settings.CFG
 
+CFG["likwid"] = {
+    "groups": {
+        "default": ["CLOCK"],
+        "desc": "List of likwid performance groups we measure, e.g., "
+                "CLOCK, MEM, FLOPS_DP or L3."
+    }
+}
+CFG["likwid"].init_from_env()
+
+# Rows of likwid's output that do not hold measurements.
+IGNORED_ROWS = ["1", "Region Info", "Event", "Metric", "CPU clock"]
+
+# Metrics we sum up over all cores of a region at ingestion.
+DERIVED_METRICS = re.compile(r"bandwidth|data volume", re.IGNORECASE)
+DERIVED_CORE = "total"
+
 
 class RunWithLikwid(ext.run.RuntimeExtension):
     """
     Run the given file wrapped by likwid.
 
+    We measure every performance group with every core count and parse
+    likwid's output in the background, while the next measurement runs.
+
     Args:
         project: The benchbuild.project.
         experiment: The benchbuild.experiment.
-        config: The benchbuild.settings.config.
-        jobs: Number of cores we should use for this exection.
+        config: The benchbuild.settings.config. 'jobs' is a single core
+            count or a list of core counts. 'groups' overrides the likwid
+            performance groups of the configuration. Every run passes its
+            own config ('jobs' and 'name') to the wrapped extensions.
         run_f: The file we want to execute.
         args: List of arguments that should be passed to the wrapped binary.
         **kwargs: Dictionary with our keyword args. We support the following
@@ -36,26 +60,44 @@ class RunWithLikwid(ext.run.RuntimeExtension):
     def __call__(self, binary_command, *args, may_wrap=True, **kwargs):
         self.project.name = kwargs.get("project_name", self.project.name)
 
-        likwid_f = self.project.name + ".txt"
         jobs = self.config['jobs']
+        core_counts = jobs if isinstance(jobs, list) else [jobs]
+        groups = self.config.get('groups', CFG["likwid"]["groups"].value)
+
         res = []
-        for group in ["CLOCK"]:
-            run_cmd = \
-                likwid_perfctr["-O", "-o", likwid_f, "-m",
-                               "-C", "0-{0:d}".format(jobs),
-                               "-g", group, binary_command]
+        measurements = []
+        with cf.ThreadPoolExecutor(max_workers=1) as pool:
+            for group, jobs in itertools.product(groups, core_counts):
+                cores = topology.format_cpu_list(topology.core_set(jobs))
+                likwid_f = "{0}.{1}.{2:d}.txt".format(self.project.name,
+                                                      group, jobs)
+                run_cmd = \
+                    likwid_perfctr["-O", "-o", likwid_f, "-m",
+                                   "-C", cores,
+                                   "-g", group, binary_command]
 
-            with pb.local.env(POLLI_ENABLE_LIKWID=1):
-                res.extend(self.call_next(run_cmd, *args, **kwargs))
+                # The inner extensions persist the config of each run.
+                for extension in self.next_extensions:
+                    extension.config = {
+                        "jobs": jobs,
+                        "name": "{0}.{1:d}".format(group, jobs)
+                    }
+                with pb.local.env(POLLI_ENABLE_LIKWID=1):
+                    run_infos = self.call_next(run_cmd, *args, **kwargs)
+                res.extend(run_infos)
+                measurements.append((run_infos, {
+                    "cores": str(jobs),
+                    "cores.pinned": cores,
+                    "likwid.group": group
+                }, likwid_f, pool.submit(read_perfcounters, likwid_f)))
 
-            likwid_measurement = likwid.perfcounters(likwid_f)
-            for run_info in res:
+        for run_infos, config, likwid_f, parsed in measurements:
+            likwid_measurement = with_derived_metrics(parsed.result())
+            for run_info in run_infos:
                 persist_likwid(run_info.db_run, run_info.session,
                                likwid_measurement)
-                db.persist_config(run_info.db_run, run_info.session, {
-                    "cores": str(jobs),
-                    "likwid.group": group
-                })
+                db.persist_config(run_info.db_run, run_info.session, config)
+                run_info.session.commit()
             rm("-f", likwid_f)
         return res
 
@@ -74,6 +116,122 @@ class Likwid(schema.BASE):
         primary_key=True)
 
 
+def read_blocks(lines):
+    """
+    Split likwid's CSV output into its STRUCT and TABLE blocks.
+
+    A TABLE block starts with its header row.
+
+    Returns:
+        A list of (kind, rows) tuples, each row is a list of columns.
+    """
+    blocks = []
+    lines = iter(lines)
+    for line in lines:
+        fragments = line.strip().split(",")
+        if fragments[0] == "STRUCT" and len(fragments) >= 3:
+            num_lines = int(fragments[2].strip())
+        elif fragments[0] == "TABLE" and len(fragments) >= 4:
+            num_lines = int(fragments[3].strip()) + 1
+        else:
+            continue
+        rows = [
+            row.strip().split(",")
+            for row in itertools.islice(lines, num_lines)
+        ]
+        blocks.append((fragments[0], rows))
+    return blocks
+
+
+def melt(region, cores, rows):
+    """
+    Turn the rows of a likwid block into a long table of measurements.
+
+    Args:
+        region: The region all rows belong to.
+        cores: The core names of the value columns.
+        rows: Lists of a metric name, followed by one value per core.
+
+    Returns:
+        A DataFrame with the columns region, metric, core and value.
+    """
+    width = len(cores)
+    frame = pd.DataFrame(
+        [(row[1:] + [""] * width)[:width] for row in rows],
+        index=[row[0] for row in rows],
+        columns=range(width))
+    frame = frame[~frame.index.isin(IGNORED_ROWS)]
+    used = [i for i, core in enumerate(cores) if core]
+    if frame.empty or not used:
+        return pd.DataFrame(columns=["region", "metric", "core", "value"])
+    frame = frame[used].rename(columns=dict(enumerate(cores)))
+
+    values = pd.to_numeric(frame.stack(), errors="coerce").dropna()
+    values.index.names = ["metric", "core"]
+    values = values.rename("value").reset_index()
+    values.insert(0, "region", region)
+    return values
+
+
+def parse_perfcounters(lines):
+    """
+    Get all measurements from likwid's CSV output.
+
+    Likwid prints an info struct, followed by one struct per marker region.
+    Each region struct is followed by tables of raw events and of derived
+    metrics.
+
+    Returns:
+        A DataFrame with the columns region, metric, core and value.
+    """
+    frames = []
+    region = None
+    for kind, rows in read_blocks(lines)[1:]:
+        if kind == "STRUCT":
+            struct = {row[0]: row[1:] for row in rows}
+            if "1" not in struct or "Region Info" not in struct:
+                region = None
+                continue
+            region = struct["1"][1]
+            frames.append(melt(region, struct["Region Info"], rows))
+        elif region is not None and rows:
+            header = rows[0]
+            if header[0] == "Event":
+                # Skip the column with the counter names.
+                frames.append(
+                    melt(region, header[2:],
+                         [row[:1] + row[2:] for row in rows[1:]]))
+            elif header[0] == "Metric":
+                frames.append(melt(region, header[1:], rows[1:]))
+
+    if not frames:
+        return pd.DataFrame(columns=["region", "metric", "core", "value"])
+    measurements = pd.concat(frames, ignore_index=True)
+    return measurements.drop_duplicates(
+        ["region", "metric", "core"], keep="last").reset_index(drop=True)
+
+
+def read_perfcounters(infile):
+    """Get all measurements from a file with likwid's CSV output."""
+    with open(infile, 'r') as in_file:
+        return parse_perfcounters(in_file)
+
+
+def with_derived_metrics(measurements):
+    """
+    Add the sum over all cores of bandwidth and data volume metrics.
+
+    The sums are stored with the core 'total'.
+    """
+    derived = measurements[measurements.metric.str.contains(DERIVED_METRICS)]
+    if derived.empty:
+        return measurements
+    totals = derived.groupby(["region", "metric"],
+                             as_index=False, sort=False)["value"].sum()
+    totals.insert(2, "core", DERIVED_CORE)
+    return pd.concat([measurements, totals], ignore_index=True)
+
+
 def persist_likwid(run, session, measurements):
     """
     Persist all likwid results.
@@ -81,12 +239,11 @@ def persist_likwid(run, session, measurements):
     Args:
         run: The run we attach our measurements to.
         session: The db transaction we belong to.
-        measurements: The likwid measurements we want to store.
+        measurements: The likwid measurements we want to store, a DataFrame
+            with the columns region, metric, core and value.
     """
-    for (region, name, core, value) in measurements:
-        db_measurement = Likwid(
-            metric=name, region=region, value=value, core=core, run_id=run.id)
-        session.add(db_measurement)
+    session.bulk_insert_mappings(
+        Likwid, measurements.assign(run_id=run.id).to_dict("records"))
 
 
 class PJITlikwid(pj.PolyJIT):
@@ -96,7 +253,8 @@ class PJITlikwid(pj.PolyJIT):
     This instruments all projects with likwid instrumentation API calls
     in key regions of the JIT.
 
-    This allows for arbitrary profiling of PolyJIT's overhead and run-time
+    This allows for arbitrary profiling of PolyJIT's overhead and run-time.
+    We compile once and measure all likwid groups with 1..jobs cores.
     """
 
     NAME = "pj-likwid"
@@ -106,15 +264,11 @@ class PJITlikwid(pj.PolyJIT):
         project = pj.PolyJIT.init_project(project)
         project.cflags = ["-DLIKWID_PERFMON"] + project.cflags
 
-        actns = []
-        for i in range(1, int(str(CFG["jobs"])) + 1):
-            cp = copy.deepcopy(project)
-            cp.run_uuid = uuid.uuid4()
-            cp.runtime_extension = \
-                RunWithLikwid(
-                    cp, self,
-                    ext.run.RuntimeExtension(cp, self, config={'jobs': i}),
-                    config={'jobs': i})
-
-            actns.append(actions.RequireAll(self.default_runtime_actions(cp)))
-        return actns
+        cores = list(range(1, int(str(CFG["jobs"])) + 1))
+        project.runtime_extension = \
+            RunWithLikwid(
+                project, self,
+                ext.run.RuntimeExtension(project, self, config={}),
+                config={'jobs': cores})
+
+        return self.default_runtime_actions(project)
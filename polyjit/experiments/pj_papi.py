@@ -5,7 +5,7 @@ from plumbum import local
 
 from benchbuild import extensions, settings
 from benchbuild.utils import db, run
-from polyjit.experiments import compilestats, polyjit
+from polyjit.experiments import build_matrix, compilestats, polyjit
 
 CFG = settings.CFG
 
@@ -88,12 +88,14 @@ class PJITpapi(polyjit.PolyJIT):
         project.cflags = ["-mllvm", "-polli-instrument"] + project.cflags
         project.ldflags = project.ldflags + ["-lpprof"]
 
-        actns = []
+        # All variants share one build, see build_matrix.
+        project.compiler_extension = extensions.run.WithTimeout(
+            compilestats.ExtractCompileStats(project, self))
+
+        variants = []
         for i in range(1, int(str(CFG["jobs"])) + 1):
             cp = copy.deepcopy(project)
-            cp.compiler_extension = \
-                extensions.run.WithTimeout(compilestats.ExtractCompileStats(cp, self))
             cp.runtime_extension = partial(run_with_papi, cp, self, CFG, i)
-            actns.extend(self.default_runtime_actions(cp))
+            variants.append(cp)
 
-        return actns
+        return build_matrix.build_matrix(variants)
@@ -8,7 +8,7 @@ from plumbum import local
 from benchbuild import settings
 from benchbuild.utils import run
 from benchbuild.utils.cmd import perf
-from polyjit.experiments import polyjit
+from polyjit.experiments import build_matrix, polyjit
 
 CFG = settings.CFG
 
@@ -63,10 +63,10 @@ class PJITperf(polyjit.PolyJIT):
     def actions_for_project(self, project):
         project = polyjit.PolyJIT.init_project(project)
 
-        actns = []
+        variants = []
         for i in range(1, int(str(CFG["jobs"])) + 1):
             cp = copy.deepcopy(project)
             cp.run_uuid = uuid.uuid4()
             cp.runtime_extension = ft.partial(run_with_perf, cp, self, CFG, i)
-            actns.extend(self.default_runtime_actions(cp))
-        return actns
+            variants.append(cp)
+        return build_matrix.build_matrix(variants)
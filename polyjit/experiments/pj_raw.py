@@ -2,7 +2,8 @@ import copy
 import uuid
 
 from benchbuild import extensions, settings
-from polyjit.experiments import polyjit
+from polyjit.experiments import (build_matrix, polyjit, repetition, topology,
+                                 trace_logs)
 
 CFG = settings.CFG
 
@@ -19,23 +20,24 @@ class PJITRaw(polyjit.PolyJIT):
 
         project = polyjit.PolyJIT.init_project(project)
 
-        actns = []
+        variants = []
         for i in range(2, int(str(CFG["jobs"])) + 1):
             cp = copy.deepcopy(project)
             cp.run_uuid = uuid.uuid4()
-            cp.cflags += ["-mllvm", "-polly-num-threads={0}".format(i)]
+            cfg = {
+                "jobs": i,
+                "cores": str(i-1),
+                "cores-config": str(i),
+                "recompilation": "enabled"}
             cp.runtime_extension = \
-                extensions.run.RuntimeExtension(
-                    cp, self, config={
-                        "jobs": i,
-                        "cores": str(i-1),
-                        "cores-config": str(i),
-                        "recompilation": "enabled"}) \
+                extensions.run.RuntimeExtension(cp, self, config=cfg) \
+                << extensions.run.SetThreadLimit(config=cfg) \
+                << topology.PinCores(config=cfg) \
                 << polyjit.EnablePolyJIT() \
+                << polyjit.RegisterPolyJITLogs(project=cp) \
+                << trace_logs.StoreLogs(project=cp) \
                 << polyjit.ClearPolyJITConfig() \
                 << extensions.time.RunWithTime() \
-                << polyjit.RegisterPolyJITLogs() \
-                << extensions.log.LogAdditionals()
-
-            actns.extend(self.default_runtime_actions(cp))
-        return actns
+                << repetition.RepeatUntilStable()
+            variants.append(cp)
+        return build_matrix.build_matrix(variants)
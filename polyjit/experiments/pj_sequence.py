@@ -10,8 +10,11 @@ The used metric depends on the experiment, the fitness is being calculated for.
 The fittest generated sequences and the compilestats of the whole progress are
 then written into a persisted data base for further analysis.
 """
+import ast
 import concurrent.futures as cf
 import csv
+import hashlib
+import logging
 import multiprocessing
 import os
 import random
@@ -25,9 +28,51 @@ from benchbuild import reports, settings
 from benchbuild.extensions import run as ext_run
 from benchbuild.utils import run, schema
 from benchbuild.utils.cmd import mktemp
-from polyjit.experiments import compilestats, polyjit
+from polyjit.experiments import (compilestats, local_search,
+                                 operator_selection, polyjit)
+
+LOG = logging.getLogger(__name__)
 
 CFG = settings.CFG
+CFG["sequences"] = {
+    "seed_top_k": {
+        "default": 5,
+        "desc": "Number of persisted sequences that seed a new search. "
+                "Set to 0 to start every search from random sequences."
+    },
+    "operator_selection": {
+        "default": "fixed",
+        "desc": "How the genetic searches choose their variation operators. "
+                "One of: fixed, ucb, thompson."
+    },
+    "climb_first_k": {
+        "default": 0,
+        "desc": "Hill climbers move to the best of the first k improving "
+                "neighbours. Set to 0 to scan the full neighbourhood."
+    },
+    "evaluations": {
+        "default": 1000,
+        "desc": "Number of compiles a local search may spend per start "
+                "sequence."
+    },
+    "temperature": {
+        "default": 1.0,
+        "desc": "Start temperature of the simulated annealing search."
+    },
+    "cooling": {
+        "default": 0.9,
+        "desc": "Factor the annealing temperature decreases with per move."
+    },
+    "tabu_tenure": {
+        "default": 7,
+        "desc": "Number of moves a reverted move stays tabu."
+    },
+    "tabu_sample": {
+        "default": 20,
+        "desc": "Number of neighbours the tabu search samples per move."
+    }
+}
+CFG["sequences"].init_from_env()
 
 DEFAULT_PASS_SPACE = [
     '-targetlibinfo', '-tti', '-tbaa', '-scoped-noalias', '-loop-simplify',
@@ -58,6 +103,7 @@ __SEQUENCE__ = sa.Table('sequences', schema.metadata(),
                             primary_key=False,
                             index=True,
                             nullable=False), sa.Column('value', sa.Float),
+                        sa.Column('fingerprint', sa.String, index=True),
                         sa.Column('run_id', sa.Integer,
                                   sa.ForeignKey(
                                       'run.id',
@@ -209,36 +255,239 @@ def filter_invalid_flags(item):
     return result
 
 
-def persist_sequence(_run, _sequence, _fitness_val):
+def module_fingerprint(ir_file):
+    """
+    Calculate a fingerprint of a linked LLVM module.
+
+    The module id and the source filename are derived from the temporary
+    file names used during linking, we do not include them in the digest.
+
+    Args:
+        ir_file: Path to the textual LLVM-IR of the module.
+
+    Returns:
+        The hex digest of the module's content.
+    """
+    digest = hashlib.sha256()
+    with open(ir_file, 'rb') as ir_in:
+        for line in ir_in:
+            if line.startswith((b'; ModuleID', b'source_filename')):
+                continue
+            digest.update(line)
+    return digest.hexdigest()
+
+
+def load_seed_sequences(session, fingerprint, project_name, pass_space,
+                        limit):
+    """
+    Load the fittest persisted sequences of similar modules.
+
+    Sequences of modules with the same fingerprint come first, followed by
+    the sequences found for other versions of the same project. Within both
+    groups the fittest (lowest) value wins.
+
+    Args:
+        session: The db session we query.
+        fingerprint: The fingerprint of the module we search a sequence for.
+        project_name: The name of the project the module belongs to.
+        pass_space: Only sequences that consist of these passes are returned.
+        limit: The maximal number of sequences we return.
+
+    Returns:
+        A list of sequences, fittest first.
+    """
+    if limit <= 0:
+        return []
+
+    seqs = __SEQUENCE__
+    runs = schema.Run.__table__
+    same_module = sa.case([(seqs.c.fingerprint == fingerprint, 0)], else_=1)
+    qry = sa.sql.select([seqs.c.name]).\
+        select_from(seqs.join(runs, seqs.c.run_id == runs.c.id)).\
+        where(sa.or_(seqs.c.fingerprint == fingerprint,
+                     runs.c.project_name == project_name)).\
+        order_by(same_module, seqs.c.value).\
+        limit(limit * 4)
+
+    sequences = []
+    for (name, ) in session.execute(qry):
+        try:
+            sequence = ast.literal_eval(name)
+        except (ValueError, SyntaxError):
+            continue
+        if not isinstance(sequence, list) or sequence in sequences:
+            continue
+        if all(flag in pass_space for flag in sequence):
+            sequences.append(sequence)
+        if len(sequences) == limit:
+            break
+    return sequences
+
+
+def seed_sequences(seeds, count, length, pass_space):
+    """
+    Create the initial sequences of a search.
+
+    Seeds are cut or randomly extended to the requested length. If there are
+    not enough seeds, we fill up with random sequences.
+
+    Args:
+        seeds: Persisted sequences, fittest first.
+        count: The number of sequences we need.
+        length: The length of each sequence.
+        pass_space: The passes we may choose from.
+
+    Returns:
+        A list of `count` sequences.
+    """
+    sequences = []
+    for seed in seeds[:count]:
+        sequence = list(seed[:length])
+        while len(sequence) < length:
+            sequence.append(random.choice(pass_space))
+        sequences.append(sequence)
+
+    while len(sequences) < count:
+        sequences.append(
+            [random.choice(pass_space) for _ in range(length)])
+    return sequences
+
+
+def upgrade_sequence_table(connection):
+    """
+    Add the fingerprint column to a 'sequences' table of an older schema.
+
+    create_all does not alter existing tables, so databases that predate
+    the fingerprint would fail on every insert.
+
+    Args:
+        connection: A Connection or Session.
+    """
+    bind = connection.connection() \
+        if isinstance(connection, sa.orm.Session) else connection
+    if not bind.dialect.has_table(bind, __SEQUENCE__.name):
+        return
+    columns = {
+        c['name']
+        for c in sa.inspect(bind).get_columns(__SEQUENCE__.name)
+    }
+    if 'fingerprint' in columns:
+        return
+    LOG.warning("Adding the fingerprint column to the sequences table.")
+    bind.execute("ALTER TABLE sequences ADD COLUMN fingerprint VARCHAR")
+    bind.execute("CREATE INDEX IF NOT EXISTS ix_sequences_fingerprint "
+                 "ON sequences (fingerprint)")
+
+
+def persist_sequence(run_info, sequence, fitness_val, fingerprint=None):
     """
     Persist the sequence and its fitness value in the database.
 
     Args:
-        run: The current run we are attached to, with all its information.
+        run_info: The current run we are attached to, with all its information.
         sequence: The fittest sequence generated by an algorithm.
-        fitness_val: The fittest algorithm generated by an algorithm.
+        fitness_val: The fitness value of the fittest sequence.
+        fingerprint: The fingerprint of the module the sequence was found for.
     """
-    session = _run.session
-    #FIXME: Missing a sequence table in the schema!
-    #session.add(
-    #    s.Sequence(
-    #        name=str(sequence), value=fitness_val, run_id=run.db_run.id))
+    session = run_info.session
+    session.execute(__SEQUENCE__.insert().values(
+        name=str(sequence),
+        value=fitness_val,
+        fingerprint=fingerprint,
+        run_id=run_info.db_run.id))
     session.commit()
 
 
+def prepare_search(cc, project, experiment, pass_space):
+    """
+    Prepare the LLVM module we search a sequence for.
+
+    Args:
+        cc: The compiler command of the project.
+        project: The project we search a sequence for.
+        experiment: The experiment we belong to.
+        pass_space: The passes a seed sequence may consist of.
+
+    Returns:
+        A tuple (run_info, opt_cmd, fingerprint, seeds).
+    """
+    with run.track_execution(cc, project, experiment) as tracked:
+        run_info = tracked()
+    filter_compiler_commandline(cc, filter_invalid_flags)
+    complete_ir = link_ir(cc)
+    fingerprint = module_fingerprint(complete_ir)
+    upgrade_sequence_table(run_info.session)
+    seeds = load_seed_sequences(run_info.session, fingerprint, project.name,
+                                pass_space,
+                                int(CFG["sequences"]["seed_top_k"].value))
+
+    from benchbuild.utils.cmd import opt
+    opt_cmd = opt[complete_ir, "-disable-output", "-stats"]
+    return run_info, opt_cmd, fingerprint, seeds
+
+
+def cached_evaluation(call_next, opt_cmd, fitness, seq_to_fitness):
+    """
+    Create an evaluate function for the local search strategies.
+
+    Sequences with a known fitness value are not compiled again.
+
+    Args:
+        call_next: The call_next method of the searching extension.
+        opt_cmd: The opt command we evaluate a sequence with.
+        fitness: The fitness metric, see `RunSequence`.
+        seq_to_fitness: The fitness values the search knows about.
+
+    Returns:
+        A function that maps a sequence to its fitness value.
+    """
+
+    def evaluate(sequence):
+        key = str(sequence)
+        if key not in seq_to_fitness:
+            _, value = call_next(opt_cmd, key, sequence, fitness)
+            seq_to_fitness[key] = value
+        return seq_to_fitness[key]
+
+    return evaluate
+
+
+def create_operators(gene_pool, seq_to_fitness):
+    """
+    Create the adaptive operator engine of a genetic search.
+
+    Args:
+        gene_pool: The passes a mutation may choose from.
+        seq_to_fitness: The fitness values the search knows about.
+
+    Returns:
+        An `operator_selection.AdaptiveOperators` instance, or None, if the
+        genetic searches should use their fixed operators.
+    """
+    policy = str(CFG["sequences"]["operator_selection"].value)
+    if policy == "fixed":
+        return None
+    if policy not in operator_selection.POLICIES:
+        LOG.error("Unknown operator selection '%s', using fixed operators.",
+                  policy)
+        return None
+    return operator_selection.AdaptiveOperators(gene_pool, seq_to_fitness,
+                                                policy)
+
+
 class SequenceReport(reports.Report):
     """Handles the view of the sequences in the database."""
 
     NAME = "sequences"
     SUPPORTED_EXPERIMENTS = [
         "pj-seq-hillclimber", "pj-seq-genetic1-opt", "pj-seq-genetic2-opt",
-        "pj-seq-greedy"
+        "pj-seq-greedy", "pj-seq-annealing", "pj-seq-tabu"
     ]
     QUERY_TOTAL = \
         sa.sql.select([
-            sa.column('sequence'),
-            sa.column('fitness'),
-        ]).select_from(sa.table('sequences'))
+            __SEQUENCE__.c.name.label('sequence'),
+            __SEQUENCE__.c.value.label('fitness'),
+        ])
 
     def report(self):
         print("I found the following matching experiment ids")
@@ -311,7 +560,6 @@ class FindFittestSequenceGenetic1(ext_run.RuntimeExtension):
         seq_to_fitness = {}
         gene_pool, _, _ = get_defaults()
         chromosome_size, population_size, generations = get_genetic_defaults()
-        run_info = run.track_execution(cc, self.project, self.experiment)
 
         def crossover(upper_half):
             """
@@ -360,12 +608,26 @@ class FindFittestSequenceGenetic1(ext_run.RuntimeExtension):
             for _ in range(0, 3):
                 lower_half.pop()
 
-            new_chromosomes = crossover(upper_half)
+            if operators:
+                operators.credit()
+                operators.forget()
+                new_chromosomes = [
+                    operators.offspring(random.choice(upper_half), upper_half)
+                    for _ in range(4)
+                ]
+                # The upper half survives unchanged, only the weak half and
+                # the vacancies are filled with offspring.
+                lower_half = [
+                    operators.offspring(c, upper_half) for c in lower_half
+                ]
+                fittest_chromosome = upper_half.pop()
+            else:
+                new_chromosomes = crossover(upper_half)
 
-            # mutate the fittest chromosome of this generation
-            fittest_chromosome = upper_half.pop()
-            lower_half = mutate(lower_half, gene_pool, 10)
-            upper_half = mutate(upper_half, gene_pool, 5)
+                # mutate the fittest chromosome of this generation
+                fittest_chromosome = upper_half.pop()
+                lower_half = mutate(lower_half, gene_pool, 10)
+                upper_half = mutate(upper_half, gene_pool, 5)
 
             # rejoin all chromosomes
             upper_half.append(fittest_chromosome)
@@ -428,26 +690,23 @@ class FindFittestSequenceGenetic1(ext_run.RuntimeExtension):
 
             return mutated_chromosomes
 
-        with run.track_execution(cc, self.project, self.experiment) as tracked:
-            run_info = tracked()
-        filter_compiler_commandline(cc, filter_invalid_flags)
-        complete_ir = link_ir(cc)
-        from benchbuild.utils.cmd import opt
-        opt_cmd = opt[complete_ir, "-disable-output", "-stats"]
-        chromosomes = []
+        run_info, opt_cmd, fingerprint, seeds = prepare_search(
+            cc, self.project, self.experiment, gene_pool)
+        chromosomes = seed_sequences(seeds, population_size, chromosome_size,
+                                     gene_pool)
+        operators = create_operators(gene_pool, seq_to_fitness)
         fittest_chromosome = []
 
-        for _ in range(population_size):
-            chromosomes.append(generate_random_gene_sequence(gene_pool))
-
         for i in range(generations):
             chromosomes, fittest_chromosome = simulate_generation(
                 chromosomes, gene_pool, seq_to_fitness)
             if i < generations - 1:
                 chromosomes = delete_duplicates(chromosomes, gene_pool)
 
+        if operators:
+            LOG.info("Operator statistics: %s", operators)
         persist_sequence(run_info, fittest_chromosome,
-                         seq_to_fitness[str(fittest_chromosome)])
+                         seq_to_fitness[str(fittest_chromosome)], fingerprint)
 
 
 class Genetic1Sequence(polyjit.PolyJIT):
@@ -605,36 +864,43 @@ class FindFittestSequenceGenetic2(ext_run.RuntimeExtension):
             for _ in range(num_best - 1):
                 best_chromosomes.append(chromosomes.pop())
 
-            new_chromosomes = crossover(fittest_chromosome, best_chromosomes)
+            if operators:
+                operators.credit()
+                operators.forget()
+                new_chromosomes = [
+                    operators.offspring(
+                        random.choice(best_chromosomes), best_chromosomes)
+                    for _ in range(population_size - len(best_chromosomes))
+                ]
+            else:
+                new_chromosomes = crossover(fittest_chromosome,
+                                            best_chromosomes)
 
-            # mutate the new chromosomes
-            new_chromosomes = mutate(new_chromosomes, gene_pool, 10)
+                # mutate the new chromosomes
+                new_chromosomes = mutate(new_chromosomes, gene_pool, 10)
 
             # rejoin all chromosomes
             chromosomes = best_chromosomes + new_chromosomes
 
             return chromosomes, fittest_chromosome
 
-        with run.track_execution(cc, self.project, self.experiment) as tracked:
-            run_info = tracked()
-        filter_compiler_commandline(cc, filter_invalid_flags)
-        complete_ir = link_ir(cc)
-        from benchbuild.utils.cmd import opt
-        opt_cmd = opt[complete_ir, "-disable-output", "-stats"]
-        chromosomes = []
+        run_info, opt_cmd, fingerprint, seeds = prepare_search(
+            cc, self.project, self.experiment, gene_pool)
+        chromosomes = seed_sequences(seeds, population_size, chromosome_size,
+                                     gene_pool)
+        operators = create_operators(gene_pool, seq_to_fitness)
         fittest_chromosome = []
 
-        for _ in range(population_size):
-            chromosomes.append(generate_random_gene_sequence(gene_pool))
-
         for i in range(generations):
             chromosomes, fittest_chromosome = \
                 simulate_generation(chromosomes, gene_pool, seq_to_fitness)
             if i < generations - 1:
                 chromosomes = delete_duplicates(chromosomes, gene_pool)
 
+        if operators:
+            LOG.info("Operator statistics: %s", operators)
         persist_sequence(run_info, fittest_chromosome,
-                         seq_to_fitness[str(fittest_chromosome)])
+                         seq_to_fitness[str(fittest_chromosome)], fingerprint)
 
 
 class Genetic2Sequence(polyjit.PolyJIT):
@@ -706,21 +972,26 @@ class FindFittestSequenceHillclimber(ext_run.RuntimeExtension):
 
             return future_to_fitness, neighbours
 
-        def create_random_sequence(pass_space, seq_length):
-            """Creates a random sequence."""
-            sequence = []
-            for _ in range(seq_length):
-                sequence.append(random.choice(pass_space))
-
-            return sequence
-
         def climb(sequence, seq_to_fitness):
             """
             Find the best sequence and calculate all of its neighbours. If the
             best performing neighbour is fitter than the base sequence,
             the neighbour becomes the new base sequence. Repeat until the base
             sequence has the best performance compared to its neighbours.
+
+            If climb_first_k is set, neighbours are evaluated lazily in random
+            order and we move to the best of the first k improvements.
             """
+            first_k = int(CFG["sequences"]["climb_first_k"].value)
+            if first_k > 0:
+                jobs = CFG["jobs"].value * 5
+                evaluate = cached_evaluation(self.call_next, opt_cmd, fitness,
+                                             seq_to_fitness)
+                with cf.ThreadPoolExecutor(max_workers=jobs) as pool:
+                    base_sequence, _ = local_search.climb(
+                        sequence, pass_space, evaluate, pool, first_k, jobs)
+                return base_sequence, seq_to_fitness
+
             changed = True
             future_to_fitness = []
             base_sequence = sequence
@@ -745,18 +1016,15 @@ class FindFittestSequenceHillclimber(ext_run.RuntimeExtension):
 
             return base_sequence, seq_to_fitness
 
-        with run.track_execution(cc, self.project, self.experiment) as tracked:
-            run_info = tracked()
-        filter_compiler_commandline(cc, filter_invalid_flags)
-        complete_ir = link_ir(cc)
-        from benchbuild.utils.cmd import opt
-        opt_cmd = opt[complete_ir, "-disable-output", "-stats"]
+        run_info, opt_cmd, fingerprint, seeds = prepare_search(
+            cc, self.project, self.experiment, pass_space)
 
         best_sequence = []
         seq_to_fitness = multiprocessing.Manager().dict()
+        base_sequences = seed_sequences(seeds, iterations, seq_length,
+                                        pass_space)
 
-        for _ in range(iterations):
-            base_sequence = create_random_sequence(pass_space, seq_length)
+        for base_sequence in base_sequences:
             best_sequence, seq_to_fitness = \
                 climb(base_sequence, seq_to_fitness)
 
@@ -765,7 +1033,7 @@ class FindFittestSequenceHillclimber(ext_run.RuntimeExtension):
                 best_sequence = base_sequence
 
         persist_sequence(run_info, best_sequence,
-                         seq_to_fitness[str(best_sequence)])
+                         seq_to_fitness[str(best_sequence)], fingerprint)
 
 
 class HillclimberSequences(polyjit.PolyJIT):
@@ -863,22 +1131,16 @@ class FindFittestSequenceGreedy(ext_run.RuntimeExtension):
                 generated_sequences.append(base_sequence)
             return generated_sequences
 
-        with run.track_execution(cc, self.project, self.experiment) as tracked:
-            run_info = tracked()
-        filter_compiler_commandline(cc, filter_invalid_flags)
-        complete_ir = link_ir(cc)
-        from benchbuild.utils.cmd import opt
-        opt_cmd = opt[complete_ir, "-disable-output", "-stats"]
+        run_info, opt_cmd, fingerprint, _ = prepare_search(
+            cc, self.project, self.experiment, pass_space)
 
         generated_sequences = create_greedy_sequences()
         generated_sequences.sort(
             key=lambda s: seq_to_fitness[str(s)], reverse=True)
-        max_fitness = 0
-        for seq in generated_sequences:
-            cur_fitness = seq_to_fitness[str(seq)]
-            max_fitness = max(max_fitness, cur_fitness)
         fittest_sequence = generated_sequences.pop()
-        persist_sequence(run_info, fittest_sequence, max_fitness)
+        # Seeds are loaded fittest (lowest) first.
+        persist_sequence(run_info, fittest_sequence,
+                         seq_to_fitness[str(fittest_sequence)], fingerprint)
 
 
 class GreedySequences(polyjit.PolyJIT):
@@ -909,3 +1171,133 @@ class GreedySequences(polyjit.PolyJIT):
                 config=cfg)
 
         return GreedySequences.default_compiletime_actions(project)
+
+
+class FindFittestSequenceAnnealing(ext_run.RuntimeExtension):
+    def __call__(self, cc, *args, **kwargs):
+        """
+        Generates a custom sequence with simulated annealing.
+
+        Neighbours are sampled lazily and the first acceptable one is taken,
+        instead of compiling the full neighbourhood of every sequence.
+        """
+        seq_to_fitness = {}
+        pass_space, seq_length, iterations = get_defaults()
+
+        def fitness(lhs, rhs):
+            """Defines the fitnesses metric."""
+            return lhs - rhs
+
+        run_info, opt_cmd, fingerprint, seeds = prepare_search(
+            cc, self.project, self.experiment, pass_space)
+        evaluate = cached_evaluation(self.call_next, opt_cmd, fitness,
+                                     seq_to_fitness)
+
+        best_sequence, best_fitness = [], sys.maxsize
+        jobs = CFG["jobs"].value * 5
+        with cf.ThreadPoolExecutor(max_workers=jobs) as pool:
+            for sequence in seed_sequences(seeds, iterations, seq_length,
+                                           pass_space):
+                sequence, fitness_val = local_search.anneal(
+                    sequence,
+                    pass_space,
+                    evaluate,
+                    pool,
+                    int(CFG["sequences"]["evaluations"].value),
+                    temperature=float(CFG["sequences"]["temperature"].value),
+                    cooling=float(CFG["sequences"]["cooling"].value),
+                    window=jobs)
+                if fitness_val < best_fitness:
+                    best_sequence, best_fitness = sequence, fitness_val
+
+        persist_sequence(run_info, best_sequence, best_fitness, fingerprint)
+
+
+class AnnealingSequences(polyjit.PolyJIT):
+    """
+    This experiment is part of the sequence generating suite.
+
+    The sequences for polly are getting generated using simulated annealing.
+    """
+
+    NAME = "pj-seq-annealing"
+    SCHEMA = [__SEQUENCE__]
+
+    def actions_for_project(self, project):
+        """Execute the actions for the test."""
+
+        project = polyjit.PolyJIT.init_project(project)
+        project.cflags = ["-mllvm", "-stats"]
+        cfg = {'jobs': int(CFG["jobs"].value)}
+
+        project.compiler_extension = \
+            FindFittestSequenceAnnealing(
+                project, self,
+                RunSequence(project, self, config=cfg),
+                config=cfg)
+        return AnnealingSequences.default_compiletime_actions(project)
+
+
+class FindFittestSequenceTabu(ext_run.RuntimeExtension):
+    def __call__(self, cc, *args, **kwargs):
+        """
+        Generates a custom sequence with tabu search.
+
+        Every move samples only a few neighbours lazily and takes the first
+        improving one, instead of compiling the full neighbourhood.
+        """
+        seq_to_fitness = {}
+        pass_space, seq_length, iterations = get_defaults()
+
+        def fitness(lhs, rhs):
+            """Defines the fitnesses metric."""
+            return lhs - rhs
+
+        run_info, opt_cmd, fingerprint, seeds = prepare_search(
+            cc, self.project, self.experiment, pass_space)
+        evaluate = cached_evaluation(self.call_next, opt_cmd, fitness,
+                                     seq_to_fitness)
+
+        best_sequence, best_fitness = [], sys.maxsize
+        jobs = CFG["jobs"].value * 5
+        with cf.ThreadPoolExecutor(max_workers=jobs) as pool:
+            for sequence in seed_sequences(seeds, iterations, seq_length,
+                                           pass_space):
+                sequence, fitness_val = local_search.tabu_search(
+                    sequence,
+                    pass_space,
+                    evaluate,
+                    pool,
+                    int(CFG["sequences"]["evaluations"].value),
+                    tenure=int(CFG["sequences"]["tabu_tenure"].value),
+                    sample_size=int(CFG["sequences"]["tabu_sample"].value),
+                    window=jobs)
+                if fitness_val < best_fitness:
+                    best_sequence, best_fitness = sequence, fitness_val
+
+        persist_sequence(run_info, best_sequence, best_fitness, fingerprint)
+
+
+class TabuSequences(polyjit.PolyJIT):
+    """
+    This experiment is part of the sequence generating suite.
+
+    The sequences for polly are getting generated using tabu search.
+    """
+
+    NAME = "pj-seq-tabu"
+    SCHEMA = [__SEQUENCE__]
+
+    def actions_for_project(self, project):
+        """Execute the actions for the test."""
+
+        project = polyjit.PolyJIT.init_project(project)
+        project.cflags = ["-mllvm", "-stats"]
+        cfg = {'jobs': int(CFG["jobs"].value)}
+
+        project.compiler_extension = \
+            FindFittestSequenceTabu(
+                project, self,
+                RunSequence(project, self, config=cfg),
+                config=cfg)
+        return TabuSequences.default_compiletime_actions(project)
@@ -7,13 +7,13 @@ execution profiles of PolyJIT:
   1) PolyJIT enabled, with specialization
   2) PolyJIT enabled, without specialization
 """
-import csv
 import logging
 import os
 import uuid
 
 from benchbuild import extensions, reports, settings
-from polyjit.experiments import papi, polyjit
+from polyjit.experiments import papi, polyjit, repetition
+from polyjit.reports import cache, engine, output, tasks
 
 CFG = settings.CFG
 LOG = logging.getLogger(__name__)
@@ -36,6 +36,7 @@ class Test(polyjit.PolyJIT):
         ]
 
         cfg_with_jit = {
+            "name": "PolyJIT",
             'jobs': jobs,
             "cflags": project.cflags,
             "cores": str(jobs - 1),
@@ -45,6 +46,7 @@ class Test(polyjit.PolyJIT):
         }
 
         cfg_without_jit = {
+            "name": "PolyJIT.no-spec",
             'jobs': jobs,
             "cflags": project.cflags,
             "cores": str(jobs - 1),
@@ -57,18 +59,24 @@ class Test(polyjit.PolyJIT):
                 extensions.run.RuntimeExtension(project, self, config=cfg_with_jit) \
                 << polyjit.EnablePolyJIT() \
                 << polyjit.EnableJITTracking(project=project) \
+                << polyjit.CollectMetrics(project=project) \
+                << polyjit.PolyJITMetrics() \
                 << polyjit.RegisterPolyJITLogs() \
                 << extensions.log.LogAdditionals() \
                 << polyjit.ClearPolyJITConfig(),
                 extensions.run.RuntimeExtension(project, self, config=cfg_without_jit) \
                 << polyjit.DisablePolyJIT() \
                 << polyjit.EnableJITTracking(project=project) \
+                << polyjit.CollectMetrics(project=project) \
+                << polyjit.PolyJITMetrics() \
                 << polyjit.RegisterPolyJITLogs() \
                 << extensions.log.LogAdditionals() \
                 << polyjit.ClearPolyJITConfig()
         )
 
-        project.runtime_extension = extensions.time.RunWithTime(pjit_extension)
+        project.runtime_extension = \
+            extensions.time.RunWithTime(pjit_extension) \
+            << repetition.RepeatUntilStable()
         return Test.default_runtime_actions(project)
 
 
@@ -139,84 +147,73 @@ class JitExportGeneratedCode(polyjit.PolyJIT):
             << extensions.log.LogAdditionals() \
             << polyjit.ClearPolyJITConfig())
 
-        project.runtime_extension = extensions.time.RunWithTime(pjit_extension)
+        project.runtime_extension = \
+            extensions.time.RunWithTime(pjit_extension) \
+            << repetition.RepeatUntilStable()
         return JitExportGeneratedCode.default_runtime_actions(project)
 
 
 class TestReport(reports.Report):
     """
-    Writes report to the database.
+    Compare PolyJIT with and without specialization.
+
+    We write the program-wide results of both configurations side by side
+    and the region-wise speedup of specialization.
     """
-    import sqlalchemy as sa
     SUPPORTED_EXPERIMENTS = ['pj-test']
     SCHEMA = [papi.Event.__table__]
 
-    QUERY_TOTAL = \
-        sa.sql.select([
-            sa.column('project'),
-            sa.column('domain'),
-            sa.column('speedup'),
-            sa.column('ohcov_0'),
-            sa.column('ohcov_1'),
-            sa.column('dyncov_0'),
-            sa.column('dyncov_1'),
-            sa.column('cachehits_0'),
-            sa.column('cachehits_1'),
-            sa.column('variants_0'),
-            sa.column('variants_1'),
-            sa.column('codegen_0'),
-            sa.column('codegen_1'),
-            sa.column('scops_0'),
-            sa.column('scops_1'),
-            sa.column('t_0'),
-            sa.column('o_0'),
-            sa.column('t_1'),
-            sa.column('o_1')
-        ]).\
-        select_from(
-            sa.func.pj_test_eval(sa.sql.bindparam('exp_ids'))
-        )
-
-    QUERY_REGION = \
-        sa.sql.select([
-            sa.column('project'),
-            sa.column('region'),
-            sa.column('cores'),
-            sa.column('t_polly'),
-            sa.column('t_polyjit'),
-            sa.column('speedup')
-        ]).\
-        select_from(
-            sa.func.pj_test_region_wise(sa.sql.bindparam('exp_ids'))
-        )
+    BASELINE = "PolyJIT.no-spec"
+    CANDIDATE = "PolyJIT"
+    COMPLETE = [
+        "speedup", "ohcov", "dyncov", "cachehits", "variants", "codegen",
+        "scops", "time"
+    ]
 
     def report(self):
         print("I found the following matching experiment ids")
         print("  \n".join([str(x) for x in self.experiment_ids]))
 
-        qry = TestReport.QUERY_TOTAL.unique_params(exp_ids=self.experiment_ids)
+        root = engine.dataset_root()
+        if root:
+            # The cache keys by the state of the database, not the export.
+            return list(
+                TestReport.evaluate(
+                    engine.ReportData.from_dataset(
+                        root, [str(x) for x in self.experiment_ids])))
+
+        return cache.cached_frames(
+            self.session.connection(), "pj-test",
+            engine.dependencies() + TestReport.dependencies(),
+            self.experiment_ids, lambda: TestReport.evaluate(
+                engine.ReportData.load(
+                    tasks.bind_of(self.session), self.experiment_ids)))
+
+    @staticmethod
+    def dependencies():
+        """The code and the constants our frames depend on."""
+        return [
+            TestReport.evaluate, TestReport.BASELINE, TestReport.CANDIDATE,
+            TestReport.COMPLETE
+        ]
+
+    @staticmethod
+    def evaluate(data):
+        totals = engine.speedups(
+            engine.total_runtime(data), TestReport.BASELINE)
         yield ("complete",
-               ('project', 'domain', 'speedup', 'ohcov_0', 'ocov_1',
-                'dyncov_0', 'dyncov_1', 'cachehits_0', 'cachehits_1',
-                'variants_0', 'variants_1', 'codegen_0', 'codegen_1',
-                'scops_0', 'scops_1', 't_0', 'o_0', 't_1', 'o_1'),
-               self.session.execute(qry).fetchall())
-        qry = TestReport.QUERY_REGION.unique_params(
-            exp_ids=self.experiment_ids)
-        yield ("regions", ('project', 'region', 'cores',
-                           'T_Polly', 'T_PolyJIT', 'speedup'),
-               self.session.execute(qry).fetchall())
+               engine.wide(totals, [TestReport.CANDIDATE, TestReport.BASELINE],
+                           TestReport.COMPLETE))
+        yield ("regions",
+               engine.region_wise_compare(data, TestReport.BASELINE,
+                                          TestReport.CANDIDATE))
 
     def generate(self):
-        for name, header, data in self.report():
+        for name, data in self.report():
             fname = os.path.basename(self.out_path)
 
             fname = "{prefix}_{name}{ending}".format(
                 prefix=os.path.splitext(fname)[0],
                 ending=os.path.splitext(fname)[-1],
                 name=name)
-            with open(fname, 'w') as csv_out:
-                print("Writing '{0}'".format(csv_out.name))
-                csv_writer = csv.writer(csv_out)
-                csv_writer.writerows([header])
-                csv_writer.writerows(data)
+            output.write_frame(data, fname)
@@ -18,11 +18,12 @@ import copy
 import uuid
 
 from benchbuild import experiment, extensions, settings
+from polyjit.experiments import build_cache, build_matrix, repetition, topology
 
 CFG = settings.CFG
 
 
-class PollyOpenMP(experiment.Experiment):
+class PollyOpenMP(build_cache.CachedBuilds, experiment.Experiment):
     """Timing experiment with Polly & OpenMP support."""
 
     NAME = "polly-openmp"
@@ -35,13 +36,17 @@ class PollyOpenMP(experiment.Experiment):
             "-polly", "-mllvm", "-polly-parallel"
         ]
 
-        actns = []
+        variants = []
         num_jobs = int(CFG['jobs'].value)
         for i in range(2, num_jobs + 1):
             project_i = copy.deepcopy(project)
             project_i.run_uuid = uuid.uuid4()
             project_i.runtime_extension = extensions.run.RuntimeExtension(
-                project_i, self, {'jobs': i}) << extensions.time.RunWithTime()
-            actns.extend(self.default_runtime_actions(project_i))
-
-        return actns
+                project_i, self, {'jobs': i}) \
+                << extensions.run.SetThreadLimit(config={'jobs': i}) \
+                << topology.PinCores(config={'jobs': i}) \
+                << extensions.time.RunWithTime() \
+                << repetition.RepeatUntilStable()
+            variants.append(project_i)
+
+        return build_matrix.build_matrix(variants)
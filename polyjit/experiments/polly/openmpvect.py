@@ -16,11 +16,12 @@ Measurements
 """
 
 from benchbuild import experiment, extensions, settings
+from polyjit.experiments import build_cache, repetition, topology
 
 CFG = settings.CFG
 
 
-class PollyOpenMPVectorizer(experiment.Experiment):
+class PollyOpenMPVectorizer(build_cache.CachedBuilds, experiment.Experiment):
     """Timing experiment with Polly & OpenMP+Vectorizer support."""
 
     NAME = "polly-openmpvect"
@@ -36,6 +37,9 @@ class PollyOpenMPVectorizer(experiment.Experiment):
         num_jobs = int(CFG['jobs'].value)
         project.runtime_extension = extensions.run.RuntimeExtension(
             project, self,
-            {'jobs': num_jobs}) << extensions.time.RunWithTime()
+            {'jobs': num_jobs}) \
+            << topology.PinCores(config={'jobs': num_jobs}) \
+            << extensions.time.RunWithTime() \
+            << repetition.RepeatUntilStable()
 
         return self.default_runtime_actions(project)
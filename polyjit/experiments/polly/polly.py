@@ -3,11 +3,12 @@ This experiment applies polly's transformations to all projects and measures
 the runtime.
 """
 from benchbuild import experiment, extensions, settings
+from polyjit.experiments import build_cache, repetition, topology
 
 CFG = settings.CFG
 
 
-class Polly(experiment.Experiment):
+class Polly(build_cache.CachedBuilds, experiment.Experiment):
     """The polly experiment."""
 
     NAME = "polly"
@@ -21,6 +22,9 @@ class Polly(experiment.Experiment):
         num_jobs = int(CFG['jobs'].value)
         project.runtime_extension = extensions.run.RuntimeExtension(
             project, self,
-            {'jobs': num_jobs}) << extensions.time.RunWithTime()
+            {'jobs': num_jobs}) \
+            << topology.PinCores(config={'jobs': num_jobs}) \
+            << extensions.time.RunWithTime() \
+            << repetition.RepeatUntilStable()
 
         return self.default_runtime_actions(project)
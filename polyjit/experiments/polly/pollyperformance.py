@@ -7,6 +7,7 @@ import uuid
 import warnings
 
 from benchbuild import experiment, extensions, settings
+from polyjit.experiments import build_cache, build_matrix, repetition, topology
 
 settings.CFG["perf"] = {
     "config": {
@@ -20,7 +21,7 @@ class ShouldNotBeNone(RuntimeWarning):
     """User warning, if config var is null."""
 
 
-class PollyPerformance(experiment.Experiment):
+class PollyPerformance(build_cache.CachedBuilds, experiment.Experiment):
     """ The polly performance experiment. """
 
     NAME = "pollyperformance"
@@ -47,16 +48,21 @@ class PollyPerformance(experiment.Experiment):
             "LLVMPolyJIT.so", "-mllvm", "-polly"
         ] + config_with_llvm
 
-        actns = []
+        variants = []
         num_jobs = int(settings.CFG["jobs"].value)
         for i in range(1, num_jobs):
             project_i = copy.deepcopy(project)
             project_i.run_uuid = uuid.uuid4()
 
-            project_i.cflags += ["-mllvm", "-polly-num-threads={0}".format(i)]
+            # Polly's OpenMP code uses OMP_NUM_THREADS, if we do not fix
+            # -polly-num-threads at compile time.
             project_i.runtime_extension = extensions.run.RuntimeExtension(
-                project_i, self, {'jobs': i}) << extensions.time.RunWithTime()
+                project_i, self, {'jobs': i}) \
+                << extensions.run.SetThreadLimit(config={'jobs': i}) \
+                << topology.PinCores(config={'jobs': i}) \
+                << extensions.time.RunWithTime() \
+                << repetition.RepeatUntilStable()
 
-            actns.extend(self.default_runtime_actions(project_i))
+            variants.append(project_i)
 
-        return actns
+        return build_matrix.build_matrix(variants)
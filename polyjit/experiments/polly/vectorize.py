@@ -17,11 +17,12 @@ Measurements
 """
 
 from benchbuild import experiment, extensions, settings
+from polyjit.experiments import build_cache, repetition, topology
 
 CFG = settings.CFG
 
 
-class PollyVectorizer(experiment.Experiment):
+class PollyVectorizer(build_cache.CachedBuilds, experiment.Experiment):
     """ The polly experiment with vectorization enabled. """
 
     NAME = "polly-vectorize"
@@ -37,5 +38,8 @@ class PollyVectorizer(experiment.Experiment):
         num_jobs = int(CFG['jobs'].value)
         project.runtime_extension = extensions.run.RuntimeExtension(
             project, self,
-            {'jobs': num_jobs}) << extensions.time.RunWithTime()
+            {'jobs': num_jobs}) \
+            << topology.PinCores(config={'jobs': num_jobs}) \
+            << extensions.time.RunWithTime() \
+            << repetition.RepeatUntilStable()
         return self.default_runtime_actions(project)
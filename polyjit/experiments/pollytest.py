@@ -9,12 +9,13 @@ import logging
 import os
 import uuid
 
-import pandas as pd
 import sqlalchemy as sa
 
 from benchbuild import experiment, reports, statistics
 from benchbuild.extensions import run
 from polyjit.experiments import compilestats
+from polyjit.reports import compilestats as cs_report
+from polyjit.reports import output
 
 LOG = logging.getLogger(__name__)
 
@@ -105,33 +106,53 @@ class PollyTest(experiment.Experiment):
 
 
 class PollyTestReport(reports.Report):
+    """
+    Sum the Polly compilestats of every project and configuration.
+
+    We read the compilestats like pollytest-matrix does, the report runs on
+    every database benchbuild supports.
+    """
+    NAME = "pollytest"
     SUPPORTED_EXPERIMENTS = ["pollytest"]
-    QUERY_EVAL = \
-        sa.sql.select([
-        ]).\
-        select_from(
-            sa.func.pollytest_eval(
-                sa.sql.bindparam('exp_ids'),
-                sa.sql.bindparam('components')))
+    COMPONENTS = ["polly-scops", "polly-detect", "polly"]
 
     def report(self):
         print("I found the following matching experiment ids")
         print("  \n".join([str(x) for x in self.experiment_ids]))
 
-        qry = PollyTestReport.\
-            QUERY_EVAL.unique_params(
-                exp_ids=self.experiment_ids,
-                components=["polly-scops", "polly-detect", "polly"]
-            )
+        stats = cs_report.stats_query().alias("stats")
+        keys = [stats.c.project, stats.c.group, stats.c.config,
+                stats.c.component, stats.c.stat]
+        return sa.sql.select(keys + [
+            sa.func.sum(stats.c.value).label("value")
+        ]).where(stats.c.component.in_(PollyTestReport.COMPONENTS)).\
+            group_by(*keys).\
+            order_by(*keys).\
+            params(exp_ids=self.experiment_ids)
+
+    def generate(self):
+        fname = os.path.basename(self.out_path)
+        fname = "{prefix}_pollytest{ending}".format(
+            prefix=os.path.splitext(fname)[0],
+            ending=os.path.splitext(fname)[-1])
+        output.write_query(self.session.connection(), self.report(), fname)
 
-        df = pd.read_sql_query(qry, self.session.bind)
-        print(df.head())
 
-        return df
+class PollyTestMatrix(reports.Report):
+    """
+    Compare the compilestats of all configs with a baseline config.
+
+    See polyjit.reports.compilestats.stat_matrix for the columns. The
+    extension of the output path selects CSV or Parquet.
+    """
+    NAME = "pollytest-matrix"
+    SUPPORTED_EXPERIMENTS = ["pollytest"]
 
     def generate(self):
         fname = os.path.basename(self.out_path)
-        fname = "{prefix}_pollytest{ending}".format(
+        fname = "{prefix}_pollytest_matrix{ending}".format(
             prefix=os.path.splitext(fname)[0],
             ending=os.path.splitext(fname)[-1])
-        self.report()
+        matrix = cs_report.compare_configs(self.session.connection(),
+                                           self.experiment_ids)
+        output.write_frame(matrix, fname)
@@ -4,8 +4,9 @@ The 'polyjit' experiment.
 This experiment uses likwid to measure the performance of all binaries
 when running with polyjit support enabled.
 """
+import contextlib
+import contextvars
 import copy
-import glob
 import logging
 import os
 import uuid
@@ -18,7 +19,8 @@ from plumbum import local
 import benchbuild.extensions as ext
 from benchbuild.experiment import Experiment
 from benchbuild.utils import actions, dict as ext_dict, run, schema
-from polyjit.experiments import papi
+from polyjit.experiments import (artifacts, build_cache, papi, repetition,
+                                 topology, trace_logs)
 
 LOG = logging.getLogger(__name__)
 
@@ -67,9 +69,99 @@ def verbosity_to_polyjit_log_level(verbosity: int):
     return polyjit_log_levels[verbosity]
 
 
+class ConfigScope:
+    """
+    A dictionary that provides temporary modification per context.
+
+    This is a context-local replacement of benchbuild's ExtensibleDict. The
+    content lives in a context variable. Nested scopes inside one extension
+    chain extend each other, just like the ExtensibleDict does. A chain that
+    runs in another thread starts with a fresh context and never sees the
+    scopes of other chains.
+
+    Args:
+        name: The name of the context variable.
+        extender_fn: Merges the current content with the modification.
+    """
+
+    def __init__(self, name, extender_fn=None):
+        self._var = contextvars.ContextVar(name, default={})
+        self._extender_fn = extender_fn
+
+    @property
+    def _current(self):
+        return self._var.get()
+
+    @contextlib.contextmanager
+    def __call__(self, extender_fn=None, **kwargs):
+        """Temporarily modify the content of the dict in this context."""
+        if extender_fn is None:
+            extender_fn = self._extender_fn
+
+        # Never touch the content of an enclosing scope, the extender
+        # modifies lists in place.
+        current = {
+            k: list(v) if isinstance(v, list) else v
+            for k, v in self._current.items()
+        }
+        if extender_fn is not None:
+            current = extender_fn(current, **kwargs)
+        else:
+            current.update(kwargs)
+
+        token = self._var.set(current)
+        try:
+            yield
+        finally:
+            self._var.reset(token)
+
+    def __iter__(self):
+        return iter(self._current)
+
+    def __len__(self):
+        return len(self._current)
+
+    def __contains__(self, name):
+        return name in self._current
+
+    def __getitem__(self, name):
+        return self._current[name]
+
+    def keys(self):
+        return self._current.keys()
+
+    def values(self):
+        return self._current.values()
+
+    def items(self):
+        return self._current.items()
+
+    def get(self, name, *default):
+        return self._current.get(name, *default)
+
+    def clear(self):
+        """Clear the content for the rest of the current scope."""
+        self._var.set({})
+
+    def getdict(self):
+        return dict((k, str(v)) for k, v in self._current.items())
+
+    def __str__(self):
+        return str(self._current)
+
+    def __repr__(self):
+        return repr(self._current)
+
+
 class PolyJITConfig(ext.Extension):
-    """Object that stores the configuraion of the JIT."""
-    __config = ext_dict.ExtensibleDict(ext_dict.extend_as_list)
+    """
+    Object that stores the configuraion of the JIT.
+
+    All config objects of an extension chain share their configuration.
+    Chains that run concurrently in different threads are isolated from each
+    other.
+    """
+    __config = ConfigScope("polyjit_config", ext_dict.extend_as_list)
 
     @property
     def argv(self):
@@ -230,12 +322,15 @@ class CollectMetrics(PolyJITConfig):
         run_info.add_payload("pj.metrics", metrics)
 
     def __call__(self, *args, **kwargs):
-        builddir = self.project.builddir
-        outfile = 'polyjit.{0}.metadata.yml'.format(self.project.name)
-        outfile = os.path.join(os.path.abspath(builddir), outfile)
-        pjit_args = ["-polli-track-metrics-outfile='{:s}'".format(outfile)]
-        with self.argv(PJIT_ARGS=pjit_args):
-            res = self.call_next(*args, **kwargs)
+        with artifacts.run_artifacts(self.project) as run_dir:
+            outfile = run_dir.path_of(
+                "metrics", 'polyjit.{0}.metrics.yml'.format(self.project.name))
+            pjit_args = [
+                "-polli-track-metrics-outfile='{:s}'".format(outfile)
+            ]
+            with self.argv(PJIT_ARGS=pjit_args):
+                res = self.call_next(*args, **kwargs)
+            artifacts.persist_artifacts(res, run_dir)
 
         # Attach payload to "last" successful RunInfo.
         valid_runs = [r for r in res if not r.failed]
@@ -255,14 +350,16 @@ class CollectScopMetadata(PolyJITConfig):
         super(CollectScopMetadata, self).__init__(*extensions, **kwargs)
 
     def __call__(self, binary_command, *args, **kwargs):
-        builddir = self.project.builddir
-        outfile = 'polyjit.{0}.metadata.yml'.format(self.project.name)
-        outfile = os.path.join(os.path.abspath(builddir), outfile)
-        pjit_args = [
-            "-polli-track-scop-metadata-outfile='{:s}'".format(outfile)
-        ]
-        with self.argv(PJIT_ARGS=pjit_args):
-            res = self.call_next(binary_command, *args, **kwargs)
+        with artifacts.run_artifacts(self.project) as run_dir:
+            outfile = run_dir.path_of(
+                "scop-metadata",
+                'polyjit.{0}.metadata.yml'.format(self.project.name))
+            pjit_args = [
+                "-polli-track-scop-metadata-outfile='{:s}'".format(outfile)
+            ]
+            with self.argv(PJIT_ARGS=pjit_args):
+                res = self.call_next(binary_command, *args, **kwargs)
+            artifacts.persist_artifacts(res, run_dir)
 
         # Load & Parse outfile into the database.
         # TODO
@@ -348,35 +445,43 @@ class DisablePolyJIT(PolyJITConfig):
         return "Disable PolyJIT"
 
 class RegisterPolyJITLogs(PolyJITConfig, ext.log.LogTrackingMixin):
-    """Extends the following RunWithTime extensions with extra PolyJIT logs."""
+    """
+    Extends the following RunWithTime extensions with extra PolyJIT logs.
+
+    The log level follows benchbuild's verbosity, unless we get log_level.
+    """
+
+    def __init__(self, *extensions, project=None, log_level=None, **kwargs):
+        self.project = project
+        self.log_level = log_level
+        super(RegisterPolyJITLogs, self).__init__(*extensions, **kwargs)
 
     def __call__(self, *args, **kwargs):
         """Redirect to RunWithTime, but register additional logs."""
         from benchbuild.settings import CFG
 
-        log_level = verbosity_to_polyjit_log_level(CFG["verbosity"].value)
-
-        curdir = os.path.realpath(os.path.curdir)
-        files_before = glob.glob(os.path.join(curdir, "polyjit.*.log"))
+        log_level = self.log_level or \
+            verbosity_to_polyjit_log_level(CFG["verbosity"].value)
 
-        with self.argv(PJIT_ARGS=[
-                "-polli-enable-log", "-polli-log-level={}".format(log_level)
-        ]):
-            ret = self.call_next(*args, **kwargs)
-        files = glob.glob(os.path.join(curdir, "polyjit.*.log"))
-        files = [
-            new_file for new_file in files if new_file not in files_before
-        ]
+        with artifacts.run_artifacts(self.project) as run_dir:
+            logfile = run_dir.path_of("log", "polyjit.log")
+            with self.argv(PJIT_ARGS=[
+                    "-polli-enable-log",
+                    "-polli-log-level={}".format(log_level),
+                    "-polli-log-file='{:s}'".format(logfile)
+            ]):
+                ret = self.call_next(*args, **kwargs)
+            artifacts.persist_artifacts(ret, run_dir)
 
-        for file in files:
-            self.add_log(file)
+        if os.path.exists(logfile):
+            self.add_log(logfile)
 
         return ret
 
     def __str__(self):
         return "Register PolyJIT logfiles"
 
-class PolyJIT(Experiment):
+class PolyJIT(build_cache.CachedBuilds, Experiment):
     """The polyjit experiment."""
 
     @classmethod
@@ -437,8 +542,8 @@ class PolyJITSimple(PolyJIT):
             << EnableJITTracking(project=project) \
             << CollectMetrics(project=project) \
             << PolyJITMetrics() \
-            << RegisterPolyJITLogs() \
-            << ext.log.LogAdditionals() \
+            << RegisterPolyJITLogs(project=project) \
+            << trace_logs.StoreLogs(project=project) \
             << ClearPolyJITConfig() \
             << ext.time.RunWithTime()
 
@@ -467,7 +572,8 @@ class PolyJITFull(PolyJIT):
             ext.run.RuntimeExtension(
                 rawp, self, config={"jobs": 1, "name": "Baseline O3"}) \
             << ext.run.SetThreadLimit(config={"jobs": 1}) \
-            << ext.time.RunWithTime()
+            << ext.time.RunWithTime() \
+            << repetition.RepeatUntilStable()
         actns.append(actions.RequireAll(self.default_runtime_actions(rawp)))
 
         pollyp = copy.deepcopy(project)
@@ -480,7 +586,8 @@ class PolyJITFull(PolyJIT):
             ext.run.RuntimeExtension(
                 pollyp, self, config={"jobs": 1, "name": "Polly (Parallel)"}) \
             << ext.run.SetThreadLimit(config={"jobs": 1}) \
-            << ext.time.RunWithTime()
+            << ext.time.RunWithTime() \
+            << repetition.RepeatUntilStable()
         actns.append(actions.RequireAll(self.default_runtime_actions(pollyp)))
 
         jitp = copy.deepcopy(project)
@@ -502,12 +609,14 @@ class PolyJITFull(PolyJIT):
             cp.runtime_extension = \
                 ext.run.RuntimeExtension(cp, self, config=cfg) \
                 << ext.run.SetThreadLimit(config=cfg) \
+                << topology.PinCores(config=cfg) \
                 << DisablePolyJIT() \
                 << EnableJITTracking(project=cp) \
+                << RegisterPolyJITLogs(project=cp) \
+                << trace_logs.StoreLogs(project=cp) \
                 << ClearPolyJITConfig() \
                 << ext.time.RunWithTime() \
-                << RegisterPolyJITLogs() \
-                << ext.log.LogAdditionals()
+                << repetition.RepeatUntilStable()
             actns.append(actions.RequireAll(self.default_runtime_actions(cp)))
 
         for i in range(2, int(str(CFG["jobs"])) + 1):
@@ -524,11 +633,12 @@ class PolyJITFull(PolyJIT):
             cp.runtime_extension = \
                 ext.run.RuntimeExtension(cp, self, config=cfg) \
                 << ext.run.SetThreadLimit(config=cfg) \
+                << topology.PinCores(config=cfg) \
                 << EnablePolyJIT() \
                 << EnableJITTracking(project=cp) \
-                << ClearPolyJITConfig() \
-                << RegisterPolyJITLogs() \
-                << ext.log.LogAdditionals()
+                << RegisterPolyJITLogs(project=cp) \
+                << trace_logs.StoreLogs(project=cp) \
+                << ClearPolyJITConfig()
             actns.append(actions.RequireAll(self.default_runtime_actions(cp)))
 
         return [actions.Any(actions=actns)]
@@ -2,7 +2,7 @@
 This experiment instruments the parent if any given SCoP and prints the reason
 why the parent is not part of the SCoP.
 """
-import csv
+import functools as ft
 import glob
 import logging
 import os
@@ -13,6 +13,7 @@ from plumbum import local
 from benchbuild import experiment, extensions, reports
 from benchbuild.utils import schema
 from polyjit.experiments import polyjit
+from polyjit.reports import output, tasks
 
 LOG = logging.getLogger(__name__)
 
@@ -176,9 +177,9 @@ class PProfExperiment(experiment.Experiment):
             << RunWithPprofExperiment(config={"jobs": 1}) \
             << EnableProfiling() \
             << polyjit.EnableJITTracking(project=project) \
-            << polyjit.ClearPolyJITConfig() \
-            << polyjit.RegisterPolyJITLogs() \
-            << extensions.log.LogAdditionals()
+            << polyjit.RegisterPolyJITLogs(project=project) \
+            << extensions.log.LogAdditionals() \
+            << polyjit.ClearPolyJITConfig()
         return self.default_runtime_actions(project)
 
 
@@ -226,32 +227,28 @@ class TestReport(reports.Report):
         queryRatiosScops = \
             TestReport.QUERY_RATIOS_SCOPS.unique_params(
                 exp_ids=self.experiment_ids, filter_str='%::SCoP')
-        yield ("ratiosScops", ('project', 't_scop', 't_total', 'dyncov'),
-               self.session.execute(queryRatiosScops).fetchall())
+        yield ("ratiosScops", queryRatiosScops)
 
         queryRatiosMaxRegions = \
             TestReport.QUERY_RATIOS_MAX_REGIONS.unique_params(
                 exp_ids=self.experiment_ids)
-        yield ("ratiosMaxRegions", ('project', 't_parent', 't_total',
-                                    'dyncov'),
-               self.session.execute(queryRatiosMaxRegions).fetchall())
+        yield ("ratiosMaxRegions", queryRatiosMaxRegions)
 
         queryInvalidReasons = \
             TestReport.QUERY_INVALID_REASONS.unique_params(
                 exp_ids=self.experiment_ids)
-        yield ("invalidReasons", ('invalid_reason', 'occurrence'),
-               self.session.execute(queryInvalidReasons).fetchall())
+        yield ("invalidReasons", queryInvalidReasons)
 
     def generate(self):
-        for name, header, data in self.report():
+        writes = []
+        for name, query in self.report():
             fname = os.path.basename(self.out_path)
 
             fname = "{prefix}_{name}{ending}".format(
                 prefix=os.path.splitext(fname)[0],
                 ending=os.path.splitext(fname)[-1],
                 name=name)
-            with open(fname, 'w') as csv_out:
-                print("Writing '{0}'".format(csv_out.name))
-                csv_writer = csv.writer(csv_out)
-                csv_writer.writerows([header])
-                csv_writer.writerows(data)
+            writes.append((fname, ft.partial(output.write_query,
+                                             query=query, fname=fname)))
+        for fname, count in tasks.run(tasks.bind_of(self.session), writes):
+            LOG.debug("Wrote %d rows to %s", count, fname)
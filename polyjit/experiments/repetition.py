@@ -0,0 +1,235 @@
+"""
+Adaptive repetition of runtime measurements.
+
+A single run of a configuration is a noisy sample. RepeatUntilStable re-runs
+the wrapped extensions until the confidence interval of the run time is
+narrow enough, relative to its center, or until a time budget is used up.
+
+The extension has to wrap an extension that reports timings in the output
+of a run, i.e., benchbuild's RunWithTime:
+
+    RuntimeExtension(...) << RunWithTime() << RepeatUntilStable()
+"""
+import logging
+import math
+import random
+import statistics
+import time
+
+from benchbuild import settings
+from benchbuild.extensions import base
+from benchbuild.extensions import time as ext_time
+from benchbuild.utils import db, schema
+
+CFG = settings.CFG
+LOG = logging.getLogger(__name__)
+
+CFG["repeat"] = {
+    "warmup": {
+        "default": 1,
+        "desc": "Number of warm-up runs that are discarded."
+    },
+    "min": {
+        "default": 3,
+        "desc": "Minimal number of measured runs per configuration."
+    },
+    "max": {
+        "default": 20,
+        "desc": "Maximal number of measured runs per configuration."
+    },
+    "rel_ci": {
+        "default": 0.02,
+        "desc": "Stop repeating, if the half width of the confidence "
+                "interval falls below this fraction of its center."
+    },
+    "budget": {
+        "default": 3600,
+        "desc": "Seconds a configuration may spend on repetitions."
+    },
+    "method": {
+        "default": "mean",
+        "desc": "The confidence interval we use: mean (Student's t) or "
+                "median (bootstrap)."
+    }
+}
+CFG["repeat"].init_from_env()
+
+# Two-sided 95% quantiles of Student's t-distribution, by degrees of freedom.
+T_95 = [
+    12.706, 4.303, 3.182, 2.776, 2.571, 2.447, 2.365, 2.306, 2.262, 2.228,
+    2.201, 2.179, 2.160, 2.145, 2.131, 2.120, 2.110, 2.101, 2.093, 2.086,
+    2.080, 2.074, 2.069, 2.064, 2.060, 2.056, 2.052, 2.048, 2.045, 2.042
+]
+Z_95 = 1.960
+
+
+def mean_ci(samples):
+    """
+    The 95% confidence interval of the mean.
+
+    Returns:
+        A tuple (mean, lower, upper).
+    """
+    mean = statistics.mean(samples)
+    if len(samples) < 2:
+        return mean, -math.inf, math.inf
+
+    dof = len(samples) - 1
+    quantile = T_95[dof - 1] if dof <= len(T_95) else Z_95
+    half_width = quantile * statistics.stdev(samples) / math.sqrt(
+        len(samples))
+    return mean, mean - half_width, mean + half_width
+
+
+def median_ci(samples, resamples=1000, rng=None):
+    """
+    The 95% percentile bootstrap confidence interval of the median.
+
+    Returns:
+        A tuple (median, lower, upper).
+    """
+    median = statistics.median(samples)
+    if len(samples) < 2:
+        return median, -math.inf, math.inf
+
+    rng = rng if rng else random.Random(0)
+    medians = sorted(
+        statistics.median([rng.choice(samples) for _ in samples])
+        for _ in range(resamples))
+    lower = medians[int(0.025 * (resamples - 1))]
+    upper = medians[int(math.ceil(0.975 * (resamples - 1)))]
+    return median, lower, upper
+
+
+CONFIDENCE_INTERVALS = {"mean": mean_ci, "median": median_ci}
+
+
+def is_stable(center, lower, upper, rel_ci):
+    """Check, if the half width of the interval is small enough."""
+    if not math.isfinite(lower) or not math.isfinite(upper):
+        return False
+    if center == 0:
+        return upper == lower
+    return (upper - lower) / 2 <= rel_ci * abs(center)
+
+
+def real_time(run_info):
+    """Fetch the wall time of a run from the output of RunWithTime."""
+    stderr = getattr(run_info, "stderr", None)
+    if not stderr:
+        return None
+    timings = ext_time.fetch_time_output("BENCHBUILD: ",
+                                         "BENCHBUILD: {:g}-{:g}-{:g}",
+                                         stderr.split("\n"))
+    if not timings:
+        return None
+    return timings[-1][2]
+
+
+def discard(run_info):
+    """Remove a warm-up run and all of its results from the database."""
+    session = run_info.session
+    session.delete(run_info.db_run)
+    session.commit()
+
+
+def persist_repetitions(run_info, method, samples, ci):
+    """
+    Persist the summary of a repeated configuration.
+
+    The summary is attached to the last measured run.
+
+    Args:
+        run_info: The last measured run.
+        method: The kind of confidence interval.
+        samples: All measured run times.
+        ci: A tuple (center, lower, upper).
+    """
+    session = run_info.session
+    run_id = run_info.db_run.id
+    center, lower, upper = ci
+    metrics = {
+        "repeat.n": len(samples),
+        "repeat." + method: center,
+        "repeat.ci_low": lower,
+        "repeat.ci_high": upper,
+    }
+    session.add_all([
+        schema.Metric(name=name, value=value, run_id=run_id)
+        for name, value in metrics.items() if math.isfinite(value)
+    ])
+    db.persist_config(run_info.db_run, session, {
+        "repeat.method": method,
+        "repeat.samples": ",".join("{:g}".format(s) for s in samples)
+    })
+    session.commit()
+
+
+def is_run(result):
+    return getattr(result, "db_run", None) is not None
+
+
+class RepeatUntilStable(base.Extension):
+    """
+    Repeat all wrapped configurations until their run time is stable.
+
+    Every call of the wrapped extensions yields one run per configuration.
+    We repeat until the confidence interval of every configuration is
+    narrow enough, at least `repeat.min` and at most `repeat.max` times, or
+    until `repeat.budget` seconds are used up. The first `repeat.warmup`
+    calls are discarded.
+    """
+
+    def __call__(self, binary_command, *args, **kwargs):
+        warmup = int(CFG["repeat"]["warmup"].value)
+        min_runs = max(1, int(CFG["repeat"]["min"].value))
+        max_runs = max(min_runs, int(CFG["repeat"]["max"].value))
+        rel_ci = float(CFG["repeat"]["rel_ci"].value)
+        budget = float(CFG["repeat"]["budget"].value)
+        method = str(CFG["repeat"]["method"].value)
+        confidence_interval = CONFIDENCE_INTERVALS[method]
+
+        start = time.perf_counter()
+        for _ in range(warmup):
+            for run_info in filter(is_run,
+                                   self.call_next(binary_command, *args,
+                                                  **kwargs)):
+                LOG.debug("Discarding warm-up run: %s", run_info)
+                discard(run_info)
+
+        res = []
+        samples = {}
+        last_runs = {}
+        intervals = {}
+        runs = 0
+        while runs < max_runs:
+            results = self.call_next(binary_command, *args, **kwargs)
+            res.extend(results)
+            runs += 1
+
+            for config, run_info in enumerate(filter(is_run, results)):
+                last_runs[config] = run_info
+                sample = real_time(run_info)
+                if sample is not None:
+                    samples.setdefault(config, []).append(sample)
+
+            if runs < min_runs:
+                continue
+            intervals = {
+                config: confidence_interval(values)
+                for config, values in samples.items()
+            }
+            if all(is_stable(*ci, rel_ci) for ci in intervals.values()):
+                break
+            if time.perf_counter() - start > budget:
+                LOG.warning("Repetition budget of %ds used up after %d runs.",
+                            budget, runs)
+                break
+
+        for config, ci in intervals.items():
+            persist_repetitions(last_runs[config], method, samples[config],
+                                ci)
+        return res
+
+    def __str__(self):
+        return "Repeat until the run time is stable"
@@ -0,0 +1,265 @@
+#!/usr/bin/env python
+"""
+Benchmarks the throughput of the sequence search strategies.
+
+All strategies of this directory and of pj_sequence.py run against
+polyjit.experiments.fake_opt, so no LLVM/Polly installation is required.
+For every strategy we report the number of opt calls, the wall time, the
+opt calls per second and two kinds of overhead:
+
+    overhead_ms  Wall time per call during which no opt process was alive,
+                 i.e., the strategy itself (pool management, parsing,
+                 bookkeeping between generations).
+    idle_%       The share of worker capacity that sat idle while at least
+                 one opt process was alive.
+
+Starting the fake opt costs a Python interpreter start-up, which a real opt
+does not pay. We calibrate this shim cost once (shim_ms) and count it as
+part of every opt call, not as overhead.
+
+The strategies of pj_sequence.py run without a database: we replace the
+preparation of the LLVM module and the persisting of the result, everything
+in between runs unchanged.
+
+Usage: benchmark_strategies.py [--latency=s] [--passes=n] [--length=n]
+                               [--generations=n] [--jobs=n] [strategy ...]
+"""
+import getopt
+import logging
+import multiprocessing
+import os
+import sys
+import tempfile
+import time
+from unittest import mock
+
+from plumbum import local
+
+from polyjit.experiments import fake_opt
+
+DEFAULT_LATENCY = 0.0
+DEFAULT_NUM_PASSES = 10
+DEFAULT_SEQ_LENGTH = 5
+DEFAULT_GENERATIONS = 3
+
+
+def sequences_strategies(program, pass_space, length, generations):
+    """The strategies of this directory, they call opt via polly_stats."""
+    import polyjit.experiments.sequences.genetic1 as genetic1
+    import polyjit.experiments.sequences.genetic1_opt as genetic1_opt
+    import polyjit.experiments.sequences.genetic2 as genetic2
+    import polyjit.experiments.sequences.genetic2_opt as genetic2_opt
+    import polyjit.experiments.sequences.greedy as greedy
+    import polyjit.experiments.sequences.hill_climber as hill_climber
+
+    workers = multiprocessing.cpu_count()
+    return {
+        'hill_climber': (workers, lambda: hill_climber.generate_custom_sequence(
+            program, pass_space, length, iterations=1)),
+        'hill_climber-first': (
+            workers, lambda: hill_climber.generate_custom_sequence(
+                program, pass_space, length, iterations=1, first_k=1)),
+        'greedy': (workers, lambda: greedy.generate_custom_sequence(
+            program, pass_space, length, iterations=1)),
+        'genetic1': (workers, lambda: genetic1.Population(
+            gene_pool=pass_space,
+            environment=program).simulate_generations(generations)),
+        'genetic2': (workers, lambda: genetic2.Population(
+            gene_pool=pass_space,
+            environment=program).simulate_generations(generations)),
+        'genetic1_opt': (workers, lambda: genetic1_opt.simulate_generations(
+            pass_space, program, generations)),
+        'genetic2_opt': (workers, lambda: genetic2_opt.simulate_generations(
+            pass_space, program, generations)),
+    }
+
+
+def pj_sequence_strategies(program, opt, pass_space, length, generations,
+                           jobs):
+    """The strategies of pj_sequence.py, they call opt via RunSequence."""
+    from benchbuild import settings
+    from polyjit.experiments import pj_sequence
+
+    settings.CFG["jobs"] = jobs
+    workers = jobs * 5
+    opt_cmd = local[opt][program, "-disable-output", "-stats"]
+
+    def run_extension(extension_cls):
+        def run_it():
+            extension = extension_cls(
+                None, None, pj_sequence.RunSequence(None, None))
+            with mock.patch.object(pj_sequence, 'prepare_search',
+                                   return_value=(None, opt_cmd, None, [])), \
+                    mock.patch.object(pj_sequence, 'persist_sequence'), \
+                    mock.patch.object(pj_sequence, 'get_defaults',
+                                      return_value=(pass_space, length, 1)), \
+                    mock.patch.object(pj_sequence, 'get_genetic_defaults',
+                                      return_value=(length, 20, generations)):
+                extension(None)
+        return (workers, run_it)
+
+    return {
+        'pj-seq-hillclimber': run_extension(
+            pj_sequence.FindFittestSequenceHillclimber),
+        'pj-seq-greedy': run_extension(pj_sequence.FindFittestSequenceGreedy),
+        'pj-seq-genetic1-opt': run_extension(
+            pj_sequence.FindFittestSequenceGenetic1),
+        'pj-seq-genetic2-opt': run_extension(
+            pj_sequence.FindFittestSequenceGenetic2),
+        'pj-seq-annealing': run_extension(
+            pj_sequence.FindFittestSequenceAnnealing),
+        'pj-seq-tabu': run_extension(pj_sequence.FindFittestSequenceTabu),
+    }
+
+
+def read_calls(log_path):
+    """The (duration, start) pairs the fake opt logged."""
+    with open(log_path) as log_file:
+        return [
+            tuple(float(value) for value in line.split())
+            for line in log_file if line.strip()
+        ]
+
+
+def covered(intervals):
+    """The total length of the union of (begin, end) intervals."""
+    total = 0.0
+    current_begin = current_end = None
+    for begin, end in sorted(intervals):
+        if current_end is None or begin > current_end:
+            if current_end is not None:
+                total += current_end - current_begin
+            current_begin, current_end = begin, end
+        else:
+            current_end = max(current_end, end)
+    if current_end is not None:
+        total += current_end - current_begin
+    return total
+
+
+def calibrate(opt, log_path, runs=10):
+    """
+    The cost of a fake opt call outside of its own measurement.
+
+    That is mostly the start-up of the Python interpreter.
+    """
+    open(log_path, 'w').close()
+    opt_cmd = local[opt]['-disable-output']
+    start = time.perf_counter()
+    for _ in range(runs):
+        opt_cmd()
+    wall = time.perf_counter() - start
+    inside = sum(duration for duration, _ in read_calls(log_path))
+    return max(0.0, (wall - inside) / runs)
+
+
+def measure(name, workers, strategy, log_path, shim=0.0):
+    """Runs a strategy and returns its benchmark results."""
+    open(log_path, 'w').close()
+    start = time.perf_counter()
+    strategy()
+    wall = time.perf_counter() - start
+
+    opt_calls = read_calls(log_path)
+    calls = len(opt_calls)
+    busy = sum(duration + shim for duration, _ in opt_calls)
+    alive = min(wall, covered(
+        (begin - shim, begin + duration) for duration, begin in opt_calls))
+    return {
+        'strategy': name,
+        'calls': calls,
+        'seconds': wall,
+        'calls/s': calls / wall if wall else 0.0,
+        'overhead_ms': (wall - alive) / calls * 1000 if calls else 0.0,
+        'idle_%': 100 * max(0.0, 1 - busy / (alive * workers))
+                  if alive else 0.0,
+        'shim_ms': shim * 1000
+    }
+
+
+def print_results(results):
+    """Prints the benchmark results as table."""
+    row = '{strategy:<20} {calls:>8} {seconds:>10.2f} {calls/s:>10.1f} ' \
+          '{overhead_ms:>12.2f} {idle_%:>8.1f} {shim_ms:>8.2f}'
+    print('{0:<20} {1:>8} {2:>10} {3:>10} {4:>12} {5:>8} {6:>8}'.format(
+        'strategy', 'calls', 'seconds', 'calls/s', 'overhead_ms', 'idle_%',
+        'shim_ms'))
+    for result in results:
+        print(row.format(**result))
+
+
+def __usage():
+    """Prints out the usage of this python script."""
+    logging.getLogger(__name__).warning(
+        'Usage: benchmark_strategies.py [--latency=s] [--passes=n] '
+        '[--length=n] [--generations=n] [--jobs=n] [strategy ...]')
+
+
+def main(argv):
+    """Runs the benchmark."""
+    latency = DEFAULT_LATENCY
+    num_passes = DEFAULT_NUM_PASSES
+    length = DEFAULT_SEQ_LENGTH
+    generations = DEFAULT_GENERATIONS
+    jobs = 1
+
+    try:
+        opts, selected = getopt.getopt(
+            argv, 'h',
+            ['help', 'latency=', 'passes=', 'length=', 'generations=',
+             'jobs='])
+    except getopt.GetoptError:
+        __usage()
+        sys.exit(2)
+
+    for opt, arg in opts:
+        if opt in ('-h', '--help'):
+            __usage()
+            sys.exit()
+        elif opt == '--latency':
+            latency = float(arg)
+        elif opt == '--passes':
+            num_passes = int(arg)
+        elif opt == '--length':
+            length = int(arg)
+        elif opt == '--generations':
+            generations = int(arg)
+        elif opt == '--jobs':
+            jobs = int(arg)
+
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        opt = fake_opt.install(tmp_dir)
+        log_path = os.path.join(tmp_dir, 'calls.log')
+        program = os.path.join(tmp_dir, 'module.ll')
+        with open(program, 'w') as module:
+            module.write('define void @benchmark() { ret void }\n')
+
+        # polly_stats reads its configuration on import.
+        os.environ['POLLY_STATS_OPT'] = opt
+        from polyjit.experiments.sequences import polly_stats
+        polly_stats.OPT_CALL[0] = opt
+
+        from polyjit.experiments.pj_sequence import DEFAULT_PASS_SPACE
+        pass_space = DEFAULT_PASS_SPACE[:num_passes]
+
+        strategies = sequences_strategies(program, pass_space, length,
+                                          generations)
+        strategies.update(
+            pj_sequence_strategies(program, opt, pass_space, length,
+                                   generations, jobs))
+
+        results = []
+        with local.env(FAKE_OPT_LATENCY=str(latency), FAKE_OPT_LOG=log_path):
+            with local.env(FAKE_OPT_LATENCY='0'):
+                shim = calibrate(opt, log_path)
+            for name in sorted(strategies):
+                if selected and name not in selected:
+                    continue
+                workers, strategy = strategies[name]
+                results.append(
+                    measure(name, workers, strategy, log_path, shim))
+        print_results(results)
+
+
+if __name__ == '__main__':
+    main(sys.argv[1:])
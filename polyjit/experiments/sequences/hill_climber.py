@@ -10,11 +10,13 @@ is a list of flags that can be set by the LLVM opt tool. The generated
 sequence is meant to be a good flag combination that increases the amount of
 code that can be detected by Polly.
 """
+import concurrent.futures as cf
 import random
 import multiprocessing
 import logging
 
 import polyjit.experiments.sequences.polly_stats as polly_stats
+from polyjit.experiments import local_search
 
 
 __author__ = "Christoph Woller"
@@ -120,7 +122,38 @@ def calculate_neighbours(sequence, seq_to_fitness, pass_space, program):
     return neighbours
 
 
-def climb(sequence, program, pass_space, seq_to_fitness):
+def climb_first_improvement(sequence, program, pass_space, seq_to_fitness,
+                            first_k=1):
+    """Performs hill climbing without calculating full neighbourhoods.
+
+    Neighbours are evaluated in random order and as soon as first_k of them
+    outperform the base sequence, the best of them becomes the new base
+    sequence. Outstanding evaluations are cancelled.
+
+    Args:
+        sequence (list[string]): the sequence that should be used as base
+            sequence.
+        program (string): name of the application the sequences are applied
+            on.
+        pass_space (list[string]): a list containing all available passes.
+        seq_to_fitness (dict): dictionary that stores calculated fitness
+            values.
+        first_k (int, optional): the number of improving neighbours the next
+            base sequence is chosen from.
+    """
+    def evaluate(sequence):
+        key = str(sequence)
+        calculate_fitness_value(sequence, seq_to_fitness, key, program)
+        return seq_to_fitness[key]
+
+    jobs = multiprocessing.cpu_count()
+    with cf.ThreadPoolExecutor(max_workers=jobs) as pool:
+        base_sequence, _ = local_search.climb(sequence, pass_space, evaluate,
+                                              pool, first_k, jobs)
+    return base_sequence
+
+
+def climb(sequence, program, pass_space, seq_to_fitness, first_k=0):
     """Performs the actual hill climbing.
 
     Args:
@@ -131,7 +164,14 @@ def climb(sequence, program, pass_space, seq_to_fitness):
         pass_space (list[string]): a list containing all available passes.
         seq_to_fitness (dict): dictionary that stores calculated fitness
             values.
+        first_k (int, optional): if greater than 0, move to the best of the
+            first k improving neighbours instead of calculating all
+            neighbours, see climb_first_improvement.
     """
+    if first_k > 0:
+        return climb_first_improvement(sequence, program, pass_space,
+                                       seq_to_fitness, first_k)
+
     log = logging.getLogger(__name__)
     base_sequence = sequence
     base_sequence_key = str(base_sequence)
@@ -179,7 +219,8 @@ def climb(sequence, program, pass_space, seq_to_fitness):
 
 def generate_custom_sequence(program, pass_space=DEFAULT_PASS_SPACE,
                              seq_length=DEFAULT_SEQ_LENGTH,
-                             iterations=DEFAULT_ITERATIONS, debug=False):
+                             iterations=DEFAULT_ITERATIONS, debug=False,
+                             first_k=0):
     """Generates a custom optimization sequence for a provided application.
 
     Args:
@@ -194,6 +235,9 @@ def generate_custom_sequence(program, pass_space=DEFAULT_PASS_SPACE,
             process is to be repeated.
         debug (boolean, optional): true if debug information should be printed;
             false otherwise.
+        first_k (int, optional): if greater than 0, climb to the best of the
+            first k improving neighbours instead of calculating all
+            neighbours.
 
     Returns:
         list[string]: the generated custom optimization sequence. Each element
@@ -211,7 +255,7 @@ def generate_custom_sequence(program, pass_space=DEFAULT_PASS_SPACE,
         log.debug("Iteration: %d", i + 1)
         base_sequence = create_random_sequence(pass_space, seq_length)
         base_sequence = climb(base_sequence, program, pass_space,
-                              seq_to_fitness)
+                              seq_to_fitness, first_k)
 
         if not best_sequence or seq_to_fitness[str(best_sequence)] < \
                 seq_to_fitness[str(base_sequence)]:
@@ -3,16 +3,23 @@
 information from calls of the LLVM opt tool.
 """
 import os
-from benchbuild.utils.compiler import compiler
+
+from plumbum import local
 
 __author__ = "Christoph Woller"
 __credits__ = ["Christoph Woller"]
 __maintainer__ = "Christoph Woller"
 __email__ = "wollerch@fim.uni-passau.de"
 
-# Where is Polly?
-POLLY = '-load=/home/wollerch/llvm/install/llvm/lib/LLVMPolly.so'
-OPT_CALL = ['/home/wollerch/llvm/install/llvm/bin/opt', '-strip-debug', POLLY]
+# Where is Polly? Override with POLLY_STATS_OPT and POLLY_STATS_POLLY, e.g.,
+# to run the searches against polyjit.experiments.fake_opt.
+POLLY = '-load=' + os.environ.get(
+    'POLLY_STATS_POLLY', '/home/wollerch/llvm/install/llvm/lib/LLVMPolly.so')
+OPT_CALL = [
+    os.environ.get('POLLY_STATS_OPT',
+                   '/home/wollerch/llvm/install/llvm/bin/opt'), '-strip-debug',
+    POLLY
+]
 TEST_POLLY = '-load=/Users/c-Mac/Applications/llvm/install/llvm/lib' \
              '/LLVMPolly.so'
 TEST_OPT_CALL = ['/Users/c-Mac/Applications/llvm/install/llvm/bin/opt',
@@ -22,6 +29,12 @@ TEST_OPT_CALL = ['/Users/c-Mac/Applications/llvm/install/llvm/bin/opt',
 STATS_FLAGS = ['-polly-detect', '-stats']
 
 
+def run_opt(command):
+    """Runs the opt command and returns the lines of its stderr."""
+    _, _, stderr = local[command[0]][command[1:]].run(retcode=None)
+    return stderr.splitlines()
+
+
 def detect_scops(opt_flags, program):
     """Calls the opt tool (with Polly) to detect SCoPs in specified program
     and prints out the results of the detection.
@@ -32,14 +45,9 @@ def detect_scops(opt_flags, program):
     """
     command = OPT_CALL + opt_flags + STATS_FLAGS + [program]
     print('Opt call: ' + str(command))
-    fnull = open(os.devnull, 'w')
-    p = compiler(CFG["compiler"]["cxx"].value)
-    _, stderr = p.communicate()
-    output = stderr.splitlines()
 
-    for line in output:
+    for line in run_opt(command):
         print(line)
-    fnull.close()
 
 
 def __get_number_of_certain_stats_line(opt_flags, program, line_a, line_b=None,
@@ -67,10 +75,7 @@ def __get_number_of_certain_stats_line(opt_flags, program, line_a, line_b=None,
     command.extend(opt_flags)
     command.extend(STATS_FLAGS)
     command.append(program)
-    fnull = open(os.devnull, 'w')
-    p = compiler(CFG["compiler"]["cxx"].value)
-    _, stderr = p.communicate()
-    stderr = stderr.splitlines()
+    stderr = run_opt(command)
 
     # Catch the result and return the number of detected SCoPs
     a = 0
@@ -101,7 +106,6 @@ def __get_number_of_certain_stats_line(opt_flags, program, line_a, line_b=None,
                 line_b = None
                 a = float('inf')
                 break
-    fnull.close()
 
     if line_b is None:
         result = a
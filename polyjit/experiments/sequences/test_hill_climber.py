@@ -32,6 +32,12 @@ class ClimberTestCase(unittest.TestCase):
                                       self.seq_to_fitness)
         self.assertTrue(sequence == ['b', 'b'])
 
+    def test_climb_first_improvement(self):
+        for first_k in [1, 2]:
+            sequence = hill_climber.climb(['a', 'a'], 'test', self.pass_space,
+                                          self.seq_to_fitness, first_k)
+            self.assertEqual(sequence, ['b', 'b'])
+
 
 if __name__ == '__main__':
     unittest.main()
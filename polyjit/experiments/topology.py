@@ -0,0 +1,236 @@
+"""
+CPU topology and core pinning.
+
+Scaling experiments run a configuration with 1..N cores. Without pinning the
+scheduler is free to move threads between SMT siblings and NUMA nodes, which
+adds noise to the measurement. This module reads the topology from sysfs and
+hands out deterministic core sets: physical cores first, one NUMA node after
+the other, SMT siblings last.
+
+The same core set is used for likwid-perfctr -C, taskset (or the affinity of
+the child process) and GOMP_CPU_AFFINITY.
+"""
+import collections
+import functools
+import logging
+import os
+import shutil
+
+from plumbum import local
+from plumbum.commands.base import BaseCommand
+
+from benchbuild.extensions import base
+from benchbuild.utils import db
+
+LOG = logging.getLogger(__name__)
+
+SYSFS = '/sys/devices/system'
+
+Cpu = collections.namedtuple('Cpu', ['cpu', 'core', 'package', 'node',
+                                     'thread'])
+
+
+def parse_cpu_list(cpu_list):
+    """
+    Parse a sysfs cpu list, e.g., '0-3,8,10-11'.
+
+    Returns:
+        A sorted list of cpu ids.
+    """
+    cpus = set()
+    for chunk in cpu_list.strip().split(','):
+        if not chunk:
+            continue
+        first, _, last = chunk.partition('-')
+        cpus.update(range(int(first), int(last or first) + 1))
+    return sorted(cpus)
+
+
+def format_cpu_list(cpus):
+    """Format cpu ids as sysfs cpu list, the inverse of parse_cpu_list."""
+    ranges = []
+    for cpu in sorted(set(cpus)):
+        if ranges and ranges[-1][1] == cpu - 1:
+            ranges[-1][1] = cpu
+        else:
+            ranges.append([cpu, cpu])
+    return ','.join(
+        str(first) if first == last else '{:d}-{:d}'.format(first, last)
+        for first, last in ranges)
+
+
+def read_value(path, default=None):
+    try:
+        with open(path) as value_f:
+            return value_f.read().strip()
+    except OSError:
+        return default
+
+
+def read_topology(sysfs=SYSFS):
+    """
+    Read the topology of all online cpus.
+
+    Systems without NUMA support report all cpus on node 0.
+
+    Returns:
+        A list of Cpu tuples, sorted by cpu id.
+    """
+    cpu_dir = os.path.join(sysfs, 'cpu')
+    online = read_value(os.path.join(cpu_dir, 'online'))
+    if online is None:
+        return [Cpu(cpu, cpu, 0, 0, 0) for cpu in range(os.cpu_count())]
+
+    nodes = {}
+    node_dir = os.path.join(sysfs, 'node')
+    if os.path.isdir(node_dir):
+        for entry in os.listdir(node_dir):
+            if not entry.startswith('node') or not entry[4:].isdigit():
+                continue
+            cpu_list = read_value(os.path.join(node_dir, entry, 'cpulist'),
+                                  '')
+            for cpu in parse_cpu_list(cpu_list):
+                nodes[cpu] = int(entry[4:])
+
+    topology = []
+    for cpu in parse_cpu_list(online):
+        topo_dir = os.path.join(cpu_dir, 'cpu{:d}'.format(cpu), 'topology')
+        core = int(read_value(os.path.join(topo_dir, 'core_id'), cpu))
+        package = int(
+            read_value(os.path.join(topo_dir, 'physical_package_id'), 0))
+        siblings = parse_cpu_list(
+            read_value(
+                os.path.join(topo_dir, 'thread_siblings_list'), str(cpu)))
+        thread = siblings.index(cpu) if cpu in siblings else 0
+        topology.append(Cpu(cpu, core, package, nodes.get(cpu, 0), thread))
+    return topology
+
+
+@functools.lru_cache(maxsize=1)
+def system_topology():
+    """The topology of this machine, read once."""
+    return tuple(read_topology())
+
+
+def core_order(topology):
+    """
+    Order cpus by their preference for pinning.
+
+    We take the first hardware thread of every physical core before any SMT
+    sibling, and we fill one NUMA node before we move on to the next.
+    """
+    return [
+        cpu.cpu for cpu in sorted(
+            topology,
+            key=lambda c: (c.thread, c.node, c.package, c.core, c.cpu))
+    ]
+
+
+def core_set(jobs, topology=None):
+    """
+    The cpus we pin a run with the given number of jobs to.
+
+    Args:
+        jobs: The number of cpus we want.
+        topology: The topology to choose from, this machine by default.
+
+    Returns:
+        A sorted list of cpu ids.
+    """
+    if topology is None:
+        topology = system_topology()
+    order = core_order(topology)
+    if jobs > len(order):
+        LOG.warning("Requested %d cores, but only %d are online.", jobs,
+                    len(order))
+    return sorted(order[:max(1, jobs)])
+
+
+def affinity_env(cpus):
+    """Environment that binds OpenMP threads to the given cpus."""
+    return {'GOMP_CPU_AFFINITY': ' '.join(str(cpu) for cpu in sorted(cpus))}
+
+
+class PinnedCommand(BaseCommand):
+    """
+    Pin every process a command spawns to the given cpus.
+
+    The affinity is set in the child between fork and exec, the affinity of
+    our own process (and its other threads) stays untouched.
+    """
+
+    __slots__ = ("cmd", "cpus")
+
+    def __init__(self, cmd, cpus):
+        self.cmd = cmd
+        self.cpus = cpus
+
+    def __repr__(self):
+        return "PinnedCommand({0!r}, {1!r})".format(self.cmd, self.cpus)
+
+    def _get_encoding(self):
+        return self.cmd._get_encoding()
+
+    def bound_command(self, *args):
+        return PinnedCommand(self.cmd.bound_command(*args), self.cpus)
+
+    def formulate(self, level=0, args=()):
+        return self.cmd.formulate(level, args)
+
+    @property
+    def machine(self):
+        return self.cmd.machine
+
+    def popen(self, args=(), **kwargs):
+        cpus = self.cpus
+        preexec_fn = kwargs.pop('preexec_fn', None)
+
+        def pin():
+            os.sched_setaffinity(0, cpus)
+            if preexec_fn:
+                preexec_fn()
+
+        return self.cmd.popen(args, preexec_fn=pin, **kwargs)
+
+
+class PinCores(base.Extension):
+    """
+    Pin the wrapped binary to a core set of 'jobs' cpus.
+
+    We prefer taskset and fall back to setting the affinity of the child
+    process, see PinnedCommand. OpenMP threads are bound to the same cpus
+    through GOMP_CPU_AFFINITY. The core set is stored as 'cores.pinned' in
+    the config of each run.
+    """
+
+    def __call__(self, binary_command, *args, **kwargs):
+        config = self.config
+        if config is not None and 'jobs' in config.keys():
+            jobs = int(config['jobs'])
+        else:
+            LOG.warning("Parameter 'config' was unusable, not pinning.")
+            return self.call_next(binary_command, *args, **kwargs)
+
+        cpus = core_set(jobs)
+        cpu_list = format_cpu_list(cpus)
+        LOG.debug("Pinning %s to cpus %s", binary_command, cpu_list)
+
+        with local.env(**affinity_env(cpus)):
+            if shutil.which('taskset'):
+                res = self.call_next(
+                    local['taskset']['-c', cpu_list, binary_command], *args,
+                    **kwargs)
+            else:
+                res = self.call_next(
+                    PinnedCommand(binary_command, cpus), *args, **kwargs)
+
+        for run_info in res:
+            if getattr(run_info, 'db_run', None) is None:
+                continue
+            db.persist_config(run_info.db_run, run_info.session,
+                              {"cores.pinned": cpu_list})
+            run_info.session.commit()
+        return res
+
+    def __str__(self):
+        return "Pin the binary to a set of cores"
@@ -0,0 +1,352 @@
+"""
+Streaming ingestion of PolyJIT logs.
+
+At trace level libpjit writes logs of several gigabytes on long benchmarks.
+Instead of dumping them as a whole, we stream each log line by line through
+a compressor into a chunked blob store and extract a small index of the
+interesting lines on the way:
+
+    polyjit_log        one row per log, codec, sizes and retention info.
+    polyjit_log_chunk  the compressed stream, split into chunks.
+    polyjit_log_event  timestamp, level, region and event of indexed lines.
+
+Logs beyond `trace_logs.max_size` bytes keep their head and their tail, the
+middle is dropped. The index always covers the whole log, up to
+`trace_logs.max_events` entries.
+
+We compress with zstd, if the zstandard module is available, with gzip
+otherwise.
+"""
+import collections
+import datetime
+import logging
+import re
+import zlib
+
+import sqlalchemy as sa
+
+from benchbuild import settings
+from benchbuild.extensions import base
+from benchbuild.utils import schema
+from polyjit.experiments import artifacts
+
+try:
+    import zstandard
+except ImportError:
+    zstandard = None
+
+CFG = settings.CFG
+LOG = logging.getLogger(__name__)
+
+CFG["trace_logs"] = {
+    "codec": {
+        "default": "auto",
+        "desc": "Compression of stored logs: zstd, gzip or auto."
+    },
+    "chunk_size": {
+        "default": 1024**2,
+        "desc": "Size of a compressed chunk in bytes."
+    },
+    "max_size": {
+        "default": 256 * 1024**2,
+        "desc": "Raw bytes we keep per log, split between head and tail."
+    },
+    "max_events": {
+        "default": 100000,
+        "desc": "Maximal number of indexed lines per log."
+    }
+}
+CFG["trace_logs"].init_from_env()
+
+BATCH_SIZE = 1000
+
+# libpjit logs with spdlog's default pattern:
+#   [2018-05-04 13:12:11.123] [polli] [trace] message
+LINE = re.compile(
+    rb"^\[(?P<timestamp>\d{4}-\d\d-\d\d \d\d:\d\d:\d\d(?:\.\d+)?)\]"
+    rb" \[[^\]]*\] \[(?P<level>\w+)\] (?P<message>.*)$")
+REGION = re.compile(
+    rb"\b(?:region|scop)(?:[-_ ]?id)?[=: ]+'?(?P<region>[\w.$-]+)",
+    re.IGNORECASE)
+EVENT = re.compile(
+    rb"\b(?P<event>codegen|recompil\w*|compil\w*|cache[- ]hit|cache[- ]miss"
+    rb"|variant|blocked|request)", re.IGNORECASE)
+
+
+class PJ_Log(schema.BASE):
+    __tablename__ = 'polyjit_log'
+    id = sa.Column(sa.Integer, primary_key=True)
+    run_id = sa.Column(
+        sa.Integer,
+        sa.ForeignKey("run.id", onupdate="CASCADE", ondelete="CASCADE"),
+        index=True)
+    name = sa.Column(sa.String)
+    codec = sa.Column(sa.String(8))
+    raw_size = sa.Column(sa.BigInteger)
+    stored_size = sa.Column(sa.BigInteger)
+    dropped_size = sa.Column(sa.BigInteger)
+    n_lines = sa.Column(sa.Integer)
+    n_chunks = sa.Column(sa.Integer)
+
+
+class PJ_LogChunk(schema.BASE):
+    __tablename__ = 'polyjit_log_chunk'
+    id = sa.Column(sa.Integer, primary_key=True)
+    log_id = sa.Column(
+        sa.Integer,
+        sa.ForeignKey(
+            "polyjit_log.id", onupdate="CASCADE", ondelete="CASCADE"),
+        index=True)
+    seq = sa.Column(sa.Integer)
+    data = sa.Column(sa.LargeBinary)
+
+
+class PJ_LogEvent(schema.BASE):
+    __tablename__ = 'polyjit_log_event'
+    id = sa.Column(sa.Integer, primary_key=True)
+    log_id = sa.Column(
+        sa.Integer,
+        sa.ForeignKey(
+            "polyjit_log.id", onupdate="CASCADE", ondelete="CASCADE"),
+        index=True)
+    line = sa.Column(sa.Integer)
+    offset = sa.Column(sa.BigInteger)
+    timestamp = sa.Column(sa.DateTime(timezone=False))
+    level = sa.Column(sa.String(8))
+    region = sa.Column(sa.String, index=True)
+    event = sa.Column(sa.String, index=True)
+
+
+def codec_name(codec=None):
+    """Resolve the codec, 'auto' prefers zstd."""
+    if codec is None:
+        codec = CFG["trace_logs"]["codec"].value
+    if codec == "auto":
+        codec = "zstd" if zstandard else "gzip"
+    if codec == "zstd" and zstandard is None:
+        LOG.warning("zstandard is not installed, falling back to gzip.")
+        codec = "gzip"
+    if codec not in ("zstd", "gzip"):
+        raise ValueError("Unknown codec: {0}".format(codec))
+    return codec
+
+
+def compressor(codec):
+    if codec == "zstd":
+        return zstandard.ZstdCompressor().compressobj()
+    return zlib.compressobj(wbits=31)
+
+
+def decompressor(codec):
+    if codec == "zstd":
+        return zstandard.ZstdDecompressor().decompressobj()
+    return zlib.decompressobj(wbits=31)
+
+
+def index_line(line):
+    """
+    Extract the index entry of a log line.
+
+    Returns:
+        A dict with timestamp, level, region and event, or None if the line
+        has neither a region nor an event.
+    """
+    match = LINE.match(line.rstrip(b"\r\n"))
+    message = match.group("message") if match else line
+    region = REGION.search(message)
+    event = EVENT.search(message)
+    if not (region or event):
+        return None
+
+    entry = {"timestamp": None, "level": None, "region": None, "event": None}
+    if match:
+        entry["timestamp"] = datetime.datetime.strptime(
+            match.group("timestamp").decode(), "%Y-%m-%d %H:%M:%S.%f"
+            if b"." in match.group("timestamp") else "%Y-%m-%d %H:%M:%S")
+        entry["level"] = match.group("level").decode()
+    if region:
+        entry["region"] = region.group("region").decode(errors="replace")
+    if event:
+        entry["event"] = event.group("event").decode().lower()
+    return entry
+
+
+class ChunkWriter:
+    """Compress a stream and flush it in chunks of a fixed size."""
+
+    def __init__(self, session, log_id, codec, chunk_size):
+        self.session = session
+        self.log_id = log_id
+        self.compressor = compressor(codec)
+        self.chunk_size = chunk_size
+        self.buffer = bytearray()
+        self.pending = []
+        self.n_chunks = 0
+        self.raw_size = 0
+        self.stored_size = 0
+
+    def write(self, data):
+        self.raw_size += len(data)
+        self.buffer += self.compressor.compress(data)
+        self.split()
+
+    def split(self):
+        while len(self.buffer) >= self.chunk_size:
+            self.add_chunk(bytes(self.buffer[:self.chunk_size]))
+            del self.buffer[:self.chunk_size]
+
+    def add_chunk(self, data):
+        self.pending.append({
+            "log_id": self.log_id,
+            "seq": self.n_chunks,
+            "data": data
+        })
+        self.n_chunks += 1
+        self.stored_size += len(data)
+        if len(self.pending) >= 16:
+            self.flush()
+
+    def flush(self):
+        if self.pending:
+            self.session.bulk_insert_mappings(PJ_LogChunk, self.pending)
+            self.pending = []
+
+    def close(self):
+        self.buffer += self.compressor.flush()
+        self.split()
+        if self.buffer:
+            self.add_chunk(bytes(self.buffer))
+            self.buffer = bytearray()
+        self.flush()
+
+
+def ingest_log(session, run_id, path, codec=None, chunk_size=None,
+               max_size=None, max_events=None):
+    """
+    Stream a log into the blob store and index it.
+
+    Args:
+        session: The database session we use.
+        run_id: The run the log belongs to.
+        path: The log file.
+        codec: zstd, gzip or auto. Defaults to `trace_logs.codec`.
+        chunk_size: Size of a compressed chunk in bytes.
+        max_size: Raw bytes we keep, half in the head and half in the tail.
+        max_events: Maximal number of index entries.
+
+    Returns:
+        The PJ_Log row of the stored log.
+    """
+    cfg = CFG["trace_logs"]
+    codec = codec_name(codec)
+    chunk_size = int(chunk_size or cfg["chunk_size"].value)
+    max_size = int(max_size if max_size is not None else cfg["max_size"].value)
+    max_events = int(max_events if max_events is not None else
+                     cfg["max_events"].value)
+
+    log = PJ_Log(run_id=run_id, name=str(path), codec=codec)
+    session.add(log)
+    session.flush()
+
+    writer = ChunkWriter(session, log.id, codec, chunk_size)
+    head_size = max_size // 2
+    tail_size = max_size - head_size
+    tail = collections.deque()
+    tail_bytes = 0
+    dropped = 0
+    offset = 0
+    n_lines = 0
+    n_events = 0
+    events = []
+
+    with open(path, 'rb') as log_f:
+        for line in log_f:
+            if n_events < max_events:
+                entry = index_line(line)
+                if entry:
+                    entry.update(log_id=log.id, line=n_lines, offset=offset)
+                    events.append(entry)
+                    n_events += 1
+                    if len(events) >= BATCH_SIZE:
+                        session.bulk_insert_mappings(PJ_LogEvent, events)
+                        events = []
+            n_lines += 1
+            offset += len(line)
+
+            if writer.raw_size + len(line) <= head_size and not tail:
+                writer.write(line)
+                continue
+
+            tail.append(line)
+            tail_bytes += len(line)
+            while tail_bytes > tail_size:
+                dropped_line = tail.popleft()
+                tail_bytes -= len(dropped_line)
+                dropped += len(dropped_line)
+
+    if dropped:
+        writer.write("[... {0} bytes dropped ...]\n".format(dropped).encode())
+    for line in tail:
+        writer.write(line)
+    writer.close()
+    if events:
+        session.bulk_insert_mappings(PJ_LogEvent, events)
+
+    log.raw_size = offset
+    log.stored_size = writer.stored_size
+    log.dropped_size = dropped
+    log.n_lines = n_lines
+    log.n_chunks = writer.n_chunks
+    return log
+
+
+def read_log(session, log):
+    """Decompress a stored log, chunk by chunk."""
+    decomp = decompressor(log.codec)
+    chunks = session.query(PJ_LogChunk.data) \
+        .filter(PJ_LogChunk.log_id == log.id) \
+        .order_by(PJ_LogChunk.seq)
+    for (data, ) in chunks:
+        yield decomp.decompress(data)
+    if log.codec == "gzip":
+        yield decomp.flush()
+
+
+class StoreLogs(base.Extension):
+    """
+    Store the PolyJIT logs of a run in the database.
+
+    This replaces LogAdditionals for PolyJIT logs. It needs to wrap
+    RegisterPolyJITLogs, we find the logs in the manifest of the run's
+    artifact directory.
+
+    Args:
+        project: The project we run.
+    """
+
+    def __init__(self, *extensions, project=None, **kwargs):
+        super(StoreLogs, self).__init__(*extensions, **kwargs)
+        self.project = project
+
+    def __call__(self, *args, **kwargs):
+        with artifacts.run_artifacts(self.project) as run_dir:
+            res = self.call_next(*args, **kwargs)
+            logs = [
+                path for kind, path in run_dir.existing().items()
+                if kind == "log"
+            ]
+
+        runs = [r for r in res or [] if getattr(r, 'db_run', None)]
+        if not (runs and logs):
+            return res
+
+        session = schema.Session()
+        for path in logs:
+            log = ingest_log(session, runs[-1].db_run.id, path)
+            LOG.debug("Stored %s: %d of %d bytes, %d dropped.", path,
+                      log.stored_size, log.raw_size, log.dropped_size)
+        session.commit()
+        return res
+
+    def __str__(self):
+        return "Store PolyJIT logs"
@@ -0,0 +1,197 @@
+"""
+Cache the frames of reports over finished experiments.
+
+Finished experiments never change, yet every report recomputed everything
+from the raw rows. We key the output frames of a report by:
+
+    * the report name,
+    * the hash of its queries, of the code that evaluates them and of the
+      constants that code uses (e.g., the configs it compares),
+    * the sorted experiment ids,
+    * the state of those experiments: number of runs, the latest run id
+      and the latest begin/end timestamp.
+
+New runs change the state and with it the key, nothing else invalidates an
+entry. Entries live in `report_cache.dir` and store one Parquet file per
+frame, or a pickle without pyarrow.
+"""
+import functools as ft
+import hashlib
+import inspect
+import logging
+import os
+import shutil
+import uuid
+
+import pandas as pd
+import sqlalchemy as sa
+
+import benchbuild.utils.schema as schema
+from benchbuild import settings
+
+try:
+    import pyarrow
+except ImportError:
+    pyarrow = None
+
+CFG = settings.CFG
+LOG = logging.getLogger(__name__)
+
+CFG["report_cache"] = {
+    "enable": {
+        "default": True,
+        "desc": "Reuse report results of unchanged experiments."
+    },
+    "dir": {
+        "default": None,
+        "desc": "Where we store cached reports, <build_dir>/.report-cache "
+                "by default."
+    }
+}
+CFG["report_cache"].init_from_env()
+
+RUN = schema.Run.__table__
+FORMAT = "parquet" if pyarrow else "pickle"
+INDEX = "index.txt"
+
+
+def experiment_state(connection, experiment_ids):
+    """The number of runs, latest run id and timestamps of experiments."""
+    query = sa.sql.select([
+        sa.func.count(RUN.c.id),
+        sa.func.max(RUN.c.id),
+        sa.func.max(RUN.c.begin),
+        sa.func.max(RUN.c.end)
+    ]).where(
+        RUN.c.experiment_group.in_(
+            sa.sql.bindparam('exp_ids', expanding=True)))
+    row = connection.execute(query, exp_ids=list(experiment_ids)).first()
+    return [str(value) for value in row]
+
+
+def query_text(query):
+    """
+    The SQL of a query or the source of a module or callable.
+
+    Anything else, e.g., the configs a report compares, counts by its repr.
+    """
+    if isinstance(query, sa.sql.ClauseElement):
+        return str(query)
+    if inspect.ismodule(query) or callable(query):
+        return inspect.getsource(query)
+    if isinstance(query, str):
+        return query
+    return repr(query)
+
+
+def cache_key(report_name, queries, experiment_ids, state):
+    digest = hashlib.sha256()
+    for part in [report_name] + [query_text(q) for q in queries] + \
+            sorted(str(exp_id) for exp_id in experiment_ids) + list(state):
+        digest.update(part.encode())
+        digest.update(b"\0")
+    return digest.hexdigest()
+
+
+class ReportCache:
+    """
+    Frames of reports, stored by key.
+
+    Args:
+        root: The directory of the cache.
+    """
+
+    def __init__(self, root):
+        self.root = root
+
+    def entry(self, key):
+        return os.path.join(self.root, key)
+
+    @staticmethod
+    def frame_file(entry, index):
+        return os.path.join(entry, "{0:03d}.{1}".format(index, FORMAT))
+
+    def get(self, key):
+        """
+        Load the frames of an entry.
+
+        Returns:
+            A list of (name, frame) pairs or None, if we do not know key.
+        """
+        entry = self.entry(key)
+        index_file = os.path.join(entry, INDEX)
+        if not os.path.exists(index_file):
+            return None
+        with open(index_file) as index_f:
+            names = [line.rstrip("\n") for line in index_f]
+
+        frames = []
+        for index, name in enumerate(names):
+            path = self.frame_file(entry, index)
+            if FORMAT == "parquet":
+                frames.append((name, pd.read_parquet(path)))
+            else:
+                frames.append((name, pd.read_pickle(path)))
+        return frames
+
+    def put(self, key, frames):
+        """Store (name, frame) pairs under key."""
+        os.makedirs(self.root, exist_ok=True)
+        tmp_entry = os.path.join(self.root, ".tmp-" + uuid.uuid4().hex)
+        os.makedirs(tmp_entry)
+        try:
+            for index, (name, frame) in enumerate(frames):
+                path = self.frame_file(tmp_entry, index)
+                if FORMAT == "parquet":
+                    frame.to_parquet(path, index=False)
+                else:
+                    frame.to_pickle(path)
+            with open(os.path.join(tmp_entry, INDEX), 'w') as index_f:
+                index_f.writelines(
+                    "{0}\n".format(name) for name, _ in frames)
+            os.rename(tmp_entry, self.entry(key))
+        except OSError as err:
+            # Another report might have stored the same entry already.
+            LOG.debug("Could not store report %s: %s", key, err)
+            shutil.rmtree(tmp_entry, ignore_errors=True)
+
+
+@ft.lru_cache(maxsize=1)
+def default_cache():
+    root = CFG["report_cache"]["dir"].value
+    if not root:
+        root = os.path.join(str(CFG["build_dir"]), ".report-cache")
+    return ReportCache(root)
+
+
+def cached_frames(connection, report_name, queries, experiment_ids,
+                  compute, cache=None):
+    """
+    The frames of a report, computed only if the experiments changed.
+
+    Args:
+        connection: The connection we check the experiment state with.
+        report_name: The name of the report.
+        queries: Queries, callables and constants the frames depend on.
+        experiment_ids: The experiments of the report.
+        compute: Computes the (name, frame) pairs of the report.
+        cache: The ReportCache, `report_cache.dir` if None.
+
+    Returns:
+        A list of (name, frame) pairs.
+    """
+    if cache is None:
+        if not CFG["report_cache"]["enable"].value:
+            return list(compute())
+        cache = default_cache()
+
+    state = experiment_state(connection, experiment_ids)
+    key = cache_key(report_name, queries, experiment_ids, state)
+    frames = cache.get(key)
+    if frames is not None:
+        LOG.info("Reusing cached %s report: %s", report_name, key)
+        return frames
+
+    frames = list(compute())
+    cache.put(key, frames)
+    return frames
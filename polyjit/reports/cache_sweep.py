@@ -0,0 +1,105 @@
+"""
+Report the memory/time trade-off of the PolyJIT cache settings.
+
+For every project and cache configuration of pj-cache-sweep we report the
+median over all runs of:
+
+    hit_ratio  n_cachehits / n_requests
+    n_variants, t_codegen
+    rss        peak RSS in KiB
+    time       wall time in seconds
+
+A configuration is on the Pareto curve of its project, if no other
+configuration of the project needs less memory and less time.
+"""
+import pandas as pd
+import sqlalchemy as sa
+
+import benchbuild.reports as reports
+import benchbuild.utils.schema as schema
+from polyjit.experiments import polyjit
+from polyjit.reports import output
+
+RUN = schema.Run.__table__
+METRIC = schema.Metric.__table__
+RESULT = polyjit.PJ_Result.__table__
+
+JIT_METRICS = ["n_cachehits", "n_requests", "n_variants", "t_codegen"]
+RUN_METRICS = {"time.rss": "rss", "time.real_s": "time"}
+
+
+def pareto_front(frame, x="rss", y="time"):
+    """
+    Mark the rows of frame that no other row dominates in x and y.
+
+    Returns:
+        A boolean Series aligned with frame.
+    """
+    points = frame[[x, y]].values
+    return pd.Series([
+        not any((o[0] <= p[0] and o[1] <= p[1]) and
+                (o[0] < p[0] or o[1] < p[1]) for o in points)
+        for p in points
+    ], index=frame.index)
+
+
+def sweep_frame(results, metrics):
+    """
+    Combine the PolyJIT results and the run metrics of each run.
+
+    Args:
+        results: DataFrame with project, run_id, config, name and value.
+        metrics: DataFrame with run_id, name and value.
+
+    Returns:
+        A DataFrame with one row per project and configuration.
+    """
+    jit = results.pivot_table(
+        index=["project", "run_id", "config"],
+        columns="name",
+        values="value").reset_index()
+    run = metrics[metrics.name.isin(RUN_METRICS)].pivot_table(
+        index="run_id", columns="name",
+        values="value").rename(columns=RUN_METRICS).reset_index()
+    runs = jit.merge(run, on="run_id", how="left")
+    for column in JIT_METRICS + list(RUN_METRICS.values()):
+        if column not in runs:
+            runs[column] = float("nan")
+
+    sweep = runs.groupby(["project", "config"])[
+        JIT_METRICS + list(RUN_METRICS.values())].median().reset_index()
+    sweep["hit_ratio"] = sweep.n_cachehits / sweep.n_requests
+    sweep["pareto"] = False
+    for _, project in sweep.dropna(subset=["rss", "time"]).groupby(
+            "project"):
+        sweep.loc[project.index, "pareto"] = pareto_front(project)
+    return sweep.sort_values(["project", "rss", "time"])
+
+
+class CacheSweepReport(reports.Report):
+    NAME = "pj-cache-sweep"
+    SUPPORTED_EXPERIMENTS = ["pj-cache-sweep"]
+
+    def runs(self):
+        return sa.sql.select([RUN]).where(
+            RUN.c.experiment_group.in_(self.experiment_ids)).alias("runs")
+
+    def generate(self):
+        runs = self.runs()
+        results = sa.sql.select([
+            runs.c.project_name.label("project"),
+            RESULT.c.run_id, RESULT.c.config, RESULT.c.name, RESULT.c.value
+        ]).select_from(sa.sql.join(runs, RESULT,
+                                   runs.c.id == RESULT.c.run_id)).where(
+                                       RESULT.c.type == 'program')
+        metrics = sa.sql.select([
+            METRIC.c.run_id, METRIC.c.name, METRIC.c.value
+        ]).select_from(sa.sql.join(runs, METRIC,
+                                   runs.c.id == METRIC.c.run_id))
+
+        con = self.session.connection()
+        report = sweep_frame(
+            pd.read_sql(results, con=con), pd.read_sql(metrics, con=con))
+
+        fname = "pj-cache-sweep_pareto.csv"
+        output.write_frame(report, fname)
@@ -1,12 +1,62 @@
-import csv
-import os
+"""
+Report the compilestats of experiments.
+
+CompileStatsReport sums each stat per project from the summaries of the
+experiments.
+
+stat_matrix compares the configurations of an experiment, e.g., the cflags
+of pollytest. A sample is the sum of a stat over all runs of a project and
+configuration that share a run group. For each project, component and stat
+we report, with one column per configuration:
+
+    mean_<config>     The mean over all samples.
+    delta_<config>    mean_<config> - mean_<baseline>
+    ratio_<config>    mean_<config> / mean_<baseline>
+    notable_<config>  The change is at least `cs_matrix.threshold` of the
+                      baseline and exceeds `cs_matrix.sigmas` standard
+                      errors of the difference.
+
+LLVM only prints non-zero stats, a stat missing in a configuration that
+compiled the project counts as 0.
+
+A single experiment of pollytest holds one run group, and so one sample, per
+project and configuration. Its variance is 0, so `cs_matrix.sigmas` only
+takes effect once we combine several experiments of the same
+configurations. With one sample, notable only depends on the threshold and
+we warn about it.
+"""
+import logging
+
+import numpy as np
+import pandas as pd
 import sqlalchemy as sa
 import benchbuild.utils.schema as schema
 import benchbuild.reports as reports
 import benchbuild.experiment as exp
 import polyjit.experiments.compilestats as cs
+from benchbuild import settings
+from polyjit.reports import output
 
-import pandas as pd
+CFG = settings.CFG
+LOG = logging.getLogger(__name__)
+
+CFG["cs_matrix"] = {
+    "baseline": {
+        "default": "-O3",
+        "desc": "The configuration we compare compilestats against."
+    },
+    "threshold": {
+        "default": 0.05,
+        "desc": "Minimal relative change of a notable compilestat."
+    },
+    "sigmas": {
+        "default": 2.0,
+        "desc": "Minimal change of a notable compilestat, in standard "
+                "errors. Needs several samples per configuration, i.e., "
+                "combined experiments."
+    }
+}
+CFG["cs_matrix"].init_from_env()
 
 query = sa.orm.Query
 select = sa.sql.select
@@ -16,7 +66,34 @@ any_ = sa.sql.expression.any_
 sum_ = sa.func.sum
 
 RUN = schema.Run.__table__
+CONFIG = schema.Config.__table__
 CS = cs.CompileStat.__table__
+SUMMARY = cs.CompileStatSummary.__table__
+
+PROJECT = ["project", "group"]
+STAT = PROJECT + ["component", "stat"]
+SAMPLE = STAT + ["config", "run_group"]
+
+def refresh(session, experiment_ids, attempts=2):
+    """
+    Refresh and commit the compilestats summaries of some experiments.
+
+    A concurrent report may summarize the same runs, then our commit fails
+    on compilestats_summary_run. We roll back and retry, the other report
+    has summarized these runs already. If all attempts fail, we go on with
+    the summaries we have.
+    """
+    for attempt in range(1, attempts + 1):
+        try:
+            cs.refresh_summary(session, experiment_ids)
+            session.commit()
+            return True
+        except sa.exc.IntegrityError as err:
+            session.rollback()
+            LOG.warning("Concurrent refresh of compilestats summaries "
+                        "(attempt %d of %d): %s", attempt, attempts, err)
+    return False
+
 
 class CompileStatsReport(reports.Report):
     NAME = "compilestats"
@@ -26,19 +103,135 @@ class CompileStatsReport(reports.Report):
         exp_ids = self.experiment_ids
         fname = "compilestats_report.csv"
 
-        runs = select([RUN]).where(RUN.c.experiment_group == any_(exp_ids)).alias(name="run_1")
-        join_clause = join(runs, CS, runs.c.id == CS.c.run_id)
+        # Only runs that are not part of the summaries yet hit compilestats.
+        refresh(self.session, exp_ids)
+
         q = select(
             [
-                runs.c.project_name.label("name"),
-                runs.c.project_group.label("group"),
-                CS.c.name.label("metric"),
-                sum_(CS.c.value).label("value"),
+                SUMMARY.c.project_name.label("name"),
+                SUMMARY.c.project_group.label("group"),
+                SUMMARY.c.name.label("metric"),
+                sum_(SUMMARY.c.value).label("value"),
             ]
-        ).select_from(join_clause)\
-            .group_by(runs.c.project_name, runs.c.project_group, CS.c.name)\
-            .order_by(runs.c.project_name, runs.c.project_group)
+        ).where(SUMMARY.c.experiment_group.in_(exp_ids))\
+            .group_by(SUMMARY.c.project_name, SUMMARY.c.project_group,
+                      SUMMARY.c.name)\
+            .order_by(SUMMARY.c.project_name, SUMMARY.c.project_group)
+
+        output.write_query(self.session.connection(), q, fname)
+
+
+def stats_query():
+    """The compilestats of the experiments `exp_ids` with their config."""
+    return select([
+        RUN.c.project_name.label("project"),
+        RUN.c.project_group.label("group"),
+        CONFIG.c.value.label("config"),
+        RUN.c.run_group,
+        CS.c.component,
+        CS.c.name.label("stat"),
+        sa.cast(CS.c.value, sa.Float).label("value")
+    ]).select_from(
+        RUN.join(CONFIG, sa.and_(CONFIG.c.run_id == RUN.c.id,
+                                 CONFIG.c.name == "name"))
+        .join(CS, CS.c.run_id == RUN.c.id)).where(
+            RUN.c.experiment_group.in_(
+                sa.sql.bindparam('exp_ids', expanding=True)))
+
+
+def samples(chunks):
+    """
+    Sum the stats of each sample.
+
+    Args:
+        chunks: DataFrames with the columns of stats_query.
+
+    Returns:
+        A Series of values, indexed by SAMPLE.
+    """
+    sums = [
+        chunk.groupby(SAMPLE, sort=False)["value"].sum() for chunk in chunks
+    ]
+    if not sums:
+        return pd.Series(
+            [], dtype=float,
+            index=pd.MultiIndex.from_tuples([], names=SAMPLE))
+    return pd.concat(sums).groupby(level=SAMPLE).sum()
+
+
+def per_project(stats, frame):
+    """Align a frame indexed by (project, group) with the rows of stats."""
+    return frame.reindex(stats.index.droplevel(["component", "stat"])) \
+        .set_index(stats.index)
+
+
+def stat_matrix(values, baseline=None, threshold=None, sigmas=None):
+    """
+    Compare each configuration with a baseline.
+
+    Args:
+        values: The result of samples.
+        baseline: The baseline config, `cs_matrix.baseline` if None.
+        threshold: `cs_matrix.threshold` if None.
+        sigmas: `cs_matrix.sigmas` if None.
+
+    Returns:
+        A DataFrame with one row per project, component and stat.
+    """
+    opts = CFG["cs_matrix"]
+    baseline = opts["baseline"].value if baseline is None else baseline
+    threshold = opts["threshold"].value if threshold is None else threshold
+    sigmas = opts["sigmas"].value if sigmas is None else sigmas
+
+    by_config = values.groupby(level=STAT + ["config"])
+    sums = by_config.sum().unstack("config")
+    if baseline not in sums:
+        raise ValueError("No compilestats of baseline '{0}'".format(baseline))
+
+    n_samples = values.groupby(level=PROJECT + ["config", "run_group"]) \
+        .size().groupby(level=PROJECT + ["config"]).size().unstack("config")
+    single = int((n_samples == 1).sum().sum())
+    if single:
+        LOG.warning(
+            "%d project configurations have a single sample, only the "
+            "threshold decides if their stats are notable. Combine several "
+            "experiments to apply cs_matrix.sigmas.", single)
+    n_samples = per_project(sums, n_samples.reindex(columns=sums.columns))
+    # Samples without a stat count as 0, NaN where the config is missing.
+    mean = sums.fillna(0) / n_samples
+    squares = (values**2).groupby(level=STAT + ["config"]).sum() \
+        .unstack("config").fillna(0)
+    var = ((squares - n_samples * mean**2) / (n_samples - 1)).clip(lower=0)
+    var = var.where(n_samples > 1, 0).where(n_samples.notnull())
+
+    base = mean[baseline]
+    delta = mean.sub(base, axis=0)
+    ratio = mean.div(base, axis=0)
+    stderr = np.sqrt((var / n_samples).add(
+        var[baseline] / n_samples[baseline], axis=0))
+    notable = delta.abs().ge(base.abs() * threshold, axis=0) & \
+        (delta.abs() > sigmas * stderr) & delta.notnull()
+
+    others = [c for c in mean.columns if c != baseline]
+    table = pd.concat({
+        "mean": mean,
+        "delta": delta[others],
+        "ratio": ratio[others],
+        "notable": notable[others]
+    }, axis=1)
+    table.columns = ["{0}_{1}".format(*column) for column in table.columns]
+    table["notable"] = notable[others].any(axis=1)
+    return table.reset_index()
+
+
+def compare_configs(connection, experiment_ids, **kwargs):
+    """
+    The stat_matrix of experiments, read in chunks.
 
-        report = pd.read_sql(q.selectable, con=self.session.connection())
-        print("Writing '", fname, "' ...")
-        report.to_csv(fname)
\ No newline at end of file
+    kwargs are passed to stat_matrix.
+    """
+    chunks = pd.read_sql(
+        stats_query().params(exp_ids=list(experiment_ids)),
+        con=connection,
+        chunksize=output.chunk_size())
+    return stat_matrix(samples(chunks), **kwargs)
@@ -0,0 +1,346 @@
+"""
+A portable report engine for PolyJIT experiments.
+
+The reports of ijpp and pj-test used to select from stored functions
+(ijpp_eval, pj_test_eval, ...), which only exist in a prepared PostgreSQL
+database and recompute everything from the raw rows on every call.
+
+We pull the run, polyjit_result, polyjit_region_result, metrics and config
+rows of the selected experiments once into pandas and evaluate them there
+with vectorized group-bys. Only plain selects and joins reach the database,
+so the same reports work on a local SQLite file. ReportData.from_dataset
+reads the same rows from a Parquet export instead (see export). Set
+`report_dataset.root` to the directory of an export to run the ijpp and
+pj-test reports without querying the database for their rows.
+
+The evaluation needs all selected rows at once (medians do not combine), so
+unlike the query-backed reports of output, the memory of ijpp and pj-test is
+not bounded by `report_output.chunk_size`. We fetch the rows in chunks of
+that size and keep them as categoricals, which bounds the memory by the
+compact size of the rows instead of the size of the Python objects.
+
+The program-wide results of PolyJITMetrics are:
+
+    t_all      Time spent in the whole program.
+    t_scops    Time spent in all SCoP regions.
+    t_codegen  Time spent generating code in the JIT.
+
+Per run we derive the dynamic coverage (t_scops / t_all) and the overhead
+coverage (t_codegen / t_all).
+"""
+import sys
+
+import pandas as pd
+import sqlalchemy as sa
+
+import benchbuild.utils.schema as schema
+from benchbuild import settings
+from polyjit.experiments import polyjit
+from polyjit.reports import export, output, tasks
+
+CFG = settings.CFG
+
+CFG["report_dataset"] = {
+    "root": {
+        "default": "",
+        "desc": "Parquet export the ijpp and pj-test reports read their "
+                "rows from. Empty reads them from the database."
+    }
+}
+CFG["report_dataset"].init_from_env()
+
+RUN = schema.Run.__table__
+PROJECT = schema.Project.__table__
+METRIC = schema.Metric.__table__
+CONFIG = schema.Config.__table__
+RESULT = polyjit.PJ_Result.__table__
+REGION = polyjit.PJ_Result_Region.__table__
+
+KEY = ["project", "group", "config"]
+TOTALS = {
+    "t_all": "time",
+    "t_scops": "scops",
+    "t_codegen": "codegen",
+    "n_variants": "variants",
+    "n_cachehits": "cachehits",
+    "n_requests": "requests",
+    "n_blocked": "blocked"
+}
+CATEGORIES = ["project", "group", "domain", "config", "name", "region"]
+
+
+def dataset_root():
+    """The Parquet export we evaluate reports on, None for the database."""
+    return CFG["report_dataset"]["root"].value or None
+
+
+def dependencies():
+    """The queries and the code all engine-based reports depend on."""
+    return [
+        runs_query(), results_query(), metrics_query(), sys.modules[__name__]
+    ]
+
+
+def exp_ids_param():
+    return sa.sql.bindparam('exp_ids', expanding=True)
+
+
+def categorize(frame):
+    """Store the repetitive string columns of a frame as categoricals."""
+    for column in CATEGORIES:
+        if column in frame:
+            frame[column] = frame[column].astype("category")
+    return frame
+
+
+def read_chunked(connection, query, size=None):
+    """
+    Read the result of a query into a categorized DataFrame, chunk by chunk.
+
+    Only one chunk of rows is held as Python objects at a time.
+    """
+    header, chunks = output.stream(connection, query, size)
+    frames = [
+        categorize(
+            pd.DataFrame.from_records(rows, columns=header, coerce_float=True))
+        for rows in chunks
+    ]
+    if not frames:
+        return pd.DataFrame(columns=header)
+    if len(frames) == 1:
+        return frames[0]
+
+    columns = {}
+    for column in header:
+        parts = [frame[column] for frame in frames]
+        if isinstance(parts[0].dtype, pd.CategoricalDtype):
+            columns[column] = pd.api.types.union_categoricals(parts)
+        else:
+            columns[column] = pd.concat(parts, ignore_index=True)
+    return pd.DataFrame(columns, columns=header)
+
+
+def runs_query():
+    """The runs of the experiments, with their project domain and cores."""
+    columns = [
+        RUN.c.id.label("run_id"),
+        RUN.c.project_name.label("project"),
+        RUN.c.project_group.label("group"),
+        PROJECT.c.domain.label("domain"),
+        CONFIG.c.value.label("cores")
+    ]
+    from_clause = RUN.outerjoin(
+        PROJECT, sa.and_(PROJECT.c.name == RUN.c.project_name,
+                         PROJECT.c.group_name == RUN.c.project_group)) \
+        .outerjoin(CONFIG, sa.and_(CONFIG.c.run_id == RUN.c.id,
+                                   CONFIG.c.name == "cores"))
+    return sa.sql.select(columns).select_from(from_clause).where(
+        RUN.c.experiment_group.in_(exp_ids_param()))
+
+
+def results_query():
+    """All polyjit results of the experiments, region results included."""
+    return sa.sql.select([
+        RESULT.c.run_id, RESULT.c.config, RESULT.c.name, RESULT.c.value,
+        REGION.c.region_name.label("region")
+    ]).select_from(
+        RESULT.join(RUN, RUN.c.id == RESULT.c.run_id).outerjoin(
+            REGION, REGION.c.id == RESULT.c.id)).where(
+                RUN.c.experiment_group.in_(exp_ids_param()))
+
+
+def metrics_query():
+    return sa.sql.select([
+        METRIC.c.run_id, METRIC.c.name, METRIC.c.value
+    ]).select_from(METRIC.join(RUN, RUN.c.id == METRIC.c.run_id)).where(
+        RUN.c.experiment_group.in_(exp_ids_param()))
+
+
+class ReportData:
+    """
+    The rows of a set of experiments, loaded once.
+
+    Args:
+        runs: DataFrame with run_id, project, group, domain and cores.
+        results: DataFrame with run_id, config, name, value and region.
+        metrics: DataFrame with run_id, name and value.
+    """
+
+    def __init__(self, runs, results, metrics):
+        # Missing keys would drop a run from every group-by.
+        runs = runs.copy()
+        for column in ["domain", "cores"]:
+            values = runs[column]
+            if isinstance(values.dtype, pd.CategoricalDtype) \
+                    and "" not in values.cat.categories:
+                values = values.cat.add_categories("")
+            runs[column] = values.fillna("")
+        self.runs = categorize(runs)
+        self.results = categorize(results)
+        self.metrics = categorize(metrics)
+
+    @classmethod
+    def load(cls, bind, experiment_ids):
+        """
+        Load the rows of the given experiments from the database.
+
+        Args:
+            bind: An Engine, which runs the queries concurrently, or a
+                Connection.
+            experiment_ids: The experiments we load.
+        """
+        exp_ids = list(experiment_ids)
+
+        def read(query):
+            return lambda con: read_chunked(con,
+                                            query.params(exp_ids=exp_ids))
+
+        frames = dict(
+            tasks.run(bind, [("runs", read(runs_query())),
+                             ("results", read(results_query())),
+                             ("metrics", read(metrics_query()))]))
+        return cls(frames["runs"], frames["results"], frames["metrics"])
+
+    @classmethod
+    def from_dataset(cls, root, experiment_ids=None):
+        """
+        Load the rows of the given experiments from a Parquet export.
+
+        Args:
+            root: The directory of the dataset.
+            experiment_ids: The experiments we load, all if None.
+        """
+        def read(name):
+            frame = export.read_table(root, name, experiment_ids)
+            # Categoricals of different partitions do not merge well.
+            for column in frame.select_dtypes("category"):
+                frame[column] = frame[column].astype(object)
+            return frame.drop(columns=export.PARTITION)
+
+        runs = read("run").rename(columns={
+            "id": "run_id",
+            "project_name": "project",
+            "project_group": "group"
+        })
+        projects = read("project").rename(columns={
+            "name": "project",
+            "group_name": "group"
+        })[["project", "group", "domain"]].drop_duplicates()
+        config = read("config")
+        cores = config[config.name == "cores"][["run_id", "value"]]
+        runs = runs[["run_id", "project", "group"]].merge(
+            projects, on=["project", "group"], how="left").merge(
+                cores.rename(columns={"value": "cores"}),
+                on="run_id", how="left")
+
+        regions = read("polyjit_region_result").rename(
+            columns={"region_name": "region"})
+        results = read("polyjit_result").merge(
+            regions, on="id", how="left")
+        results = results[["run_id", "config", "name", "value", "region"]]
+        metrics = read("metrics")[["run_id", "name", "value"]]
+        return cls(runs, results, metrics)
+
+    def program_results(self):
+        """Program-wide results, one row per run and one column per name."""
+        results = self.results[self.results.region.isnull()]
+        results = results[results.name.isin(TOTALS)]
+        per_run = results.pivot_table(
+            index=["run_id", "config"],
+            columns="name",
+            values="value",
+            aggfunc="sum",
+            observed=True)
+        per_run.columns = [str(c) for c in per_run.columns]
+        per_run = per_run.reset_index().merge(self.runs, on="run_id")
+        for name in TOTALS:
+            if name not in per_run:
+                per_run[name] = float("nan")
+        return per_run.rename(columns=TOTALS)
+
+    def region_results(self, name="t_region"):
+        """The region-wise results with the given name."""
+        results = self.results[self.results.name == name]
+        return results[results.region.notnull()].merge(
+            self.runs, on="run_id")
+
+
+def total_runtime(data):
+    """
+    The median program-wide results per project and config.
+
+    Returns:
+        A DataFrame with project, group, domain, config, time, variants,
+        cachehits, requests, blocked, codegen, scops, dyncov and ohcov.
+    """
+    per_run = data.program_results()
+    per_run["dyncov"] = per_run.scops / per_run.time
+    per_run["ohcov"] = per_run.codegen / per_run.time
+    columns = list(TOTALS.values()) + ["dyncov", "ohcov"]
+    totals = per_run.groupby(
+        KEY + ["domain"], observed=True)[columns].median()
+    return totals.reset_index()
+
+
+def speedups(totals, baseline):
+    """
+    The speedup of every config over a baseline config of the same project.
+
+    Args:
+        totals: The result of total_runtime.
+        baseline: The config we compare against.
+    """
+    base = totals[totals.config == baseline][["project", "group", "time"]]
+    speedup = totals.merge(
+        base.rename(columns={"time": "t_baseline"}),
+        on=["project", "group"],
+        how="left")
+    speedup["speedup"] = speedup.t_baseline / speedup.time
+    return speedup
+
+
+def wide(totals, configs, columns):
+    """
+    One row per project, with one column per config and value.
+
+    Columns are named <value>_<config>, e.g., time_PolyJIT.
+    """
+    selected = totals[totals.config.isin(configs)]
+    table = selected.pivot_table(
+        index=["project", "group", "domain"],
+        columns="config",
+        values=columns,
+        observed=True)
+    table.columns = [
+        "{0}_{1}".format(column, config) for column, config in table.columns
+    ]
+    return table.reset_index()
+
+
+def region_runtime(data):
+    """The median runtime of each region per project, config and cores."""
+    regions = data.region_results()
+    return regions.groupby(
+        ["project", "group", "region", "config", "cores"],
+        observed=True)["value"].median().rename("runtime").reset_index()
+
+
+def region_wise_compare(data, baseline, candidate):
+    """
+    Compare the region runtime of two configs.
+
+    Returns:
+        A DataFrame with project, group, region, cores, t_<baseline>,
+        t_<candidate> and the speedup of candidate over baseline.
+    """
+    runtime = region_runtime(data)
+    runtime = runtime[runtime.config.isin([baseline, candidate])]
+    table = runtime.pivot_table(
+        index=["project", "group", "region", "cores"],
+        columns="config",
+        values="runtime",
+        observed=True)
+    table = table.reindex(columns=[baseline, candidate])
+    table.columns = ["t_{0}".format(baseline), "t_{0}".format(candidate)]
+    table["speedup"] = table.iloc[:, 0] / table.iloc[:, 1]
+    return table.reset_index()
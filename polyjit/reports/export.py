@@ -0,0 +1,244 @@
+"""
+Export the rows of experiments as a partitioned Parquet dataset.
+
+Reports and downstream scripts used to re-parse CSV text on every run. We
+dump the rows of the selected experiments once:
+
+    <root>/<table>/experiment_group=<experiment id>/part-0.parquet
+
+with one directory per table and one partition per experiment. String
+columns are dictionary-encoded, so repetitive names, configs and regions
+cost little space and come back as pandas categoricals. Every chunk of
+`report_output.chunk_size` rows becomes one row group.
+
+read_table loads a table back without a database, e.g., for
+engine.ReportData.from_dataset. Both directions need pyarrow.
+
+From the command line:
+
+    benchbuild report -R parquet-export -e <experiment id> -o <root>
+    python -m polyjit.reports.export -o <root> <database uri> <id>...
+"""
+import argparse
+import collections
+import functools as ft
+import itertools
+import logging
+import os
+import uuid
+
+import pandas as pd
+import sqlalchemy as sa
+
+import benchbuild.experiment as exp
+import benchbuild.reports as reports
+import benchbuild.utils.schema as schema
+from polyjit.experiments import compilestats, papi, pj_likwid, polyjit
+from polyjit.reports import output, tasks
+
+try:
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+except ImportError:
+    pa = None
+    pq = None
+
+LOG = logging.getLogger(__name__)
+
+RUN = schema.Run.__table__
+PROJECT = schema.Project.__table__
+RESULT = polyjit.PJ_Result.__table__
+REGION = polyjit.PJ_Result_Region.__table__
+
+TABLES = collections.OrderedDict(
+    (table.name, table) for table in [
+        RUN, PROJECT, schema.Config.__table__, schema.Metric.__table__,
+        compilestats.CompileStat.__table__, RESULT, REGION,
+        pj_likwid.Likwid.__table__, papi.Event.__table__
+    ])
+PARTITION = "experiment_group"
+PART = "part-0.parquet"
+
+
+def require_pyarrow():
+    if pq is None:
+        raise ImportError("Parquet datasets require pyarrow.")
+
+
+def arrow_type(column):
+    """The arrow type we store a column with, strings are dictionaries."""
+    arrow_t = output.arrow_type(column.type)
+    if arrow_t is None or pa.types.is_string(arrow_t):
+        return pa.dictionary(pa.int32(), pa.string())
+    return arrow_t
+
+
+def columns(table):
+    """The exported columns, the partition column is implicit."""
+    return [c for c in table.c if not (table is RUN and c.name == PARTITION)]
+
+
+def arrow_schema(table):
+    return pa.schema(
+        [pa.field(c.name, arrow_type(c)) for c in columns(table)])
+
+
+def from_clause(table):
+    """Join a table with the runs it belongs to."""
+    if table is RUN:
+        return RUN
+    if table is PROJECT:
+        return PROJECT.join(
+            RUN, sa.and_(PROJECT.c.name == RUN.c.project_name,
+                         PROJECT.c.group_name == RUN.c.project_group))
+    if table is REGION:
+        return REGION.join(RESULT, RESULT.c.id == REGION.c.id).join(
+            RUN, RUN.c.id == RESULT.c.run_id)
+    return table.join(RUN, RUN.c.id == table.c.run_id)
+
+
+def table_query(table):
+    """All rows of a table that belong to the experiment `exp_id`."""
+    query = sa.sql.select(columns(table)).select_from(
+        from_clause(table)).where(
+            RUN.c.experiment_group == sa.sql.bindparam('exp_id'))
+    # Many runs share a project.
+    return query.distinct() if table is PROJECT else query
+
+
+def partition(root, name, experiment_id):
+    return os.path.join(root, name, "{0}={1}".format(PARTITION,
+                                                     experiment_id))
+
+
+def export_table(connection, root, name, experiment_id, size=None):
+    """
+    Write the rows of one table and experiment to its partition.
+
+    Returns:
+        The number of rows we wrote, we skip empty partitions.
+    """
+    require_pyarrow()
+    table = TABLES[name]
+    header, chunks = output.stream(
+        connection, table_query(table).params(exp_id=experiment_id), size)
+    first = next(chunks, None)
+    if first is None:
+        return 0
+
+    path = partition(root, name, experiment_id)
+    os.makedirs(path, exist_ok=True)
+    return output.write_parquet(
+        os.path.join(path, PART), header, itertools.chain([first], chunks),
+        arrow_schema(table))
+
+
+def export(bind, experiment_ids, root, names=None, workers=None):
+    """
+    Export the rows of experiments to a Parquet dataset.
+
+    Args:
+        bind: An Engine, which exports the tables concurrently, or a
+            Connection.
+        experiment_ids: The experiments we export.
+        root: The directory of the dataset.
+        names: The tables we export, all of TABLES if None.
+        workers: The concurrency cap, `report_tasks.max_workers` if None.
+
+    Returns:
+        A dict that maps (table, experiment id) to the number of rows.
+    """
+    require_pyarrow()
+    names = list(TABLES) if names is None else names
+    jobs = [((name, str(exp_id)),
+             ft.partial(export_table, root=root, name=name,
+                        experiment_id=exp_id))
+            for exp_id in experiment_ids for name in names]
+
+    counts = {}
+    for key, count in tasks.run(bind, jobs, workers):
+        LOG.debug("Exported %d rows of %s/%s", count, *key)
+        counts[key] = count
+    return counts
+
+
+def experiments(root, name):
+    """The experiment ids with a partition of a table."""
+    table_dir = os.path.join(root, name)
+    if not os.path.isdir(table_dir):
+        return []
+    prefix = PARTITION + "="
+    return sorted(entry[len(prefix):] for entry in os.listdir(table_dir)
+                  if entry.startswith(prefix))
+
+
+def read_table(root, name, experiment_ids=None):
+    """
+    Read a table of an exported dataset.
+
+    Args:
+        root: The directory of the dataset.
+        name: The table we read.
+        experiment_ids: The experiments we read, all if None.
+
+    Returns:
+        A DataFrame with the exported columns and experiment_group.
+        String columns are categoricals.
+    """
+    require_pyarrow()
+    if experiment_ids is None:
+        experiment_ids = experiments(root, name)
+
+    frames = []
+    for exp_id in experiment_ids:
+        path = partition(root, name, exp_id)
+        if not os.path.isdir(path):
+            continue
+        for part in sorted(os.listdir(path)):
+            frame = pq.read_table(os.path.join(path, part)).to_pandas()
+            frame[PARTITION] = str(exp_id)
+            frames.append(frame)
+
+    if not frames:
+        return pd.DataFrame(
+            columns=[c.name for c in columns(TABLES[name])] + [PARTITION])
+    return pd.concat(frames, ignore_index=True)
+
+
+def dataset_root(out_path):
+    """The dataset directory for the output path of a report."""
+    return os.path.splitext(out_path)[0]
+
+
+class ParquetExport(reports.Report):
+    NAME = "parquet-export"
+    SUPPORTED_EXPERIMENTS = list(exp.ExperimentRegistry.experiments.keys())
+
+    def generate(self):
+        root = dataset_root(self.out_path)
+        print("Exporting to '{0}'".format(root))
+        export(tasks.bind_of(self.session), self.experiment_ids, root)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(
+        description="Export experiments to a Parquet dataset.")
+    parser.add_argument("-o", "--outdir", default="export",
+                        help="The directory of the dataset.")
+    parser.add_argument("-t", "--table", action="append",
+                        choices=list(TABLES),
+                        help="Export only this table, may be repeated.")
+    parser.add_argument("uri", help="The database URI.")
+    parser.add_argument("experiment_ids", nargs="+",
+                        help="The experiments we export.")
+    args = parser.parse_args(argv)
+
+    engine = sa.create_engine(args.uri)
+    counts = export(engine, [uuid.UUID(i) for i in args.experiment_ids],
+                    args.outdir, args.table)
+    for (name, exp_id), count in sorted(counts.items()):
+        print("{0}/{1}: {2} rows".format(name, exp_id, count))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,124 @@
+"""
+Report the latency distribution of JIT requests.
+
+We derive three durations per request from the arrays of pj-latency:
+
+    latency  request -> compile_end, 0 for cache hits.
+    compile  compile_start -> compile_end, only compiled requests.
+    blocked  time the caller was blocked.
+
+and report p50, p90, p99 and max per project and region, plus the sums of
+all regions of a project (region '*'), and log-scaled histograms.
+"""
+import numpy as np
+import pandas as pd
+import sqlalchemy as sa
+
+import benchbuild.reports as reports
+import benchbuild.utils.schema as schema
+from polyjit.experiments import latency
+from polyjit.reports import output
+
+RUN = schema.Run.__table__
+LATENCY = latency.Latency.__table__
+
+PERCENTILES = (50, 90, 99)
+HISTOGRAM_DECADES = range(3, 12)
+ALL_REGIONS = "*"
+
+
+def durations(timings):
+    """
+    The durations of all requests in a timing array.
+
+    Returns:
+        A dict that maps latency, compile and blocked to 1d arrays.
+    """
+    request, start, end, blocked = timings.T
+    compiled = ~np.isnan(end)
+    return {
+        "latency": np.where(compiled, end - request, 0.0),
+        "compile": (end - start)[compiled & ~np.isnan(start)],
+        "blocked": blocked[~np.isnan(blocked)]
+    }
+
+
+def summarize(values):
+    """Count, percentiles and max of a 1d array."""
+    summary = {"n": len(values)}
+    for p in PERCENTILES:
+        summary["p{0}".format(p)] = \
+            np.percentile(values, p) if len(values) else np.nan
+    summary["max"] = values.max() if len(values) else np.nan
+    return summary
+
+
+def histogram(values):
+    """Counts per decade of nanoseconds, open-ended at both sides."""
+    edges = [0.0] + [10.0**d for d in HISTOGRAM_DECADES] + [np.inf]
+    counts, _ = np.histogram(values, bins=edges)
+    return zip(edges[:-1], edges[1:], counts)
+
+
+def regions(rows):
+    """
+    Group the timing arrays of the queried rows.
+
+    Args:
+        rows: (project, region, timings) tuples, timings are encoded.
+
+    Returns:
+        A dict that maps (project, region) to all durations of the region,
+        including the region '*' for each project.
+    """
+    grouped = {}
+    for project, region, data in rows:
+        timings = latency.decode(data)
+        for key in [(project, region), (project, ALL_REGIONS)]:
+            grouped.setdefault(key, []).append(timings)
+    return {
+        key: durations(np.concatenate(arrays))
+        for key, arrays in grouped.items()
+    }
+
+
+def percentile_frame(grouped):
+    return pd.DataFrame([
+        dict(project=project, region=region, metric=metric,
+             **summarize(values))
+        for (project, region), metrics in sorted(grouped.items())
+        for metric, values in metrics.items()
+    ])
+
+
+def histogram_frame(grouped):
+    return pd.DataFrame([
+        dict(project=project, region=region, metric=metric, lower=lower,
+             upper=upper, count=count)
+        for (project, region), metrics in sorted(grouped.items())
+        for metric, values in metrics.items()
+        for lower, upper, count in histogram(values)
+    ])
+
+
+class LatencyReport(reports.Report):
+    NAME = "pj-latency"
+    SUPPORTED_EXPERIMENTS = ["pj-latency"]
+
+    def query(self):
+        join_clause = sa.sql.join(RUN, LATENCY,
+                                  RUN.c.id == LATENCY.c.run_id)
+        return sa.sql.select([
+            RUN.c.project_name, LATENCY.c.region, LATENCY.c.timings
+        ]).select_from(join_clause).where(
+            RUN.c.experiment_group.in_(self.experiment_ids))
+
+    def generate(self):
+        _, chunks = output.stream(self.session.connection(), self.query())
+        grouped = regions(row for rows in chunks for row in rows)
+
+        for fname, frame in [
+                ("pj-latency_percentiles.csv", percentile_frame(grouped)),
+                ("pj-latency_histogram.csv", histogram_frame(grouped))
+        ]:
+            output.write_frame(frame, fname)
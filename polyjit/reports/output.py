@@ -0,0 +1,250 @@
+"""
+Streaming output for reports.
+
+Reports used to fetch all rows of a query and write them at once. On large
+result databases the region-wise queries do not fit into memory. We ask the
+database for a server-side cursor (stream_results) and write the rows in
+chunks of `report_output.chunk_size`, so the peak memory of a report only
+depends on the chunk size.
+
+The format follows the extension of the output file: '.parquet' writes one
+Parquet row group per chunk, everything else writes CSV. Parquet needs
+pyarrow.
+
+All row groups of a Parquet file share one schema. We take it from the
+column types of the query (or the dtypes of a DataFrame). Columns without a
+known type get the type of their first non-null value, numbers become
+float64, so a later chunk cannot break the schema of an earlier one.
+"""
+import csv
+import datetime
+import decimal
+import itertools
+import logging
+import os
+import uuid
+
+import sqlalchemy as sa
+
+from benchbuild import settings
+
+try:
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+except ImportError:
+    pa = None
+    pq = None
+
+CFG = settings.CFG
+LOG = logging.getLogger(__name__)
+
+CFG["report_output"] = {
+    "chunk_size": {
+        "default": 10000,
+        "desc": "Number of rows we fetch and write at once."
+    }
+}
+CFG["report_output"].init_from_env()
+
+PARQUET = (".parquet", ".pq")
+
+
+def chunk_size(size=None):
+    if size is None:
+        size = CFG["report_output"]["chunk_size"].value
+    return int(size)
+
+
+def stream(connection, query, size=None):
+    """
+    Execute a query with a server-side cursor.
+
+    Returns:
+        The column names and an iterator over lists of at most size rows.
+    """
+    size = chunk_size(size)
+    result = connection.execution_options(stream_results=True).execute(query)
+    header = list(result.keys())
+
+    def chunks():
+        try:
+            while True:
+                rows = result.fetchmany(size)
+                if not rows:
+                    break
+                yield rows
+        finally:
+            result.close()
+
+    return header, chunks()
+
+
+def chunked(rows, size=None):
+    """Split any iterable of rows into lists of at most size rows."""
+    rows = iter(rows)
+    size = chunk_size(size)
+    while True:
+        chunk = list(itertools.islice(rows, size))
+        if not chunk:
+            return
+        yield chunk
+
+
+def write_csv(fname, header, chunks):
+    count = 0
+    with open(fname, 'w', newline='') as csv_out:
+        csv_writer = csv.writer(csv_out)
+        csv_writer.writerow(header)
+        for rows in chunks:
+            csv_writer.writerows(rows)
+            count += len(rows)
+    return count
+
+
+def plain(value):
+    """Values arrow does not convert on its own."""
+    if isinstance(value, decimal.Decimal):
+        return float(value)
+    if isinstance(value, uuid.UUID):
+        return str(value)
+    return value
+
+
+def arrow_type(sql_type):
+    """The arrow type of an SQL type, None if we cannot tell."""
+    if isinstance(sql_type, sa.types.TypeDecorator):
+        sql_type = sql_type.impl
+    if isinstance(sql_type, sa.Boolean):
+        return pa.bool_()
+    if isinstance(sql_type, sa.Integer):
+        return pa.int64()
+    if isinstance(sql_type, sa.Numeric):
+        return pa.float64()
+    if isinstance(sql_type, sa.DateTime):
+        return pa.timestamp("us")
+    if isinstance(sql_type, sa.LargeBinary):
+        return pa.binary()
+    if isinstance(sql_type, sa.String):
+        return pa.string()
+    return None
+
+
+def value_type(value):
+    """The arrow type we store a value of an untyped column with."""
+    if isinstance(value, bool):
+        return pa.bool_()
+    if isinstance(value, (int, float, decimal.Decimal)):
+        return pa.float64()
+    if isinstance(value, datetime.datetime):
+        return pa.timestamp("us")
+    if isinstance(value, bytes):
+        return pa.binary()
+    return pa.string()
+
+
+def query_types(query):
+    """The arrow types of the columns of a query, None where unknown."""
+    if isinstance(query, str) or not hasattr(query, "columns"):
+        return None
+    return [arrow_type(column.type) for column in query.columns]
+
+
+def infer_schema(header, chunks, types=None):
+    """
+    Complete the arrow types of a stream of chunks.
+
+    We look ahead until every untyped column has a non-null value, columns
+    that are null everywhere become strings.
+
+    Returns:
+        The schema and the chunks, including the ones we looked at.
+    """
+    types = list(types or [None] * len(header))
+    seen = []
+    for rows in chunks:
+        seen.append(rows)
+        for i, arrow_t in enumerate(types):
+            if arrow_t is None:
+                value = next((row[i] for row in rows if row[i] is not None),
+                             None)
+                if value is not None:
+                    types[i] = value_type(value)
+        if all(types):
+            break
+    schema = pa.schema([
+        pa.field(name, arrow_t or pa.string())
+        for name, arrow_t in zip(header, types)
+    ])
+    return schema, itertools.chain(seen, chunks)
+
+
+def arrow_array(column, arrow_type=None):
+    """A pyarrow array of a column, dictionary-encoded for dictionary types."""
+    column = [plain(value) for value in column]
+    if arrow_type is None:
+        return pa.array(column)
+    if pa.types.is_dictionary(arrow_type):
+        return pa.array(column, type=arrow_type.value_type).dictionary_encode()
+    return pa.array(column, type=arrow_type)
+
+
+def write_parquet(fname, header, chunks, schema=None):
+    """
+    Write one row group per chunk.
+
+    Without a schema, we infer it with infer_schema.
+    """
+    if pq is None:
+        raise ImportError("Writing '{0}' requires pyarrow.".format(fname))
+    if schema is None:
+        schema, chunks = infer_schema(header, chunks)
+
+    count = 0
+    with pq.ParquetWriter(fname, schema) as writer:
+        for rows in chunks:
+            columns = [list(column) for column in zip(*rows)]
+            writer.write_table(
+                pa.Table.from_arrays([
+                    arrow_array(column, field.type)
+                    for column, field in zip(columns, schema)
+                ], schema=schema))
+            count += len(rows)
+    return count
+
+
+def write(fname, header, chunks, types=None):
+    """
+    Write chunks of rows to fname, in the format of its extension.
+
+    Args:
+        types: The arrow types of the columns, None where unknown, or an
+            arrow schema. Parquet only.
+
+    Returns:
+        The number of rows we wrote.
+    """
+    print("Writing '{0}'".format(fname))
+    if os.path.splitext(fname)[-1] in PARQUET:
+        schema = types
+        if pa is not None and not isinstance(types, pa.Schema):
+            schema, chunks = infer_schema(header, chunks, types)
+        count = write_parquet(fname, header, chunks, schema)
+    else:
+        count = write_csv(fname, header, chunks)
+    LOG.debug("Wrote %d rows to %s", count, fname)
+    return count
+
+
+def write_query(connection, query, fname, size=None):
+    """Stream the result of a query into fname."""
+    header, chunks = stream(connection, query, size)
+    return write(fname, header, chunks, query_types(query))
+
+
+def write_frame(frame, fname, size=None):
+    """Write a DataFrame to fname, chunk by chunk."""
+    rows = frame.itertuples(index=False, name=None)
+    schema = None
+    if pa is not None:
+        schema = pa.Schema.from_pandas(frame, preserve_index=False)
+    return write(fname, list(frame.columns), chunked(rows, size), schema)
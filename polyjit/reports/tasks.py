@@ -0,0 +1,86 @@
+"""
+Run the independent queries of a report concurrently.
+
+A report declares its work as named tasks. A task is a callable that gets a
+database connection. With an Engine, every task runs in a worker thread on
+its own pooled connection, at most `report_tasks.max_workers` at once. With
+a single Connection, which we must not share between threads, the tasks run
+one after another.
+
+We hand back the result of each task as soon as it finishes, so a report
+can write its output while the other queries are still running.
+"""
+import concurrent.futures as cf
+import contextlib
+import logging
+
+import sqlalchemy as sa
+
+from benchbuild import settings
+
+CFG = settings.CFG
+LOG = logging.getLogger(__name__)
+
+CFG["report_tasks"] = {
+    "max_workers": {
+        "default": 4,
+        "desc": "Maximal number of report queries we run concurrently."
+    }
+}
+CFG["report_tasks"].init_from_env()
+
+
+def max_workers(workers=None):
+    if workers is None:
+        workers = CFG["report_tasks"]["max_workers"].value
+    return max(1, int(workers))
+
+
+@contextlib.contextmanager
+def connect(bind):
+    """A connection of bind, a fresh pooled one if bind is an Engine."""
+    if isinstance(bind, sa.engine.Engine):
+        with bind.connect() as connection:
+            yield connection
+    else:
+        yield bind
+
+
+def call(bind, task):
+    with connect(bind) as connection:
+        return task(connection)
+
+
+def run(bind, tasks, workers=None):
+    """
+    Run named tasks and yield their results as they finish.
+
+    Args:
+        bind: An Engine or a Connection.
+        tasks: (name, task) pairs, task gets a connection.
+        workers: The concurrency cap, `report_tasks.max_workers` if None.
+
+    Yields:
+        (name, result) pairs in the order the tasks finish.
+    """
+    tasks = list(tasks)
+    workers = min(max_workers(workers), len(tasks))
+    if not isinstance(bind, sa.engine.Engine) or workers <= 1:
+        for name, task in tasks:
+            yield name, call(bind, task)
+        return
+
+    with cf.ThreadPoolExecutor(max_workers=workers) as pool:
+        futures = {
+            pool.submit(call, bind, task): name
+            for name, task in tasks
+        }
+        for future in cf.as_completed(futures):
+            LOG.debug("Finished report task %s", futures[future])
+            yield futures[future], future.result()
+
+
+def bind_of(session):
+    """The Engine behind a session, so tasks can use pooled connections."""
+    bind = session.get_bind()
+    return bind.engine if isinstance(bind, sa.engine.Connection) else bind
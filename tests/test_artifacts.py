@@ -0,0 +1,51 @@
+"""
+Test the run-scoped artifact directories.
+"""
+import os
+import tempfile
+import unittest
+
+from polyjit.experiments import artifacts
+
+
+class FakeProject:
+
+    def __init__(self, builddir):
+        self.builddir = builddir
+
+
+class RunArtifactsTestCase(unittest.TestCase):
+
+    def setUp(self):
+        self.tmp_dir = tempfile.TemporaryDirectory()
+        self.project = FakeProject(self.tmp_dir.name)
+
+    def tearDown(self):
+        self.tmp_dir.cleanup()
+
+    def test_nested_runs_share_a_directory(self):
+        with artifacts.run_artifacts(self.project) as outer:
+            with artifacts.run_artifacts(self.project) as inner:
+                self.assertIs(outer, inner)
+        self.assertIsNone(artifacts.current())
+
+    def test_runs_are_isolated(self):
+        with artifacts.run_artifacts(self.project) as first:
+            pass
+        with artifacts.run_artifacts(self.project) as second:
+            pass
+        self.assertNotEqual(first.path, second.path)
+        self.assertEqual(
+            os.path.dirname(first.path),
+            os.path.join(self.tmp_dir.name, artifacts.ARTIFACTS_DIR))
+
+    def test_manifest(self):
+        with artifacts.run_artifacts(self.project) as run_dir:
+            log = run_dir.path_of("log", "polyjit.log")
+            run_dir.path_of("metrics", "metrics.yml")
+            with open(log, 'w') as log_f:
+                log_f.write("log")
+
+        manifest = artifacts.read_manifest(run_dir.path)
+        self.assertEqual(manifest["run_uuid"], run_dir.run_uuid)
+        self.assertEqual(manifest["files"], {"log": log})
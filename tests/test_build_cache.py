@@ -0,0 +1,93 @@
+"""
+Test the content-addressed build cache.
+"""
+import os
+import tempfile
+import unittest
+from unittest import mock
+
+from benchbuild.extensions import base
+from benchbuild.utils import actions
+from polyjit.experiments import build_cache
+
+
+class FakeProject:
+    version = "1.0"
+    src_file = None
+    compiler_extension = None
+
+    def __init__(self, builddir, cflags):
+        self.name = "foo"
+        self.builddir = builddir
+        self.cflags = cflags
+        self.ldflags = []
+        self.compiles = 0
+
+    def compile(self):
+        self.compiles += 1
+        os.makedirs(os.path.join(self.builddir, "bin"))
+        with open(os.path.join(self.builddir, "bin", "foo"), "w") as binary:
+            binary.write(" ".join(self.cflags))
+
+
+class BuildCacheTestCase(unittest.TestCase):
+
+    def setUp(self):
+        self.tmp_dir = tempfile.TemporaryDirectory()
+        self.cache = build_cache.BuildCache(
+            os.path.join(self.tmp_dir.name, "cache"), max_size=1024)
+
+    def tearDown(self):
+        self.tmp_dir.cleanup()
+
+    def builddir(self, name):
+        return os.path.join(self.tmp_dir.name, name)
+
+    def test_restore(self):
+        first = FakeProject(self.builddir("first"), ["-O3"])
+        build_cache.cached_compile(first, self.cache)
+        second = FakeProject(self.builddir("second"), ["-O3"])
+        build_cache.cached_compile(second, self.cache)
+
+        self.assertEqual((first.compiles, second.compiles), (1, 0))
+        with open(os.path.join(second.builddir, "bin", "foo")) as binary:
+            self.assertEqual(binary.read(), "-O3")
+        self.assertEqual(self.cache.stats["hits"], 1)
+        self.assertEqual(self.cache.stats["misses"], 1)
+
+    def test_flags_change_the_key(self):
+        build_cache.cached_compile(
+            FakeProject(self.builddir("first"), ["-O3"]), self.cache)
+        other = FakeProject(self.builddir("second"), ["-O2"])
+        build_cache.cached_compile(other, self.cache)
+        self.assertEqual(other.compiles, 1)
+
+    def test_evict_least_recently_used(self):
+        self.cache.max_size = 8
+        for name, flags in [("a", ["-O1"]), ("b", ["-O2"]), ("c", ["-O3"])]:
+            build_cache.cached_compile(
+                FakeProject(self.builddir(name), flags), self.cache)
+            # Make sure the entries get distinct modification times.
+            for i, entry in enumerate(self.cache.entries()):
+                os.utime(entry, (i, i))
+
+        self.assertEqual(len(self.cache.entries()), 2)
+        self.assertEqual(self.cache.stats["evicted"], 1)
+
+    def test_side_effects_are_not_cached(self):
+        project = FakeProject(self.builddir("first"), ["-O3"])
+        project.compiler_extension = base.Extension()
+        self.assertFalse(build_cache.is_cacheable(project))
+        build_cache.cached_compile(project, self.cache)
+        self.assertEqual(self.cache.entries(), [])
+
+    def test_cached_runtime_actions(self):
+        project = mock.MagicMock(builddir=self.builddir("foo"))
+        self.assertEqual([
+            type(action)
+            for action in build_cache.CachedBuilds.default_runtime_actions(
+                project)
+        ], [
+            actions.MakeBuildDir, build_cache.CachedCompile, actions.Run,
+            actions.Clean
+        ])
@@ -0,0 +1,63 @@
+"""
+Test the build-once, run-many matrix.
+"""
+import os
+import tempfile
+import unittest
+
+from benchbuild.utils import actions
+from polyjit.experiments import build_matrix
+
+
+class FakeProject:
+
+    def __init__(self, name, builddir, cflags):
+        self.name = name
+        self.builddir = builddir
+        self.cflags = cflags
+        self.ldflags = []
+
+    def compile(self):
+        pass
+
+    def run(self):
+        pass
+
+
+class BuildMatrixTestCase(unittest.TestCase):
+
+    def test_groups(self):
+        variants = [
+            FakeProject("foo", "/tmp/foo", ["-O3"]),
+            FakeProject("foo", "/tmp/foo", ["-O2"]),
+            FakeProject("foo", "/tmp/foo", ["-O3"])
+        ]
+        actns = build_matrix.build_matrix(variants)
+        self.assertEqual(len(actns), 2)
+
+        _, compile_o3, runs_o3, _ = actns[0].actions
+        self.assertIsInstance(compile_o3, actions.Compile)
+        self.assertIs(compile_o3.obj, variants[0])
+        self.assertEqual([run.actions[1].obj for run in runs_o3.actions],
+                         [variants[0], variants[2]])
+
+
+class UnwrapTestCase(unittest.TestCase):
+
+    def test_unwrap(self):
+        with tempfile.TemporaryDirectory() as builddir:
+            binary = os.path.join(builddir, "foo")
+            data = os.path.join(builddir, "input")
+            with open(binary, "w") as binary_f:
+                binary_f.write("binary")
+            for path in [data, data + ".bin"]:
+                with open(path, "w") as data_f:
+                    data_f.write("data")
+            os.rename(binary, binary + ".bin")
+            with open(binary, "w") as wrapper:
+                wrapper.write('real_command = local["{}.bin"]\n'.format(binary))
+
+            self.assertEqual(build_matrix.unwrap(builddir), [binary])
+            with open(binary) as binary_f:
+                self.assertEqual(binary_f.read(), "binary")
+            self.assertTrue(os.path.exists(data + ".bin"))
@@ -0,0 +1,73 @@
+"""
+Test the PolyJIT cache sweep.
+"""
+import unittest
+
+import pandas as pd
+
+from benchbuild.extensions import base
+from polyjit.experiments import cache_sweep, polyjit
+from polyjit.reports import cache_sweep as cache_sweep_report
+
+
+class PJITArgs(base.Extension):
+
+    def __call__(self, *args, **kwargs):
+        return [cache_sweep.SetCacheConfig().argv['PJIT_ARGS']]
+
+
+class SetCacheConfigTestCase(unittest.TestCase):
+
+    def set_flag(self, flag):
+        cfg = cache_sweep.CFG["cache_sweep"]
+        self.addCleanup(cfg.__setitem__, "size_flag", cfg["size_flag"].value)
+        cfg["size_flag"] = flag
+
+    def test_args(self):
+        self.set_flag("-polli-cache-size")
+        ext = PJITArgs() << cache_sweep.SetCacheConfig(config={
+            "cache_size": 4,
+            "specialization": True
+        })
+        self.assertEqual(ext(), [["-polli-cache-size=4"]])
+
+    def test_without_specialization(self):
+        self.set_flag("-polli-cache-size")
+        ext = PJITArgs() << polyjit.DisablePolyJIT() \
+            << cache_sweep.SetCacheConfig(config={
+                "cache_size": 0,
+                "specialization": False
+            })
+        self.assertEqual(ext(), [["-polli-no-specialization"]])
+
+    def test_without_size_flag(self):
+        self.set_flag("")
+        ext = PJITArgs() << cache_sweep.SetCacheConfig(config={
+            "cache_size": 4,
+            "specialization": True
+        })
+        self.assertEqual(ext(), [[]])
+        self.assertEqual(cache_sweep.grid(), [(0, True), (0, False)])
+
+
+class SweepReportTestCase(unittest.TestCase):
+
+    def test_pareto(self):
+        results = pd.DataFrame(
+            [("foo", run_id, config, name, value)
+             for run_id, config, hits in [(1, "a", 1), (2, "b", 9),
+                                          (3, "c", 5)]
+             for name, value in [("n_cachehits", hits), ("n_requests", 10),
+                                 ("n_variants", 1), ("t_codegen", 1)]],
+            columns=["project", "run_id", "config", "name", "value"])
+        metrics = pd.DataFrame(
+            [(run_id, name, value)
+             for run_id, rss, time in [(1, 100, 9), (2, 300, 2),
+                                       (3, 400, 3)]
+             for name, value in [("time.rss", rss), ("time.real_s", time)]],
+            columns=["run_id", "name", "value"])
+
+        sweep = cache_sweep_report.sweep_frame(results, metrics)
+        self.assertEqual(list(sweep.config), ["a", "b", "c"])
+        self.assertEqual(list(sweep.pareto), [True, True, False])
+        self.assertEqual(list(sweep.hit_ratio), [0.1, 0.9, 0.5])
@@ -0,0 +1,106 @@
+"""
+Test the incremental compilestats summaries.
+"""
+import unittest
+import uuid
+from unittest import mock
+
+import sqlalchemy as sa
+
+from benchbuild.utils import schema
+from polyjit.experiments import compilestats as cs
+from polyjit.reports import compilestats as cs_report
+
+
+class SummaryTestCase(unittest.TestCase):
+
+    def setUp(self):
+        engine = sa.create_engine('sqlite://')
+        schema.metadata().create_all(
+            engine,
+            tables=[
+                schema.Experiment.__table__, schema.RunGroup.__table__,
+                schema.Project.__table__, schema.Run.__table__,
+                cs.SUMMARY, cs.SUMMARIZED
+            ])
+        # SQLite cannot autoincrement the composite key of compilestats.
+        engine.execute("CREATE TABLE compilestats (run_id INTEGER, "
+                       "id INTEGER, name VARCHAR, component VARCHAR, "
+                       "value NUMERIC, PRIMARY KEY (run_id, id))")
+        self.session = sa.orm.sessionmaker(bind=engine)()
+        self.exp_id = uuid.uuid4()
+        self.stat_id = 0
+
+    def add_run(self, run_id, stats, exp_id=None):
+        run = schema.Run(id=run_id, project_name="foo", project_group="bar",
+                         experiment_name="cs",
+                         experiment_group=exp_id or self.exp_id,
+                         run_group=uuid.uuid4())
+        self.session.add(run)
+        result = []
+        for name, value in stats.items():
+            self.stat_id += 1
+            result.append(
+                cs.CompileStat(id=self.stat_id, run_id=run_id, name=name,
+                               component="polly", value=value))
+        self.session.add_all(result)
+        self.session.flush()
+        return run, result
+
+    def summary(self):
+        return {
+            name: int(value)
+            for name, value in self.session.execute(
+                sa.sql.select([cs.SUMMARY.c.name, cs.SUMMARY.c.value]).where(
+                    cs.SUMMARY.c.experiment_group == self.exp_id))
+        }
+
+    def test_refresh_new_runs_only(self):
+        self.add_run(1, {"scops": 2, "regions": 5})
+        self.add_run(2, {"scops": 3}, exp_id=uuid.uuid4())
+        self.assertEqual(cs.refresh_summary(self.session, [self.exp_id]), 2)
+        self.assertEqual(self.summary(), {"scops": 2, "regions": 5})
+
+        self.add_run(3, {"scops": 1})
+        self.assertEqual(cs.refresh_summary(self.session, [self.exp_id]), 1)
+        self.assertEqual(cs.refresh_summary(self.session, [self.exp_id]), 0)
+        self.assertEqual(self.summary(), {"scops": 3, "regions": 5})
+
+    def test_refresh_in_batches(self):
+        for run_id in range(1, 4):
+            self.add_run(run_id, {"scops": run_id})
+        with mock.patch.object(cs, "BATCH", 2):
+            self.assertEqual(
+                cs.refresh_summary(self.session, [self.exp_id]), 2)
+        self.assertEqual(self.summary(), {"scops": 6})
+        self.assertEqual(cs.refresh_summary(self.session, [self.exp_id]), 0)
+
+    def test_concurrent_refresh(self):
+        self.add_run(1, {"scops": 2})
+        self.session.commit()
+        refresh_summary = cs.refresh_summary
+        calls = []
+
+        def concurrent(session, experiment_ids):
+            calls.append(experiment_ids)
+            changed = refresh_summary(session, experiment_ids)
+            if len(calls) == 1:
+                # Another report summarized the same run meanwhile.
+                session.execute(cs.SUMMARIZED.insert().values(
+                    run_id=1, experiment_group=self.exp_id))
+            return changed
+
+        with mock.patch.object(cs, "refresh_summary",
+                               side_effect=concurrent), \
+                self.assertLogs(cs_report.LOG, "WARNING"):
+            self.assertTrue(cs_report.refresh(self.session, [self.exp_id]))
+        self.assertEqual(len(calls), 2)
+        self.assertEqual(self.summary(), {"scops": 2})
+
+    def test_refresh_gives_up(self):
+        self.add_run(1, {"scops": 2})
+        error = sa.exc.IntegrityError("INSERT", {}, Exception())
+        with mock.patch.object(cs, "refresh_summary", side_effect=error), \
+                self.assertLogs(cs_report.LOG, "WARNING") as logs:
+            self.assertFalse(cs_report.refresh(self.session, [self.exp_id]))
+        self.assertEqual(len(logs.output), 2)
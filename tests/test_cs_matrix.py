@@ -0,0 +1,118 @@
+"""
+Test the comparison of compilestats between configurations.
+"""
+import unittest
+import uuid
+
+import sqlalchemy as sa
+
+from benchbuild.utils import schema
+from polyjit.experiments import compilestats as cs
+from polyjit.experiments import pollytest
+from polyjit.reports import compilestats as cs_report
+
+
+class CompileStatsTestCase(unittest.TestCase):
+
+    def setUp(self):
+        self.engine = sa.create_engine('sqlite://')
+        schema.metadata().create_all(
+            self.engine,
+            tables=[
+                schema.Experiment.__table__, schema.RunGroup.__table__,
+                schema.Project.__table__, schema.Run.__table__,
+                schema.Config.__table__
+            ])
+        # SQLite cannot autoincrement the composite key of compilestats.
+        self.engine.execute("CREATE TABLE compilestats (run_id INTEGER, "
+                            "id INTEGER, name VARCHAR, component VARCHAR, "
+                            "value NUMERIC, PRIMARY KEY (run_id, id))")
+        self.session = sa.orm.sessionmaker(bind=self.engine)()
+        self.exp_id = uuid.uuid4()
+        self.run_id = 0
+
+    def add_sample(self, project, config, **stats):
+        """One run group, with one run per stat."""
+        run_group = uuid.uuid4()
+        for stat, value in stats.items():
+            self.run_id += 1
+            self.session.add(
+                schema.Run(id=self.run_id, project_name=project,
+                           project_group="bar", experiment_name="pollytest",
+                           experiment_group=self.exp_id,
+                           run_group=run_group))
+            self.session.add(
+                schema.Config(run_id=self.run_id, name="name", value=config))
+            self.session.add(
+                cs.CompileStat(id=self.run_id, run_id=self.run_id,
+                               name=stat, component="polly", value=value))
+
+
+class StatMatrixTestCase(CompileStatsTestCase):
+
+    def matrix(self):
+        self.session.commit()
+        with self.engine.connect() as con:
+            matrix = cs_report.compare_configs(
+                con, [self.exp_id], baseline="-O3", threshold=0.05,
+                sigmas=2.0)
+        return matrix.set_index(["project", "stat"])
+
+    def test_deltas(self):
+        self.add_sample("foo", "-O3", scops=10)
+        self.add_sample("foo", "-O3", scops=10)
+        self.add_sample("foo", "-O3 -polly", scops=15)
+        self.add_sample("foo", "-O3 -polly", scops=15, loops=2)
+        matrix = self.matrix()
+
+        self.assertEqual(matrix.loc[("foo", "scops"), "mean_-O3"], 10)
+        self.assertEqual(matrix.loc[("foo", "scops"), "delta_-O3 -polly"], 5)
+        self.assertEqual(matrix.loc[("foo", "scops"), "ratio_-O3 -polly"],
+                         1.5)
+        self.assertTrue(matrix.loc[("foo", "scops"), "notable"])
+        # LLVM omits zero stats.
+        self.assertEqual(matrix.loc[("foo", "loops"), "mean_-O3"], 0)
+        self.assertEqual(matrix.loc[("foo", "loops"), "mean_-O3 -polly"], 1)
+
+    def test_noise_is_not_notable(self):
+        for value in [5, 15, 10]:
+            self.add_sample("foo", "-O3", scops=value)
+        for value in [20, 5, 8]:
+            self.add_sample("foo", "-O3 -polly", scops=value)
+        self.add_sample("baz", "-O3", scops=10)
+        matrix = self.matrix()
+
+        self.assertFalse(matrix.loc[("foo", "scops"), "notable"])
+        # baz did not compile with -O3 -polly.
+        self.assertTrue(
+            matrix.loc[("baz", "scops"), ["mean_-O3 -polly"]].isnull().all())
+        self.assertFalse(matrix.loc[("baz", "scops"), "notable"])
+
+    def test_single_sample(self):
+        self.add_sample("foo", "-O3", scops=10)
+        self.add_sample("foo", "-O3 -polly", scops=11)
+        with self.assertLogs(cs_report.LOG, "WARNING") as logs:
+            matrix = self.matrix()
+        self.assertIn("2 project configurations", logs.output[0])
+        # Without variance, the threshold alone decides.
+        self.assertTrue(matrix.loc[("foo", "scops"), "notable"])
+
+    def test_missing_baseline(self):
+        self.add_sample("foo", "-O3 -polly", scops=1)
+        with self.assertRaises(ValueError):
+            self.matrix()
+
+
+class PollyTestReportTestCase(CompileStatsTestCase):
+
+    def test_report(self):
+        self.add_sample("foo", "-O3", scops=10)
+        self.add_sample("foo", "-O3", scops=5)
+        self.add_sample("foo", "-O3 -polly", scops=15)
+        self.session.commit()
+        report = pollytest.PollyTestReport(
+            "pollytest", [str(self.exp_id)], "out.csv", self.session)
+        rows = self.session.execute(report.report()).fetchall()
+        self.assertEqual(
+            [(row.config, row.stat, row.value) for row in rows],
+            [("-O3", "scops", 15), ("-O3 -polly", "scops", 15)])
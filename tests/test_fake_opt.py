@@ -0,0 +1,59 @@
+"""
+Test the fake opt we benchmark the sequence searches with.
+"""
+import os
+import tempfile
+import unittest
+
+from plumbum import local
+
+from polyjit.experiments import compilestats, fake_opt
+
+
+class FakeOptTestCase(unittest.TestCase):
+
+    def test_deterministic(self):
+        sequence = ['-mem2reg', '-licm', '-instcombine']
+        self.assertEqual(
+            fake_opt.region_stats(sequence, 1),
+            fake_opt.region_stats(list(sequence), 1))
+        regions, scops = fake_opt.region_stats(sequence, 1)
+        self.assertTrue(0 <= scops <= regions)
+
+    def test_parse_args(self):
+        passes, inputs = fake_opt.parse_args([
+            'x.ll', '-load=LLVMPolly.so', '-disable-output', '-stats',
+            '-mem2reg', '-o', 'out.ll', '-licm', '-polly-detect'
+        ])
+        self.assertEqual(passes, ['-mem2reg', '-licm'])
+        self.assertEqual(inputs, ['x.ll'])
+
+    def test_stats_are_parseable(self):
+        stats = list(
+            compilestats.ExtractCompileStats.get_compilestats(
+                fake_opt.render_stats(42, 7)))
+        values = {(s['component'].strip(), s['desc']): s['value']
+                  for s in stats}
+        self.assertEqual(values[('region', 'The # of regions')], 42)
+        self.assertEqual(
+            values[('polly-detect',
+                    'Number of regions that a valid part of Scop')], 7)
+
+    def test_zero_stats_are_omitted(self):
+        self.assertNotIn('Scop', fake_opt.render_stats(42, 0))
+
+    def test_benchmark_overhead(self):
+        from polyjit.experiments.sequences import benchmark_strategies as bs
+        self.assertEqual(bs.covered([(0, 2), (1, 3), (5, 6)]), 4)
+        with tempfile.TemporaryDirectory() as tmp_dir:
+            log_path = os.path.join(tmp_dir, 'calls.log')
+            opt = fake_opt.install(tmp_dir)
+            with local.env(FAKE_OPT_LOG=log_path):
+                shim = bs.calibrate(opt, log_path, runs=2)
+                result = bs.measure(
+                    'sequential', 1,
+                    lambda: [local[opt]('-licm') for _ in range(3)],
+                    log_path, shim)
+        self.assertEqual(result['calls'], 3)
+        self.assertGreater(result['shim_ms'], 0)
+        self.assertLess(result['idle_%'], 50)
@@ -0,0 +1,130 @@
+"""
+Test the JIT request latency experiment and report.
+"""
+import os
+import tempfile
+import unittest
+from unittest import mock
+
+import numpy as np
+
+from polyjit.experiments import latency, polyjit
+from polyjit.reports import latency as latency_report
+
+TRACE = """
+requests:
+  - region-id: a
+    request: 0
+    compile-start: 100
+    compile-end: 1100
+    blocked: 1000
+  - region-id: a
+    request: 2000
+    blocked: 10
+  - region-id: b
+    request: 0
+    compile-start: 0
+    compile-end: 100000
+    blocked: 100000
+"""
+
+
+class LatencyTestCase(unittest.TestCase):
+
+    def setUp(self):
+        with tempfile.TemporaryDirectory() as tmp_dir:
+            path = os.path.join(tmp_dir, "trace.yml")
+            with open(path, 'w') as trace_f:
+                trace_f.write(TRACE)
+            self.latencies = latency.read_latencies(path)
+
+    def test_read(self):
+        self.assertEqual(sorted(self.latencies), ["a", "b"])
+        self.assertEqual(self.latencies["a"].shape, (2, 4))
+        self.assertTrue(np.isnan(self.latencies["a"][1, 2]))
+
+    def test_encode(self):
+        timings = self.latencies["a"]
+        np.testing.assert_array_equal(
+            latency.decode(latency.encode(timings)), timings)
+
+    def test_report(self):
+        rows = [("foo", region, latency.encode(timings))
+                for region, timings in self.latencies.items()]
+        grouped = latency_report.regions(rows)
+        self.assertEqual(
+            sorted(grouped), [("foo", "*"), ("foo", "a"), ("foo", "b")])
+
+        np.testing.assert_array_equal(grouped[("foo", "a")]["latency"],
+                                      [1100, 0])
+        np.testing.assert_array_equal(grouped[("foo", "a")]["compile"],
+                                      [1000])
+
+        frame = latency_report.percentile_frame(grouped)
+        total = frame[(frame.region == "*") & (frame.metric == "latency")]
+        self.assertEqual(total.n.iloc[0], 3)
+        self.assertEqual(total["max"].iloc[0], 100000)
+
+        hist = latency_report.histogram_frame(grouped)
+        blocked = hist[(hist.region == "*") & (hist.metric == "blocked")]
+        self.assertEqual(blocked["count"].sum(), 3)
+
+
+class CollectLatenciesTestCase(unittest.TestCase):
+
+    def setUp(self):
+        self.tmp_dir = tempfile.TemporaryDirectory()
+        self.project = mock.MagicMock(builddir=self.tmp_dir.name)
+        self.project.name = "foo"
+        self.pjit_args = []
+
+    def tearDown(self):
+        self.tmp_dir.cleanup()
+
+    def collect(self, flag):
+        test = self
+
+        class Inner(polyjit.PolyJITConfig):
+            def __call__(self, *args, **kwargs):
+                test.pjit_args = self.argv.get('PJIT_ARGS', [])
+                return [mock.MagicMock(failed=False)]
+
+        default = latency.CFG["latency"]["outfile_flag"].value
+        latency.CFG["latency"]["outfile_flag"] = flag
+        self.addCleanup(latency.CFG["latency"].__setitem__, "outfile_flag",
+                        default)
+
+        collect = latency.CollectLatencies(Inner(), project=self.project)
+        with mock.patch.object(latency.artifacts, 'persist_artifacts'), \
+                mock.patch.object(latency, 'persist_latencies') as persist:
+            self.assertEqual(len(collect()), 1)
+        return persist
+
+    def test_missing_trace(self):
+        persist = self.collect("-polli-track-latencies-outfile")
+        self.assertEqual(len(self.pjit_args), 1)
+        self.assertTrue(self.pjit_args[0].startswith(
+            "-polli-track-latencies-outfile="))
+        persist.assert_not_called()
+
+    def test_disabled(self):
+        persist = self.collect("")
+        self.assertEqual(self.pjit_args, [])
+        persist.assert_not_called()
+
+    def test_requests_from_log(self):
+        lines = [
+            b"[2018-05-04 13:12:11.000] [polli] [trace] request region=a\n",
+            b"[2018-05-04 13:12:11.001] [polli] [trace] compiling region=a\n",
+            b"[2018-05-04 13:12:11.004] [polli] [trace] variant region=a\n",
+            b"[2018-05-04 13:12:11.005] [polli] [trace] blocked region=a\n",
+            b"[2018-05-04 13:12:11.010] [polli] [trace] request region=a\n",
+            b"[2018-05-04 13:12:11.010] [polli] [trace] cache hit region=a\n",
+            b"[2018-05-04 13:12:11.011] [polli] [info] unrelated line\n",
+        ]
+        timings = latency.log_latencies(lines)["a"]
+        self.assertEqual(timings.shape, (2, 4))
+        np.testing.assert_allclose(timings[0, 1:3] - timings[0, 0],
+                                   [1e6, 4e6])
+        self.assertAlmostEqual(timings[0, 3], 5e6)
+        self.assertTrue(np.isnan(timings[1, 1:]).all())
@@ -0,0 +1,121 @@
+"""
+Test the vectorized parser for likwid's CSV output.
+"""
+import os
+import tempfile
+import unittest
+from unittest import mock
+
+import sqlalchemy as sa
+from plumbum import local
+
+from benchbuild import extensions as ext
+from benchbuild import likwid
+from benchbuild.utils import schema
+from polyjit.experiments import pj_likwid
+
+LIKWID_CSV = """STRUCT,Info,2
+CPU name:,Intel(R) Xeon(R) CPU E5-2690 v3,,
+CPU clock:,2.60 GHz,,
+STRUCT,Region 1,4
+1,Region,main,
+Region Info,Core 0,Core 2,
+RDTSC Runtime [s],0.5,0.6,
+call count,1,1,
+TABLE,Region 1,Group 1 Raw,2
+Event,Counter,Core 0,Core 2,
+INSTR_RETIRED_ANY,FIXC0,100,200,
+CPU_CLK_UNHALTED_CORE,FIXC1,300,,
+TABLE,Region 1,Group 1 Metric,2
+Metric,Core 0,Core 2,
+Memory bandwidth [MBytes/s],10.5,20,
+CPI,3,-,
+TABLE,Region 1,Group 1 Metric STAT,1
+Metric STAT,Sum,Min,
+CPI,3,3,
+STRUCT,Region 2,3
+1,Region,init,
+Region Info,Core 0,Core 2,
+RDTSC Runtime [s],0.1,0.2,
+"""
+
+
+class ParsePerfcountersTestCase(unittest.TestCase):
+
+    def setUp(self):
+        self.measurements = pj_likwid.parse_perfcounters(
+            LIKWID_CSV.splitlines())
+
+    def test_matches_benchbuild(self):
+        with tempfile.TemporaryDirectory() as tmp_dir:
+            likwid_f = os.path.join(tmp_dir, "likwid.txt")
+            with open(likwid_f, 'w') as out:
+                out.write(LIKWID_CSV)
+            expected = set()
+            for region, metric, core, value in likwid.perfcounters(likwid_f):
+                try:
+                    expected.add((region, metric, core, float(value)))
+                except ValueError:
+                    pass
+
+        # benchbuild's parser stops after the tables of the first region.
+        main = self.measurements[self.measurements.region == "main"]
+        self.assertEqual(
+            set(main.itertuples(index=False, name=None)), expected)
+        self.assertEqual(len(main), len(expected))
+
+    def test_all_regions(self):
+        init = self.measurements[self.measurements.region == "init"]
+        self.assertEqual(
+            list(init.itertuples(index=False, name=None)),
+            [("init", "RDTSC Runtime [s]", "Core 0", 0.1),
+             ("init", "RDTSC Runtime [s]", "Core 2", 0.2)])
+
+    def test_derived_metrics(self):
+        measurements = pj_likwid.with_derived_metrics(self.measurements)
+        totals = measurements[measurements.core == pj_likwid.DERIVED_CORE]
+        self.assertEqual(
+            list(totals.itertuples(index=False, name=None)),
+            [("main", "Memory bandwidth [MBytes/s]", "total", 30.5)])
+
+    def test_persist(self):
+        engine = sa.create_engine('sqlite://')
+        schema.metadata().create_all(
+            engine,
+            tables=[
+                schema.Experiment.__table__, schema.RunGroup.__table__,
+                schema.Run.__table__, pj_likwid.Likwid.__table__
+            ])
+        session = sa.orm.sessionmaker(bind=engine)()
+        run = schema.Run(id=1, project_name='foo')
+        session.add(run)
+        pj_likwid.persist_likwid(run, session, self.measurements)
+        session.commit()
+        self.assertEqual(
+            session.query(pj_likwid.Likwid).count(), len(self.measurements))
+
+
+class RunWithLikwidTestCase(unittest.TestCase):
+
+    def test_config_per_run(self):
+        configs = []
+
+        class Inner(ext.base.Extension):
+            def __call__(self, *args, **kwargs):
+                configs.append(self.config)
+                return [mock.MagicMock()]
+
+        project = mock.MagicMock()
+        project.name = 'foo'
+        likwid_ext = pj_likwid.RunWithLikwid(
+            project, None, Inner(), config={'jobs': [1, 2],
+                                            'groups': ['CLOCK']})
+        with mock.patch.object(pj_likwid, 'likwid_perfctr', local['true']), \
+                mock.patch.object(pj_likwid, 'read_perfcounters'), \
+                mock.patch.object(pj_likwid, 'with_derived_metrics'), \
+                mock.patch.object(pj_likwid, 'persist_likwid'), \
+                mock.patch.object(pj_likwid.db, 'persist_config'), \
+                mock.patch.object(pj_likwid, 'rm'):
+            self.assertEqual(len(likwid_ext(local['true'])), 2)
+        self.assertEqual(configs, [{'jobs': 1, 'name': 'CLOCK.1'},
+                                   {'jobs': 2, 'name': 'CLOCK.2'}])
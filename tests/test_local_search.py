@@ -0,0 +1,110 @@
+"""
+Test the local search strategies of the sequence experiments.
+"""
+import concurrent.futures as cf
+import random
+import threading
+import unittest
+
+from polyjit.experiments import local_search
+
+
+def distance(sequence):
+    """Number of positions that are not the pass 'a'."""
+    return sum(1 for p in sequence if p != 'a')
+
+
+class CountingEvaluation:
+
+    def __init__(self):
+        self.calls = 0
+        self.lock = threading.Lock()
+
+    def __call__(self, sequence):
+        with self.lock:
+            self.calls += 1
+        return distance(sequence)
+
+
+class NeighbourTestCase(unittest.TestCase):
+
+    def test_all_neighbours(self):
+        neighbours = list(
+            local_search.random_neighbours(['a', 'b'], ['a', 'b', 'c']))
+        self.assertEqual(len(neighbours), 4)
+        self.assertCountEqual(neighbours, [['b', 'b'], ['c', 'b'],
+                                           ['a', 'a'], ['a', 'c']])
+
+    def test_exclude(self):
+        neighbours = list(
+            local_search.random_neighbours(
+                ['a', 'b'], ['a', 'b', 'c'], exclude=lambda i, p: i == 0))
+        self.assertCountEqual(neighbours, [['a', 'a'], ['a', 'c']])
+
+
+class EvaluateLazilyTestCase(unittest.TestCase):
+
+    def test_stops_at_first_accepted(self):
+        evaluate = CountingEvaluation()
+        with cf.ThreadPoolExecutor(1) as pool:
+            accepted, evaluated = local_search.evaluate_lazily(
+                pool, evaluate, [['b'], ['a'], ['a'], ['a']],
+                lambda _, fitness: fitness == 0, window=1)
+        self.assertEqual(accepted, [(['a'], 0)])
+        self.assertEqual(len(evaluated), 2)
+        self.assertEqual(evaluate.calls, 2)
+
+    def test_refill_after_accepting(self):
+        evaluate = CountingEvaluation()
+        with cf.ThreadPoolExecutor(1) as pool:
+            accepted, evaluated = local_search.evaluate_lazily(
+                pool, evaluate, [['a'], ['b'], ['a'], ['a']],
+                lambda _, fitness: fitness == 0, window=1, first_k=2)
+        self.assertEqual(accepted, [(['a'], 0), (['a'], 0)])
+        self.assertEqual(len(evaluated), 3)
+
+    def test_limit(self):
+        evaluate = CountingEvaluation()
+        with cf.ThreadPoolExecutor(2) as pool:
+            accepted, evaluated = local_search.evaluate_lazily(
+                pool, evaluate, [['b']] * 10, lambda _, __: False, window=2,
+                limit=3)
+        self.assertEqual(accepted, [])
+        self.assertEqual(len(evaluated), 3)
+
+
+class StrategyTestCase(unittest.TestCase):
+
+    def setUp(self):
+        random.seed(0)
+        self.pass_space = ['a', 'b', 'c', 'd', 'e']
+        self.start = ['e', 'd', 'c', 'b', 'e', 'd']
+
+    def test_first_improvement_climb(self):
+        evaluate = CountingEvaluation()
+        with cf.ThreadPoolExecutor(1) as pool:
+            best, fitness = local_search.climb(self.start, self.pass_space,
+                                               evaluate, pool, window=1)
+        self.assertEqual(best, ['a'] * 6)
+        self.assertEqual(fitness, 0)
+        # A full neighbourhood scan needs 24 compiles per step.
+        self.assertLess(evaluate.calls, 6 * 24)
+
+    def test_anneal(self):
+        evaluate = CountingEvaluation()
+        with cf.ThreadPoolExecutor(2) as pool:
+            best, fitness = local_search.anneal(
+                self.start, self.pass_space, evaluate, pool, 500,
+                temperature=0.5, cooling=0.5, window=2)
+        self.assertEqual(fitness, distance(best))
+        self.assertLess(fitness, distance(self.start))
+        self.assertLessEqual(evaluate.calls, 501 + 2)
+
+    def test_tabu_search(self):
+        evaluate = CountingEvaluation()
+        with cf.ThreadPoolExecutor(2) as pool:
+            best, fitness = local_search.tabu_search(
+                self.start, self.pass_space, evaluate, pool, 200, tenure=3,
+                sample_size=10, window=2)
+        self.assertEqual(best, ['a'] * 6)
+        self.assertEqual(fitness, 0)
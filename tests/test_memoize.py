@@ -0,0 +1,165 @@
+"""
+Test the memoization of measured configurations.
+"""
+import os
+import tempfile
+import unittest
+import uuid
+
+import sqlalchemy as sa
+from plumbum import local
+
+from benchbuild.extensions import base
+from benchbuild.utils import schema
+from polyjit.experiments import memoize, polyjit
+
+
+class FingerprintTestCase(unittest.TestCase):
+
+    def fingerprint(self, env=None, config=None):
+        return memoize.fingerprint(local["sh"], ["-c", "true"], env or {},
+                                   [base.Extension(config=config)])
+
+    def test_stable(self):
+        self.assertEqual(self.fingerprint(), self.fingerprint())
+
+    def test_env(self):
+        self.assertNotEqual(
+            self.fingerprint(), self.fingerprint({"PJIT_ARGS": "-polli"}))
+        self.assertEqual(self.fingerprint(), self.fingerprint({"HOME": "/"}))
+
+    def test_config(self):
+        self.assertNotEqual(
+            self.fingerprint(config={"jobs": 1}),
+            self.fingerprint(config={"jobs": 2}))
+
+
+    def test_builddir_of_experiment(self):
+        with tempfile.TemporaryDirectory() as tmp_dir:
+            prints = []
+            for exp_id in [uuid.uuid4(), uuid.uuid4()]:
+                root = os.path.join(tmp_dir,
+                                    "ijpp-foo-bar-{0}".format(exp_id))
+                binary = os.path.join(root, "foo")
+                os.makedirs(root)
+                with open(binary, "w") as binary_f:
+                    binary_f.write("#!/bin/sh\n")
+                prints.append(
+                    memoize.fingerprint(
+                        local[binary], [os.path.join(root, "input.txt")],
+                        {"PJIT_ARGS": "-polli-db=" + root}, [], root=root))
+            self.assertEqual(prints[0], prints[1])
+
+            with open(binary, "w") as binary_f:
+                binary_f.write("#!/bin/bash\n")
+            self.assertNotEqual(
+                prints[1],
+                memoize.fingerprint(
+                    local[binary], [os.path.join(root, "input.txt")],
+                    {"PJIT_ARGS": "-polli-db=" + root}, [], root=root))
+
+
+class FindMeasuredTestCase(unittest.TestCase):
+
+    def setUp(self):
+        engine = sa.create_engine('sqlite://')
+        schema.metadata().create_all(
+            engine,
+            tables=[
+                schema.Experiment.__table__, schema.RunGroup.__table__,
+                schema.Run.__table__, schema.RunLog.__table__,
+                schema.Config.__table__
+            ])
+        self.session = sa.orm.sessionmaker(bind=engine)()
+        self.run_id = 0
+
+    def add_runs(self, *states, value="fp"):
+        run_group = uuid.uuid4()
+        for state in states:
+            self.run_id += 1
+            self.session.add_all([
+                schema.Run(id=self.run_id, project_name="foo",
+                           experiment_name="ijpp", run_group=run_group,
+                           experiment_group=run_group,
+                           status=state),
+                schema.RunLog(run_id=self.run_id, status=0, stdout="out",
+                              stderr=""),
+                schema.Config(run_id=self.run_id, name=memoize.FINGERPRINT,
+                              value=value)
+            ])
+        self.session.commit()
+
+    def find(self):
+        return memoize.find_measured(self.session, "ijpp", "foo", "fp")
+
+    def test_completed(self):
+        self.add_runs("failed")
+        self.add_runs("completed", "completed")
+        measured = self.find()
+        self.assertEqual([run.db_run.id for run in measured], [2, 3])
+        self.assertEqual(measured[0].stdout, "out")
+        self.assertFalse(measured[0].has_failed)
+
+    def test_failed(self):
+        self.add_runs("completed")
+        self.add_runs("completed", "failed")
+        self.assertEqual(self.find(), [])
+
+    def test_other_fingerprint(self):
+        self.add_runs("completed", value="other")
+        self.assertEqual(self.find(), [])
+
+
+class CopyRunTestCase(unittest.TestCase):
+
+    def setUp(self):
+        engine = sa.create_engine('sqlite://')
+        schema.metadata().create_all(
+            engine,
+            tables=[
+                schema.Experiment.__table__, schema.RunGroup.__table__,
+                schema.Run.__table__, schema.RunLog.__table__,
+                schema.Config.__table__, schema.Metric.__table__,
+                polyjit.PJ_Result.__table__,
+                polyjit.PJ_Result_Region.__table__
+            ])
+        self.session = sa.orm.sessionmaker(bind=engine)()
+        self.old_group = uuid.uuid4()
+        self.session.add_all([
+            schema.Run(id=1, project_name="foo", experiment_name="ijpp",
+                       run_group=self.old_group,
+                       experiment_group=self.old_group, status="completed"),
+            schema.RunLog(run_id=1, status=0, stdout="out", stderr=""),
+            schema.Config(run_id=1, name="name", value="PolyJIT"),
+            schema.Metric(run_id=1, name="time.real_s", value=1.5),
+            polyjit.PJ_Result(run_id=1, name="t_all", value=10),
+            polyjit.PJ_Result_Region(run_id=1, name="t_region", value=4,
+                                     region_name="r1")
+        ])
+        self.session.commit()
+
+    def test_copy(self):
+        stored = memoize.StoredRun(
+            self.session.query(schema.Run).get(1),
+            self.session.query(schema.RunLog).get(1), self.session)
+        experiment_group = uuid.uuid4()
+        copy = memoize.copy_run(self.session, stored, experiment_group,
+                                experiment_group)
+        self.session.commit()
+
+        self.assertNotEqual(copy.db_run.id, 1)
+        self.assertEqual(copy.db_run.experiment_group, experiment_group)
+        self.assertEqual(copy.db_run.status, "completed")
+        self.assertEqual(copy.stdout, "out")
+        self.assertEqual(
+            self.session.query(schema.Config.value).filter_by(
+                run_id=copy.db_run.id).scalar(), "PolyJIT")
+        self.assertEqual(
+            self.session.query(schema.Metric.value).filter_by(
+                run_id=copy.db_run.id).scalar(), 1.5)
+        regions = self.session.query(polyjit.PJ_Result_Region).filter_by(
+            run_id=copy.db_run.id).all()
+        self.assertEqual([r.region_name for r in regions], ["r1"])
+        self.assertEqual(
+            self.session.query(polyjit.PJ_Result).filter_by(
+                run_id=1).count(), 2)
@@ -0,0 +1,119 @@
+"""
+Test the sampled memory timelines of the polly-mse experiment.
+"""
+import os
+import subprocess
+import time
+import unittest
+import uuid
+
+import sqlalchemy as sa
+from plumbum import local
+
+from benchbuild.utils import schema
+from polyjit.experiments import memory, mse
+
+
+class TimelineTestCase(unittest.TestCase):
+
+    def test_encode_decode(self):
+        samples = [[0, 100, 50, 0], [50, 120, 60, 0], [100, 90, 40, 8]]
+        blob = memory.encode_timeline(samples)
+        self.assertEqual(memory.decode_timeline(blob), samples)
+        self.assertEqual(memory.decode_timeline(memory.encode_timeline([])),
+                         [])
+
+    def test_timeline_stats(self):
+        samples = [[0, 100, 0, 0], [100, 300, 0, 0], [400, 100, 0, 0]]
+        peak, average, above = memory.timeline_stats(samples, 200)
+        self.assertEqual(peak, 300)
+        self.assertEqual(average, (100 * 100 + 300 * 300) / 400)
+        self.assertEqual(above, 0.3)
+
+    def test_single_sample(self):
+        self.assertEqual(
+            memory.timeline_stats([[0, 10, 0, 0]], 5), (10, 10.0, 0.0))
+
+
+class SamplerTestCase(unittest.TestCase):
+
+    def test_read_memory(self):
+        rss, _, _ = memory.read_memory(os.getpid())
+        self.assertGreater(rss, 0)
+
+    def test_children(self):
+        child = subprocess.Popen(['sleep', '5'])
+        try:
+            pids = memory.children(os.getpid())
+            if pids is None:
+                self.skipTest('The kernel does not list children.')
+            self.assertIn(child.pid, pids)
+        finally:
+            child.kill()
+            child.wait()
+
+    def test_stop_without_reaping(self):
+        child = subprocess.Popen(['sleep', '5'])
+        try:
+            sampler = memory.MemorySampler(child.pid, 0.01, deadline=0.05)
+            sampler.start()
+            sampler.join(2)
+            self.assertFalse(sampler.is_alive())
+
+            child.kill()
+            while memory.is_running(child.pid):
+                time.sleep(0.01)
+            sampler = memory.MemorySampler(child.pid, 0.01)
+            sampler.start()
+            sampler.join(2)
+            self.assertFalse(sampler.is_alive())
+        finally:
+            child.kill()
+            child.wait()
+
+    def test_sample_process_tree(self):
+        cmd = mse.RusageCommand(local["sh"], sample_interval=0.01)
+        cmd["-c", "sleep 0.2 & wait"].run()
+        timeline = cmd.measurements[0].timeline
+        self.assertGreater(len(timeline), 1)
+        self.assertTrue(any(sample[1] > 0 for sample in timeline))
+
+
+class PollyMSEReportTestCase(unittest.TestCase):
+
+    def setUp(self):
+        self.engine = sa.create_engine('sqlite://')
+        schema.metadata().create_all(
+            self.engine,
+            tables=[
+                schema.Experiment.__table__, schema.RunGroup.__table__,
+                schema.Run.__table__, memory.MemoryTimeline.__table__
+            ])
+        self.exp_id = uuid.uuid4()
+        session = sa.orm.sessionmaker(bind=self.engine)()
+        session.add_all([
+            schema.Run(id=1, project_name='foo',
+                       experiment_group=self.exp_id),
+            schema.Run(id=2, project_name='foo',
+                       experiment_group=self.exp_id),
+            schema.Run(id=3, project_name='bar',
+                       experiment_group=uuid.uuid4())
+        ])
+        session.flush()
+        # Run 2 measured two processes.
+        for run_id, rss in [(1, 100), (2, 300), (2, 200), (3, 1000)]:
+            memory.persist_timeline(
+                schema.Run(id=run_id), session, 0.1,
+                [[0, rss, 0, 0], [1000, rss, 0, 0]])
+        session.commit()
+        self.session = session
+
+    def test_report(self):
+        report = mse.PollyMSEReport('polly-mse', [str(self.exp_id)],
+                                    'out.csv', self.session)
+        res = report.report()
+        self.assertEqual(len(res), 1)
+        self.assertEqual(res[0][:4], ('foo', 2, 300, 200.0))
+        timelines = self.session.query(memory.MemoryTimeline) \
+            .filter(memory.MemoryTimeline.run_id == 2).count()
+        self.assertEqual(timelines, 2)
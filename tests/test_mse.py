@@ -0,0 +1,46 @@
+"""
+Test the rusage-based time and memory measurement.
+"""
+import unittest
+
+from plumbum import TEE, local
+
+from polyjit.experiments import mse
+
+
+class RusageCommandTestCase(unittest.TestCase):
+
+    def test_run(self):
+        cmd = mse.RusageCommand(local["sh"])
+        retcode, stdout, _ = cmd["-c", "echo foo"].run()
+        self.assertEqual((retcode, stdout), (0, "foo\n"))
+        self.assertEqual(len(cmd.measurements), 1)
+        self.assertTrue(cmd.measurements[0].finished)
+
+    def test_tee(self):
+        cmd = mse.RusageCommand(local["sh"])
+        retcode, _, _ = cmd["-c", "exit 3"] & TEE(retcode=3)
+        self.assertEqual(retcode, 3)
+        measurement = cmd.measurements[0]
+        self.assertTrue(measurement.finished)
+
+        metrics = dict(measurement.metrics())
+        self.assertGreater(metrics["time.real_s"], 0)
+        self.assertGreater(metrics["time.rss"], 0)
+        self.assertIn("time.involuntary_ctx_switches", metrics)
+
+    def test_formulate(self):
+        cmd = mse.RusageCommand(local["sh"])["-c", "true"]
+        self.assertEqual(cmd.formulate()[1:], ["-c", "true"])
+
+    def test_measurements_per_binding(self):
+        cmd = mse.RusageCommand(local["sh"])
+        first = cmd["-c", "true"]
+        second = cmd["-c", "kill -9 $$"]
+        first.run()
+        retcode, _, _ = second.run(retcode=None)
+        self.assertEqual(retcode, -9)
+        self.assertEqual(len(cmd.measurements), 2)
+        self.assertEqual(first.measurements, cmd.measurements[:1])
+        self.assertEqual(second.measurements, cmd.measurements[1:])
+        self.assertTrue(second.measurements[0].finished)
@@ -0,0 +1,103 @@
+"""
+Test the adaptive operator selection of the genetic sequence searches.
+"""
+import random
+import unittest
+
+from polyjit.experiments import operator_selection as ops
+
+
+def keep(parent, _, __):
+    return list(parent)
+
+
+def improve(parent, _, __):
+    return parent[:-1] + ['good']
+
+
+class PolicyTestCase(unittest.TestCase):
+
+    def test_ucb_tries_every_arm_first(self):
+        policy = ops.UCB1(3)
+        selected = []
+        for _ in range(3):
+            arm = policy.select()
+            selected.append(arm)
+            policy.update(arm, 0.0)
+        self.assertEqual(sorted(selected), [0, 1, 2])
+
+    def test_policies_prefer_the_rewarding_arm(self):
+        random.seed(42)
+        for policy in [ops.UCB1(2), ops.ThompsonSampling(2)]:
+            for _ in range(200):
+                arm = policy.select()
+                policy.update(arm, 1.0 if arm == 1 else 0.0)
+            self.assertGreater(policy.counts[1], policy.counts[0])
+
+
+class AdaptiveOperatorsTestCase(unittest.TestCase):
+
+    def test_relative_improvement(self):
+        self.assertEqual(ops.relative_improvement(4, 1), 0.75)
+        self.assertEqual(ops.relative_improvement(1, 4), 0.0)
+        self.assertEqual(ops.relative_improvement(0, -1), 1.0)
+
+    def test_credit_evaluated_offspring(self):
+        seq_to_fitness = {str(['a', 'a']): 4}
+        engine = ops.AdaptiveOperators(['a', 'good'],
+                                       seq_to_fitness,
+                                       operators=[keep, improve])
+        first = engine.offspring(['a', 'a'], [])
+        second = engine.offspring(['a', 'a'], [])
+        self.assertEqual([first, second], [['a', 'a'], ['a', 'good']])
+
+        engine.credit()
+        self.assertEqual(len(engine.pending), 1)
+
+        seq_to_fitness[str(['a', 'good'])] = 1
+        engine.credit()
+        self.assertEqual(engine.pending, [])
+        self.assertEqual(engine.policy.counts, [1, 1])
+        self.assertEqual(engine.policy.mean(1), 0.75)
+        self.assertEqual(engine.policy.mean(0), 0.0)
+
+    def test_mutation_ignores_the_mate(self):
+        seq_to_fitness = {
+            str(['a', 'a']): 4,
+            str(['b', 'b']): 1,
+            str(['a', 'good']): 2
+        }
+        engine = ops.AdaptiveOperators(['a', 'good'],
+                                       seq_to_fitness,
+                                       operators=[improve])
+        engine.offspring(['a', 'a'], [['b', 'b']])
+        engine.credit()
+        self.assertEqual(engine.policy.mean(0), 0.5)
+
+    def test_crossover_against_the_better_parent(self):
+        seq_to_fitness = {
+            str(['a', 'a']): 4,
+            str(['b', 'b']): 1,
+            str(['a', 'b']): 2
+        }
+        engine = ops.AdaptiveOperators(
+            ['a'], seq_to_fitness, operators=[ops.half_swap_crossover])
+        engine.offspring(['a', 'a'], [['b', 'b']])
+        engine.credit()
+        self.assertEqual(engine.policy.counts, [1])
+        self.assertEqual(engine.policy.mean(0), 0.0)
+
+    def test_forget_unevaluated_offspring(self):
+        engine = ops.AdaptiveOperators(['a'], {}, operators=[keep])
+        engine.offspring(['a', 'a'], [])
+        engine.credit()
+        engine.forget()
+        self.assertEqual(engine.pending, [])
+        self.assertEqual(engine.policy.counts, [0])
+
+    def test_default_operators_keep_the_length(self):
+        random.seed(1)
+        engine = ops.AdaptiveOperators(['x', 'y'], {}, policy="thompson")
+        for _ in range(20):
+            child = engine.offspring(['x'] * 6, [['y'] * 6])
+            self.assertEqual(len(child), 6)
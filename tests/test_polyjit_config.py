@@ -1,7 +1,9 @@
 """
 Test the PolyJITConfig objects.
 """
+import threading
 import unittest
+
 from polyjit.experiments.polyjit import EnablePolyJIT, DisablePolyJIT
 
 
@@ -31,3 +33,30 @@ class DictTestCase(unittest.TestCase):
                 self.assertIn('PJIT_ARGS', b.argv)
                 self.assertEqual(b.argv['PJIT_ARGS'], ["-a", "-b"])
         self.assertNotIn('PJIT_ARGS', b.argv)
+
+    def test_threads_are_isolated(self):
+        a = EnablePolyJIT()
+        barrier = threading.Barrier(2)
+        seen = {}
+
+        def run(name):
+            with a.argv(PJIT_ARGS=name):
+                barrier.wait()
+                seen[name] = a.argv['PJIT_ARGS']
+                barrier.wait()
+
+        threads = [threading.Thread(target=run, args=(n, )) for n in "ab"]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        self.assertEqual(seen, {"a": "a", "b": "b"})
+        self.assertNotIn('PJIT_ARGS', a.argv)
+
+    def test_nested_lists_are_restored(self):
+        a = EnablePolyJIT()
+
+        with a.argv(PJIT_ARGS=["-a"]):
+            with a.argv(PJIT_ARGS=["-b"]):
+                self.assertEqual(a.argv['PJIT_ARGS'], ["-a", "-b"])
+            self.assertEqual(a.argv['PJIT_ARGS'], ["-a"])
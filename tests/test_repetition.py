@@ -0,0 +1,83 @@
+"""
+Test the adaptive repetition of runtime measurements.
+"""
+import random
+import unittest
+from unittest import mock
+
+from benchbuild.extensions import base
+
+from polyjit.experiments import repetition
+
+
+class FakeRun:
+
+    def __init__(self, real_time):
+        self.stderr = "BENCHBUILD: 0.1-0.0-{:g}\n".format(real_time)
+        self.db_run = object()
+        self.session = None
+
+
+class FakeTimedRuns(base.Extension):
+    """Yield one run per configuration with the next of its timings."""
+
+    def __init__(self, *timings):
+        super(FakeTimedRuns, self).__init__()
+        self.timings = [iter(t) for t in timings]
+        self.calls = 0
+
+    def __call__(self, *args, **kwargs):
+        self.calls += 1
+        return [FakeRun(next(t)) for t in self.timings]
+
+
+class ConfidenceIntervalTestCase(unittest.TestCase):
+
+    def test_mean_ci(self):
+        mean, lower, upper = repetition.mean_ci([1.0, 2.0, 3.0])
+        self.assertEqual(mean, 2.0)
+        # t(0.975, 2) * stdev / sqrt(n) = 4.303 * 1 / sqrt(3)
+        self.assertAlmostEqual(upper - mean, 2.4843, places=4)
+        self.assertAlmostEqual(mean - lower, upper - mean)
+
+    def test_median_ci(self):
+        rng = random.Random(1)
+        samples = [rng.gauss(10, 1) for _ in range(50)]
+        median, lower, upper = repetition.median_ci(samples)
+        self.assertTrue(lower <= median <= upper)
+        self.assertLess(upper - lower, 2)
+
+    def test_single_sample_is_unstable(self):
+        for confidence_interval in repetition.CONFIDENCE_INTERVALS.values():
+            ci = confidence_interval([1.0])
+            self.assertFalse(repetition.is_stable(*ci, 0.5))
+
+    def test_real_time(self):
+        self.assertEqual(repetition.real_time(FakeRun(1.5)), 1.5)
+
+
+@mock.patch.object(repetition, 'persist_repetitions')
+@mock.patch.object(repetition, 'discard')
+class RepeatUntilStableTestCase(unittest.TestCase):
+
+    def test_stops_when_stable(self, discard, persist):
+        runs = FakeTimedRuns([5.0] + [1.0] * 10, [7.0] + [2.0] * 10)
+        res = (runs << repetition.RepeatUntilStable())(None)
+
+        # One warm-up call and the minimal number of measured calls.
+        self.assertEqual(runs.calls, 4)
+        self.assertEqual(discard.call_count, 2)
+        self.assertEqual(len(res), 6)
+        self.assertEqual(persist.call_count, 2)
+        _, method, samples, ci = persist.call_args_list[1][0]
+        self.assertEqual((method, samples), ('mean', [2.0, 2.0, 2.0]))
+        self.assertEqual(ci, (2.0, 2.0, 2.0))
+
+    def test_stops_at_max_runs(self, discard, persist):
+        noisy = [1.0, 9.0] * 20
+        runs = FakeTimedRuns(noisy)
+        (runs << repetition.RepeatUntilStable())(None)
+
+        self.assertEqual(runs.calls, 21)
+        _, _, samples, _ = persist.call_args[0]
+        self.assertEqual(len(samples), 20)
@@ -0,0 +1,86 @@
+"""
+Test the report result cache.
+"""
+import tempfile
+import unittest
+import uuid
+
+import pandas as pd
+import sqlalchemy as sa
+
+from benchbuild.utils import schema
+from polyjit.reports import cache
+
+
+class ReportCacheTestCase(unittest.TestCase):
+
+    def setUp(self):
+        self.tmp_dir = tempfile.TemporaryDirectory()
+        self.cache = cache.ReportCache(self.tmp_dir.name)
+        engine = sa.create_engine('sqlite://')
+        schema.metadata().create_all(
+            engine,
+            tables=[
+                schema.Experiment.__table__, schema.RunGroup.__table__,
+                schema.Run.__table__
+            ])
+        self.session = sa.orm.sessionmaker(bind=engine)()
+        self.exp_id = uuid.uuid4()
+        self.computed = 0
+        self.add_run()
+
+    def tearDown(self):
+        self.tmp_dir.cleanup()
+
+    def add_run(self):
+        self.session.add(
+            schema.Run(project_name="foo", experiment_name="pj-test",
+                       experiment_group=self.exp_id,
+                       run_group=uuid.uuid4()))
+        self.session.commit()
+
+    def compute(self):
+        self.computed += 1
+        yield ("complete", pd.DataFrame({"speedup": [self.computed]}))
+
+    def frames(self):
+        return cache.cached_frames(self.session.connection(), "pj-test",
+                                   ["SELECT 1"], [self.exp_id],
+                                   self.compute, cache=self.cache)
+
+    def test_reuse(self):
+        first = self.frames()
+        second = self.frames()
+        self.assertEqual(self.computed, 1)
+        self.assertEqual(second[0][0], "complete")
+        pd.testing.assert_frame_equal(first[0][1], second[0][1])
+
+    def test_new_runs_invalidate(self):
+        self.frames()
+        self.add_run()
+        frames = self.frames()
+        self.assertEqual(self.computed, 2)
+        self.assertEqual(frames[0][1].speedup[0], 2)
+
+    def test_key(self):
+        state = ["1", "1", "None", "None"]
+        self.assertEqual(
+            cache.cache_key("a", ["q"], ["x", "y"], state),
+            cache.cache_key("a", ["q"], ["y", "x"], state))
+        self.assertNotEqual(
+            cache.cache_key("a", ["q"], ["x"], state),
+            cache.cache_key("a", ["q2"], ["x"], state))
+
+    def test_report_constants_in_key(self):
+        from polyjit.experiments import ijpp, pjtest
+        state = ["1", "1", "None", "None"]
+        key = cache.cache_key("ijpp", ijpp.IJPPReport.dependencies(), ["x"],
+                              state)
+        configs = ijpp.IJPPReport.CONFIGS
+        self.addCleanup(setattr, ijpp.IJPPReport, "CONFIGS", configs)
+        ijpp.IJPPReport.CONFIGS = configs[:1]
+        self.assertNotEqual(
+            key, cache.cache_key("ijpp", ijpp.IJPPReport.dependencies(),
+                                 ["x"], state))
+        self.assertIn(pjtest.TestReport.BASELINE,
+                      pjtest.TestReport.dependencies())
@@ -0,0 +1,93 @@
+"""
+Test the portable report engine on SQLite.
+"""
+import unittest
+import uuid
+
+import sqlalchemy as sa
+
+from benchbuild.utils import schema
+from polyjit.experiments import polyjit
+from polyjit.reports import engine
+
+
+class ReportEngineTestCase(unittest.TestCase):
+
+    def setUp(self):
+        engine_ = sa.create_engine('sqlite://')
+        schema.metadata().create_all(
+            engine_,
+            tables=[
+                schema.Experiment.__table__, schema.RunGroup.__table__,
+                schema.Project.__table__, schema.Run.__table__,
+                schema.Config.__table__, schema.Metric.__table__,
+                polyjit.PJ_Result.__table__,
+                polyjit.PJ_Result_Region.__table__
+            ])
+        self.session = sa.orm.sessionmaker(bind=engine_)()
+        self.exp_id = uuid.uuid4()
+        self.run_id = 0
+
+        self.add_run("polly.inside", t_all=10, t_scops=8, t_codegen=0,
+                     regions={"r1": 6, "r2": 2})
+        self.add_run("polly.inside", t_all=12, t_scops=8, t_codegen=0,
+                     regions={"r1": 6, "r2": 2})
+        self.add_run("PolyJIT", t_all=5, t_scops=4, t_codegen=1,
+                     regions={"r1": 2, "r2": 2})
+        # Another experiment must not show up.
+        self.add_run("PolyJIT", exp_id=uuid.uuid4(), t_all=100)
+        self.session.commit()
+
+    def add_run(self, config, exp_id=None, regions=None, **results):
+        self.run_id += 1
+        self.session.add(
+            schema.Run(id=self.run_id, project_name="foo",
+                       project_group="bar", experiment_name="ijpp",
+                       experiment_group=exp_id or self.exp_id,
+                       run_group=uuid.uuid4()))
+        self.session.add(
+            schema.Config(run_id=self.run_id, name="cores", value="4"))
+        for name, value in results.items():
+            self.session.add(
+                polyjit.PJ_Result(run_id=self.run_id, config=config,
+                                  name=name, value=value))
+        for region, value in (regions or {}).items():
+            self.session.add(
+                polyjit.PJ_Result_Region(run_id=self.run_id, config=config,
+                                         name="t_region", value=value,
+                                         region_name=region))
+
+    def load(self):
+        return engine.ReportData.load(self.session.connection(),
+                                      [self.exp_id])
+
+    def test_total_runtime(self):
+        totals = engine.total_runtime(self.load()).set_index("config")
+        self.assertEqual(totals.loc["polly.inside", "time"], 11)
+        self.assertEqual(totals.loc["PolyJIT", "time"], 5)
+        self.assertEqual(totals.loc["PolyJIT", "ohcov"], 0.2)
+        self.assertEqual(totals.loc["PolyJIT", "dyncov"], 0.8)
+
+    def test_speedups(self):
+        totals = engine.speedups(
+            engine.total_runtime(self.load()), "polly.inside")
+        complete = engine.wide(totals, ["polly.inside", "PolyJIT"],
+                               ["speedup", "time"])
+        self.assertEqual(len(complete), 1)
+        self.assertEqual(complete.loc[0, "speedup_PolyJIT"], 2.2)
+        self.assertEqual(complete.loc[0, "speedup_polly.inside"], 1.0)
+
+    def test_region_wise_compare(self):
+        compare = engine.region_wise_compare(self.load(), "polly.inside",
+                                             "PolyJIT").set_index("region")
+        self.assertEqual(list(compare.speedup), [3.0, 1.0])
+        self.assertEqual(list(compare.cores), ["4", "4"])
+
+    def test_read_chunked(self):
+        query = engine.results_query().params(exp_ids=[self.exp_id])
+        results = engine.read_chunked(self.session.connection(), query, 2)
+        self.assertEqual(len(results), 15)
+        self.assertEqual(results.name.dtype.name, "category")
+        self.assertEqual(sorted(results.region.dropna().unique()),
+                         ["r1", "r2"])
+        self.assertEqual(results.value.sum(), 68)
@@ -0,0 +1,122 @@
+"""
+Test the Parquet export of experiments.
+"""
+import os
+import tempfile
+import unittest
+import uuid
+from unittest import mock
+
+import sqlalchemy as sa
+
+from benchbuild.utils import schema
+from polyjit.experiments import ijpp, polyjit
+from polyjit.reports import engine, export
+
+# SQLite cannot autoincrement the composite keys of the other tables.
+SQLITE_TABLES = [
+    "run", "project", "config", "metrics", "polyjit_result",
+    "polyjit_region_result", "likwid"
+]
+
+
+class ExportTestCase(unittest.TestCase):
+
+    def setUp(self):
+        self.engine = sa.create_engine('sqlite://')
+        schema.metadata().create_all(
+            self.engine,
+            tables=[schema.Experiment.__table__, schema.RunGroup.__table__] +
+            [export.TABLES[name] for name in SQLITE_TABLES])
+        self.session = sa.orm.sessionmaker(bind=self.engine)()
+        self.exp_id = uuid.uuid4()
+        self.session.add(
+            schema.Project(name="foo", group_name="bar", domain="baz",
+                           src_url="", version=""))
+        self.add_run(1, self.exp_id, t_all=10)
+        self.add_run(2, self.exp_id, t_all=12)
+        self.add_run(3, uuid.uuid4(), t_all=100)
+        self.session.commit()
+
+    def add_run(self, run_id, exp_id, t_all):
+        self.session.add(
+            schema.Run(id=run_id, project_name="foo", project_group="bar",
+                       experiment_name="ijpp", experiment_group=exp_id,
+                       run_group=uuid.uuid4()))
+        self.session.add(
+            schema.Config(run_id=run_id, name="cores", value="4"))
+        self.session.add(
+            schema.Metric(run_id=run_id, name="time.real_s", value=t_all))
+        self.session.add(
+            polyjit.PJ_Result(run_id=run_id, config="PolyJIT",
+                              name="t_all", value=t_all))
+        self.session.add(
+            polyjit.PJ_Result_Region(run_id=run_id, config="PolyJIT",
+                                     name="t_region", value=t_all / 2,
+                                     region_name="r1"))
+
+    def rows(self, name):
+        query = export.table_query(export.TABLES[name])
+        return self.session.execute(
+            query, {"exp_id": self.exp_id}).fetchall()
+
+    def test_tables_of_experiment(self):
+        for name in ["run", "config", "metrics", "polyjit_region_result"]:
+            self.assertEqual(len(self.rows(name)), 2, name)
+        # Region results are polyjit results, too.
+        self.assertEqual(len(self.rows("polyjit_result")), 4)
+        self.assertEqual(len(self.rows("project")), 1)
+        self.assertEqual(len(self.rows("likwid")), 0)
+
+    def test_partition_column_is_implicit(self):
+        names = [c.name for c in export.columns(export.TABLES["run"])]
+        self.assertNotIn(export.PARTITION, names)
+
+    def test_layout(self):
+        self.assertEqual(
+            export.partition("out", "run", "42"),
+            os.path.join("out", "run", "experiment_group=42"))
+        self.assertEqual(export.dataset_root("results.csv"), "results")
+
+    @unittest.skipIf(export.pq is None, "requires pyarrow")
+    def test_round_trip(self):
+        with tempfile.TemporaryDirectory() as root:
+            # Every thread gets its own in-memory database, export on the
+            # connection that holds our rows.
+            with self.engine.connect() as con:
+                counts = export.export(con, [self.exp_id], root,
+                                       SQLITE_TABLES)
+            self.assertEqual(counts[("run", str(self.exp_id))], 2)
+            self.assertEqual(export.experiments(root, "run"),
+                             [str(self.exp_id)])
+
+            frame = export.read_table(root, "polyjit_result")
+            self.assertEqual(frame.name.dtype.name, "category")
+
+            data = engine.ReportData.from_dataset(root)
+            totals = engine.total_runtime(data)
+            self.assertEqual(totals.time.tolist(), [11])
+            self.assertEqual(totals.domain.tolist(), ["baz"])
+            self.assertEqual(len(data.region_results()), 2)
+
+    @unittest.skipIf(export.pq is None, "requires pyarrow")
+    def test_report_from_dataset(self):
+        cwd = os.getcwd()
+        with tempfile.TemporaryDirectory() as root:
+            with self.engine.connect() as con:
+                export.export(con, [self.exp_id], root, SQLITE_TABLES)
+            engine.CFG["report_dataset"]["root"] = root
+            self.addCleanup(engine.CFG["report_dataset"].__setitem__, "root",
+                            "")
+            os.chdir(root)
+            try:
+                # Without a connection, the report must read the dataset.
+                ijpp.IJPPReport.write_experiment(
+                    mock.Mock(out_path="report.csv"), self.exp_id, None)
+            finally:
+                os.chdir(cwd)
+            self.assertTrue(
+                os.path.exists(
+                    os.path.join(root,
+                                 "ijpp_report_runtime_{0}.csv".format(
+                                     self.exp_id))))
@@ -0,0 +1,77 @@
+"""
+Test the streaming report output.
+"""
+import csv
+import os
+import tempfile
+import unittest
+
+import pandas as pd
+import sqlalchemy as sa
+
+from polyjit.reports import output
+
+
+class OutputTestCase(unittest.TestCase):
+
+    def setUp(self):
+        self.tmp_dir = tempfile.TemporaryDirectory()
+        self.engine = sa.create_engine('sqlite://')
+        self.engine.execute("CREATE TABLE t (a INTEGER, b VARCHAR)")
+        self.engine.execute("INSERT INTO t VALUES " + ", ".join(
+            "({0}, 'v{0}')".format(i) for i in range(25)))
+
+    def tearDown(self):
+        self.tmp_dir.cleanup()
+
+    def path(self, name):
+        return os.path.join(self.tmp_dir.name, name)
+
+    def read_csv(self, name):
+        with open(self.path(name)) as csv_f:
+            return list(csv.reader(csv_f))
+
+    def test_stream(self):
+        with self.engine.connect() as con:
+            header, chunks = output.stream(con, "SELECT a, b FROM t", 10)
+            self.assertEqual(header, ["a", "b"])
+            self.assertEqual([len(rows) for rows in chunks], [10, 10, 5])
+
+    def test_write_query(self):
+        with self.engine.connect() as con:
+            count = output.write_query(con, "SELECT a, b FROM t ORDER BY a",
+                                       self.path("t.csv"), 7)
+        self.assertEqual(count, 25)
+        rows = self.read_csv("t.csv")
+        self.assertEqual(rows[:2], [["a", "b"], ["0", "v0"]])
+        self.assertEqual(len(rows), 26)
+
+    def test_write_frame(self):
+        frame = pd.DataFrame({"a": [1, 2, 3], "b": ["x", "y", "z"]})
+        output.write_frame(frame, self.path("f.csv"), 2)
+        self.assertEqual(self.read_csv("f.csv"),
+                         [["a", "b"], ["1", "x"], ["2", "y"], ["3", "z"]])
+
+    @unittest.skipIf(output.pq is None, "pyarrow is not installed")
+    def test_write_parquet(self):
+        frame = pd.DataFrame({"a": [1, 2, 3], "b": ["x", "y", "z"]})
+        output.write_frame(frame, self.path("f.parquet"), 2)
+        pd.testing.assert_frame_equal(
+            pd.read_parquet(self.path("f.parquet")), frame)
+
+    @unittest.skipIf(output.pq is None, "pyarrow is not installed")
+    def test_schema_from_query(self):
+        table = sa.table("t", sa.column("a", sa.Integer),
+                         sa.column("b", sa.String))
+        query = sa.select([table.c.a, table.c.b])
+        self.assertEqual(output.query_types(query),
+                         [output.pa.int64(), output.pa.string()])
+
+    @unittest.skipIf(output.pq is None, "pyarrow is not installed")
+    def test_null_first_chunk(self):
+        chunks = iter([[(None, None)], [(1, None)], [(2.5, None)]])
+        count = output.write(self.path("n.parquet"), ["a", "b"], chunks)
+        self.assertEqual(count, 3)
+        frame = pd.read_parquet(self.path("n.parquet"))
+        self.assertEqual(list(frame.a.fillna(0)), [0, 1, 2.5])
+        self.assertTrue(frame.b.isnull().all())
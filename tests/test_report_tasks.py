@@ -0,0 +1,53 @@
+"""
+Test the concurrent execution of report tasks.
+"""
+import os
+import tempfile
+import threading
+import unittest
+
+import sqlalchemy as sa
+
+from polyjit.reports import tasks
+
+
+class RunTasksTestCase(unittest.TestCase):
+
+    def setUp(self):
+        self.tmp_dir = tempfile.TemporaryDirectory()
+        self.engine = sa.create_engine(
+            'sqlite:///' + os.path.join(self.tmp_dir.name, "db.sqlite"))
+        self.engine.execute("CREATE TABLE t (a INTEGER)")
+        self.engine.execute("INSERT INTO t VALUES (1), (2), (3)")
+
+    def tearDown(self):
+        self.engine.dispose()
+        self.tmp_dir.cleanup()
+
+    def test_concurrent(self):
+        barrier = threading.Barrier(3, timeout=10)
+
+        def task(value):
+
+            def query(con):
+                # All three tasks have to run at the same time.
+                barrier.wait()
+                return con.execute(
+                    "SELECT sum(a) * {0} FROM t".format(value)).scalar()
+
+            return query
+
+        results = dict(
+            tasks.run(self.engine, [(i, task(i)) for i in range(1, 4)],
+                      workers=3))
+        self.assertEqual(results, {1: 6, 2: 12, 3: 18})
+
+    def test_connection_runs_sequentially(self):
+        seen = []
+        with self.engine.connect() as con:
+            names = [
+                name for name, _ in tasks.run(con, [(i, seen.append)
+                                                    for i in range(3)])
+            ]
+        self.assertEqual(names, [0, 1, 2])
+        self.assertEqual(seen, [con, con, con])
@@ -0,0 +1,123 @@
+"""
+Test the warm-start helpers of the sequence experiments.
+"""
+import os
+import tempfile
+import unittest
+
+import sqlalchemy as sa
+
+from benchbuild.utils import schema
+from polyjit.experiments import pj_sequence
+
+
+class SeedSequencesTestCase(unittest.TestCase):
+
+    def test_fill_with_random_sequences(self):
+        seqs = pj_sequence.seed_sequences([], 4, 3, ['a', 'b'])
+        self.assertEqual(len(seqs), 4)
+        for seq in seqs:
+            self.assertEqual(len(seq), 3)
+            self.assertTrue(set(seq) <= {'a', 'b'})
+
+    def test_seeds_are_fitted_to_length(self):
+        seqs = pj_sequence.seed_sequences([['a', 'a', 'a', 'a'], ['b']], 2, 3,
+                                          ['a', 'b'])
+        self.assertEqual(seqs[0], ['a', 'a', 'a'])
+        self.assertEqual(seqs[1][0], 'b')
+        self.assertEqual(len(seqs[1]), 3)
+
+
+class ModuleFingerprintTestCase(unittest.TestCase):
+
+    def fingerprint(self, content):
+        with tempfile.NamedTemporaryFile('w', delete=False) as ir_file:
+            ir_file.write(content)
+        try:
+            return pj_sequence.module_fingerprint(ir_file.name)
+        finally:
+            os.remove(ir_file.name)
+
+    def test_ignores_temporary_module_names(self):
+        lhs = self.fingerprint("; ModuleID = 'tmp.a'\n"
+                               "source_filename = \"tmp.a\"\n"
+                               "define void @f() { ret void }\n")
+        rhs = self.fingerprint("; ModuleID = 'tmp.b'\n"
+                               "source_filename = \"tmp.b\"\n"
+                               "define void @f() { ret void }\n")
+        self.assertEqual(lhs, rhs)
+
+    def test_differs_for_different_code(self):
+        lhs = self.fingerprint("define void @f() { ret void }\n")
+        rhs = self.fingerprint("define void @g() { ret void }\n")
+        self.assertNotEqual(lhs, rhs)
+
+
+class LoadSeedSequencesTestCase(unittest.TestCase):
+
+    def setUp(self):
+        self.engine = sa.create_engine('sqlite://')
+        runs = schema.Run.__table__
+        schema.metadata().create_all(
+            self.engine,
+            tables=[
+                schema.Experiment.__table__, schema.RunGroup.__table__, runs,
+                pj_sequence.__SEQUENCE__
+            ])
+        self.engine.execute(runs.insert(), [{
+            'id': 1,
+            'project_name': 'foo'
+        }, {
+            'id': 2,
+            'project_name': 'bar'
+        }])
+        self.engine.execute(pj_sequence.__SEQUENCE__.insert(), [{
+            'name': "['a', 'b']",
+            'value': 1.0,
+            'fingerprint': 'other',
+            'run_id': 1
+        }, {
+            'name': "['b', 'b']",
+            'value': 3.0,
+            'fingerprint': 'same',
+            'run_id': 2
+        }, {
+            'name': "['c', 'b']",
+            'value': 0.0,
+            'fingerprint': 'same',
+            'run_id': 2
+        }, {
+            'name': "['a', 'a']",
+            'value': 0.0,
+            'fingerprint': 'unrelated',
+            'run_id': 2
+        }])
+
+    def test_same_module_first(self):
+        seqs = pj_sequence.load_seed_sequences(self.engine, 'same', 'foo',
+                                               ['a', 'b'], 5)
+        self.assertEqual(seqs, [['b', 'b'], ['a', 'b']])
+
+    def test_limit(self):
+        seqs = pj_sequence.load_seed_sequences(self.engine, 'same', 'foo',
+                                               ['a', 'b'], 1)
+        self.assertEqual(seqs, [['b', 'b']])
+        self.assertEqual(
+            pj_sequence.load_seed_sequences(self.engine, 'same', 'foo',
+                                            ['a', 'b'], 0), [])
+
+
+class UpgradeSequenceTableTestCase(unittest.TestCase):
+
+    def test_add_fingerprint(self):
+        engine = sa.create_engine('sqlite://')
+        engine.execute("CREATE TABLE sequences (name VARCHAR NOT NULL, "
+                       "value FLOAT, run_id INTEGER)")
+        with engine.connect() as con:
+            pj_sequence.upgrade_sequence_table(con)
+            pj_sequence.upgrade_sequence_table(con)
+            con.execute(pj_sequence.__SEQUENCE__.insert().values(
+                name="['-licm']", value=1.0, fingerprint="abc", run_id=1))
+        columns = [c['name'] for c in sa.inspect(engine).get_columns(
+            'sequences')]
+        self.assertIn('fingerprint', columns)
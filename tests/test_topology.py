@@ -0,0 +1,83 @@
+"""
+Test the topology-aware core sets.
+"""
+import os
+import tempfile
+import unittest
+
+from plumbum import local
+
+from polyjit.experiments import topology
+
+
+def write(path, content):
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    with open(path, 'w') as out:
+        out.write(content + '\n')
+
+
+class CpuListTestCase(unittest.TestCase):
+
+    def test_parse(self):
+        self.assertEqual(
+            topology.parse_cpu_list('0-3,8,10-11'), [0, 1, 2, 3, 8, 10, 11])
+        self.assertEqual(topology.parse_cpu_list(''), [])
+
+    def test_format(self):
+        self.assertEqual(
+            topology.format_cpu_list([11, 0, 1, 2, 3, 8, 10]), '0-3,8,10-11')
+
+
+class TopologyTestCase(unittest.TestCase):
+    """Two NUMA nodes with 2 physical cores and 2 SMT threads each."""
+
+    def setUp(self):
+        self.sysfs = tempfile.TemporaryDirectory()
+        cpu_dir = os.path.join(self.sysfs.name, 'cpu')
+        write(os.path.join(cpu_dir, 'online'), '0-7')
+        # Linux enumerates the SMT siblings after all physical cores.
+        for cpu in range(8):
+            core = cpu % 4
+            topo_dir = os.path.join(cpu_dir, 'cpu{:d}'.format(cpu),
+                                    'topology')
+            write(os.path.join(topo_dir, 'core_id'), str(core))
+            write(os.path.join(topo_dir, 'physical_package_id'),
+                  str(core // 2))
+            write(
+                os.path.join(topo_dir, 'thread_siblings_list'),
+                '{:d},{:d}'.format(core, core + 4))
+        write(os.path.join(self.sysfs.name, 'node', 'node0', 'cpulist'),
+              '0-1,4-5')
+        write(os.path.join(self.sysfs.name, 'node', 'node1', 'cpulist'),
+              '2-3,6-7')
+        self.topology = topology.read_topology(self.sysfs.name)
+
+    def tearDown(self):
+        self.sysfs.cleanup()
+
+    def test_read_topology(self):
+        self.assertEqual(self.topology[5],
+                         topology.Cpu(cpu=5, core=1, package=0, node=0,
+                                      thread=1))
+
+    def test_physical_cores_first(self):
+        self.assertEqual(topology.core_order(self.topology),
+                         [0, 1, 2, 3, 4, 5, 6, 7])
+        self.assertEqual(topology.core_set(2, self.topology), [0, 1])
+        self.assertEqual(topology.core_set(4, self.topology), [0, 1, 2, 3])
+        self.assertEqual(topology.core_set(5, self.topology), [0, 1, 2, 3, 4])
+
+    def test_machine_topology(self):
+        cpus = topology.core_set(1)
+        self.assertEqual(len(cpus), 1)
+        self.assertEqual(
+            topology.affinity_env(cpus),
+            {'GOMP_CPU_AFFINITY': str(cpus[0])})
+
+    def test_pinned_command(self):
+        cpus = topology.core_set(1)
+        before = os.sched_getaffinity(0)
+        cmd = topology.PinnedCommand(local['cat'], cpus)
+        allowed = cmd['/proc/self/status']().split('Cpus_allowed_list:')[1]
+        self.assertEqual(topology.parse_cpu_list(allowed.split()[0]), cpus)
+        self.assertEqual(os.sched_getaffinity(0), before)
@@ -0,0 +1,77 @@
+"""
+Test the streaming ingestion of PolyJIT logs.
+"""
+import os
+import tempfile
+import unittest
+
+import sqlalchemy as sa
+
+from benchbuild.utils import schema
+from polyjit.experiments import trace_logs
+
+
+def log_lines(count):
+    return [
+        "[2018-05-04 13:12:11.{0:03d}] [polli] [trace] "
+        "line {0}: codegen for region {0}\n".format(i % 1000).encode()
+        if i % 10 == 0 else "plain line {0}\n".format(i).encode()
+        for i in range(count)
+    ]
+
+
+class IngestLogTestCase(unittest.TestCase):
+
+    def setUp(self):
+        engine = sa.create_engine('sqlite://')
+        schema.metadata().create_all(
+            engine,
+            tables=[
+                schema.Experiment.__table__, schema.RunGroup.__table__,
+                schema.Run.__table__, trace_logs.PJ_Log.__table__,
+                trace_logs.PJ_LogChunk.__table__,
+                trace_logs.PJ_LogEvent.__table__
+            ])
+        self.session = sa.orm.sessionmaker(bind=engine)()
+        self.tmp_dir = tempfile.TemporaryDirectory()
+        self.path = os.path.join(self.tmp_dir.name, "polyjit.log")
+
+    def tearDown(self):
+        self.tmp_dir.cleanup()
+
+    def ingest(self, lines, **kwargs):
+        with open(self.path, 'wb') as log_f:
+            log_f.writelines(lines)
+        kwargs.setdefault("max_size", 1024**2)
+        kwargs.setdefault("max_events", 1000)
+        log = trace_logs.ingest_log(
+            self.session, 1, self.path, codec="gzip", chunk_size=16, **kwargs)
+        self.session.commit()
+        return log, b"".join(trace_logs.read_log(self.session, log))
+
+    def test_roundtrip(self):
+        lines = log_lines(200)
+        log, content = self.ingest(lines)
+        self.assertEqual(content, b"".join(lines))
+        self.assertGreater(log.n_chunks, 1)
+        self.assertEqual(log.dropped_size, 0)
+        self.assertEqual(log.n_lines, 200)
+
+    def test_index(self):
+        self.ingest(log_lines(200))
+        events = self.session.query(trace_logs.PJ_LogEvent) \
+            .order_by(trace_logs.PJ_LogEvent.line).all()
+        self.assertEqual([e.line for e in events], list(range(0, 200, 10)))
+        self.assertEqual(events[1].region, "10")
+        self.assertEqual(events[1].event, "codegen")
+        self.assertEqual(events[1].level, "trace")
+        self.assertEqual(events[1].timestamp.microsecond, 10000)
+
+    def test_head_and_tail(self):
+        lines = log_lines(200)
+        log, content = self.ingest(lines, max_size=400)
+        self.assertGreater(log.dropped_size, 0)
+        self.assertTrue(content.startswith(lines[0]))
+        self.assertTrue(content.endswith(lines[-1]))
+        self.assertIn(b"bytes dropped", content)
+        self.assertEqual(log.raw_size, len(b"".join(lines)))